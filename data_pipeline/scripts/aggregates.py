@@ -0,0 +1,788 @@
+"""
+Review Aggregation Engine
+Every post_process aggregate as a mergeable accumulator: `update(row)` folds in
+one review, `merge(other)` folds in an accumulator built over later reviews.
+ReviewAggregates feeds all of them in a single pass, so the roaster, country,
+year and roast maps are built once. Top-1 picks are tracked while streaming
+and the 12 most recent reviews are kept in a heap, so nothing is sorted over
+the whole corpus.
+
+Large inputs are split into contiguous shards aggregated in a process pool and
+merged in order. Ties (first roaster with the best average, first country
+with the most reviews, ...) go to the earliest review exactly as in the
+original list-based code, because merge() keeps the left side on ties and
+dicts keep first-seen order.
+
+Ratings and cupping scores are integers, so their running sums are exact in
+any merge order. Float prices go into RowOrderSum, a running sum in row
+order like the original sum(list), continued across merges, so results are
+identical however the input is sharded or folded in incrementally.
+"""
+
+import os
+import heapq
+from abc import ABC, abstractmethod
+import multiprocessing as mp
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+SCORE_KEYS = ['aroma', 'acidity', 'body', 'flavor', 'aftertaste']
+ROASTS = ['Light', 'Medium', 'Dark']
+RATING_BUCKETS = [
+    ('80-82', 80, 82), ('83-85', 83, 85), ('86-88', 86, 88), ('89-91', 89, 91),
+    ('92-94', 92, 94), ('95-97', 95, 97), ('98+', 98, 100),
+]
+PRICE_TIERS = [
+    ('Budget', '<$1.50/oz', 0, 1.5),
+    ('Mid-Range', '$1.50-$3/oz', 1.5, 3),
+    ('Premium', '$3-$5/oz', 3, 5),
+    ('Luxury', '$5+/oz', 5, float('inf')),
+]
+# Integer rating -> its RATING_BUCKETS index (ratings outside every bucket are absent)
+BUCKET_OF = {v: i for i, (_, lo, hi) in enumerate(RATING_BUCKETS) for v in range(lo, hi + 1)}
+RECENT_REVIEWS = 12
+MIN_SHARD_ROWS = 25_000  # Below this a process pool costs more than it saves
+
+
+def rnd(n, d=1):
+    return round(n, d)
+
+
+def _avg(total, n):
+    """Same as avg(list): 0 (an int) when empty."""
+    return total / n if n else 0
+
+
+def _fields(r):
+    """(rating, usable price/oz, the five cupping scores or None) of a review.
+
+    ReviewAggregates extracts these once per row and hands them to every
+    accumulator's add(); update(row) does the same for a lone accumulator.
+    """
+    p = r.get('price_per_oz_usd')
+    get = r.get
+    aroma, acidity, body, flavor, aftertaste = get('aroma'), get('acidity'), get('body'), get('flavor'), get('aftertaste')
+    scores = (aroma, acidity, body, flavor, aftertaste) if aroma and acidity and body and flavor and aftertaste else None
+    return get('rating'), (p if p and p > 0 else None), scores
+
+
+def _merge_counts(a, b):
+    """Add counter dict b into a, keeping a's first-seen key order."""
+    for k, n in b.items():
+        a[k] = a.get(k, 0) + n
+
+
+def _first_max(counts):
+    """Key with the highest count; the first one seen on ties (like max())."""
+    return max(counts, key=counts.get) if counts else None
+
+
+class Accumulator(ABC):
+    """update(row) folds in one review; merge(other) folds in later reviews."""
+
+    def update(self, r):
+        self.add(r, *_fields(r))
+        return self
+
+    @abstractmethod
+    def add(self, r, rating, price, scores):
+        """Fold in one review whose _fields() are already extracted."""
+
+    @abstractmethod
+    def merge(self, other):
+        """Fold in an accumulator of the same type built over later reviews."""
+
+
+# ─── Building blocks ─────────────────────────────────────────────────────────
+
+class RowOrderSum:
+    """Count and row-order running sum of floats: sum(list) bit for bit.
+
+    sum(list) rounds after every addition, so the total depends on the order
+    values arrive in. merge() takes `other` to hold the rows after self's
+    (shards are merged left to right, new reviews come after the saved
+    state) and continues self's total over other's values, so those are kept
+    in `tail` until compact() drops them. Saved incremental state is
+    compacted: a count and one float, and it is only ever merged into.
+    """
+    __slots__ = ('n', 'total', 'tail')
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+        self.tail = array('d')  # Values added since creation or the last compact()
+
+    def __len__(self):
+        return self.n
+
+    def add(self, x):
+        self.n += 1
+        self.total += x
+        self.tail.append(x)
+
+    def merge(self, other):
+        if len(other.tail) != other.n:
+            raise ValueError("Cannot merge from a compacted RowOrderSum; its values are gone")
+        self.n += other.n
+        self.total = sum(other.tail, self.total)
+        self.tail.extend(other.tail)
+
+    def mean(self):
+        return self.total / self.n if self.n else None
+
+    def compact(self):
+        self.tail = array('d')
+
+
+class GroupStats:
+    """Ratings, prices, roasts and location for one roaster/country/year."""
+    __slots__ = ('n', 'total', 'top_score', 'prices', 'location', 'roasts')
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0
+        self.top_score = 0
+        self.prices = RowOrderSum()
+        self.location = None
+        self.roasts = {}
+
+    def add(self, r, rating, price):
+        self.n += 1
+        self.total += rating
+        if rating > self.top_score:
+            self.top_score = rating
+        if price is not None:
+            self.prices.add(price)
+        location = r.get('roaster_location')
+        if location:
+            self.location = location
+        roast = r.get('roast_category')
+        if roast:
+            self.roasts[roast] = self.roasts.get(roast, 0) + 1
+
+    def merge(self, other):
+        self.n += other.n
+        self.total += other.total
+        self.top_score = max(self.top_score, other.top_score)
+        self.prices.merge(other.prices)
+        if other.location:
+            self.location = other.location  # Last one seen wins
+        _merge_counts(self.roasts, other.roasts)
+
+    def avg_rating(self):
+        return rnd(_avg(self.total, self.n))
+
+    def avg_price(self):
+        return rnd(self.prices.mean(), 2) if self.prices.n else None
+
+
+class GroupedRatings(Accumulator):
+    """GroupStats per value of `field`, over reviews that have it and a rating."""
+
+    def __init__(self, field):
+        self.field = field
+        self.groups = {}
+
+    def add(self, r, rating, price, scores):
+        key = r.get(self.field)
+        if not key or not rating:
+            return
+        g = self.groups.get(key)
+        if g is None:
+            g = self.groups[key] = GroupStats()
+        g.add(r, rating, price)
+
+    def merge(self, other):
+        for key, g in other.groups.items():
+            mine = self.groups.get(key)
+            if mine is None:
+                self.groups[key] = g
+            else:
+                mine.merge(g)
+
+
+class ScoreMeans:
+    """Mean of each cupping score over reviews that have all five."""
+    __slots__ = ('n', 'sums')
+
+    def __init__(self):
+        self.n = 0
+        self.sums = [0] * len(SCORE_KEYS)
+
+    def add(self, scores):
+        self.n += 1
+        sums = self.sums
+        for i, v in enumerate(scores):
+            sums[i] += v
+
+    def merge(self, other):
+        self.n += other.n
+        self.sums = [a + b for a, b in zip(self.sums, other.sums)]
+
+    def avgs(self):
+        return {k: (rnd(total / self.n) if self.n else 0) for k, total in zip(SCORE_KEYS, self.sums)}
+
+
+# ─── Insight accumulators ────────────────────────────────────────────────────
+
+class RatingBuckets(Accumulator):
+    def __init__(self):
+        self.counts = [0] * len(RATING_BUCKETS)
+
+    def add(self, r, rating, price, scores):
+        if not rating:
+            return
+        for i, (_, lo, hi) in enumerate(RATING_BUCKETS):
+            if lo <= rating <= hi:
+                self.counts[i] += 1
+                break
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+    def result(self):
+        return [{'range': label, 'count': n, 'min': lo, 'max': hi}
+                for (label, lo, hi), n in zip(RATING_BUCKETS, self.counts)]
+
+
+class RoastProfiles(Accumulator):
+    """Flavor profiles (overall + per roast) and the roast comparison table."""
+
+    def __init__(self):
+        self.overall = ScoreMeans()
+        self.roasts = {roast: {'count': 0, 'n_rated': 0, 'rating_total': 0,
+                               'prices': RowOrderSum(), 'scores': ScoreMeans()} for roast in ROASTS}
+
+    def add(self, r, rating, price, scores):
+        if scores is not None:
+            self.overall.add(scores)
+        entry = self.roasts.get(r.get('roast_category'))
+        if entry is None:
+            return
+        entry['count'] += 1
+        if scores is not None:
+            entry['scores'].add(scores)
+        if rating:
+            entry['n_rated'] += 1
+            entry['rating_total'] += rating
+        if price is not None:
+            entry['prices'].add(price)
+
+    def merge(self, other):
+        self.overall.merge(other.overall)
+        for roast in ROASTS:
+            e, o = self.roasts[roast], other.roasts[roast]
+            e['count'] += o['count']
+            e['n_rated'] += o['n_rated']
+            e['rating_total'] += o['rating_total']
+            e['prices'].merge(o['prices'])
+            e['scores'].merge(o['scores'])
+
+    def flavor_profiles(self):
+        return [{'label': 'Overall', **self.overall.avgs()}] + \
+               [{'label': roast, **self.roasts[roast]['scores'].avgs()} for roast in ROASTS]
+
+    def roast_comparison(self):
+        rows = []
+        for roast in ROASTS:
+            e = self.roasts[roast]
+            prices, avgs = e['prices'], e['scores'].avgs()
+            rows.append({
+                'roast': roast,
+                'count': e['count'],
+                'avgRating': rnd(_avg(e['rating_total'], e['n_rated'])),
+                'avgPrice': rnd(prices.mean(), 2) if prices.n else None,
+                'avgAroma': avgs['aroma'],
+                'avgAcidity': avgs['acidity'],
+                'avgBody': avgs['body'],
+                'avgFlavor': avgs['flavor'],
+                'avgAftertaste': avgs['aftertaste'],
+            })
+        return rows
+
+
+class PriceTiers(Accumulator):
+    def __init__(self):
+        self.tiers = [{'n': 0, 'total': 0, 'min': None, 'max': None} for _ in PRICE_TIERS]
+
+    def add(self, r, rating, price, scores):
+        if price is None or not rating:
+            return
+        for t, (_, _, lo, hi) in zip(self.tiers, PRICE_TIERS):
+            if lo < price <= hi:
+                t['n'] += 1
+                t['total'] += rating
+                t['min'] = rating if t['min'] is None else min(t['min'], rating)
+                t['max'] = rating if t['max'] is None else max(t['max'], rating)
+
+    def merge(self, other):
+        for t, o in zip(self.tiers, other.tiers):
+            t['n'] += o['n']
+            t['total'] += o['total']
+            for field, pick in (('min', min), ('max', max)):
+                if o[field] is not None:
+                    t[field] = o[field] if t[field] is None else pick(t[field], o[field])
+
+    def result(self):
+        return [{
+            'tier': name,
+            'range': label,
+            'count': t['n'],
+            'avgRating': rnd(_avg(t['total'], t['n'])),
+            'minRating': t['min'] if t['n'] else 0,
+            'maxRating': t['max'] if t['n'] else 0,
+        } for (name, label, _, _), t in zip(PRICE_TIERS, self.tiers)]
+
+
+class Highlights(Accumulator):
+    def __init__(self):
+        self.highest = None         # First review with the top rating
+        self.cheapest = None        # First 90+ review with the lowest price/oz
+        self.country_counts = {}    # All reviews with a country
+        self.country_prices = {}    # country -> RowOrderSum of price/oz
+
+    def add(self, r, rating, price, scores):
+        if rating and (self.highest is None or rating > self.highest['rating']):
+            self.highest = r
+        if price is not None and rating and rating >= 90 and (
+                self.cheapest is None or price < self.cheapest['price_per_oz_usd']):
+            self.cheapest = r
+        country = r.get('country')
+        if country:
+            self.country_counts[country] = self.country_counts.get(country, 0) + 1
+            if price is not None:
+                prices = self.country_prices.get(country)
+                if prices is None:
+                    prices = self.country_prices[country] = RowOrderSum()
+                prices.add(price)
+
+    def merge(self, other):
+        o = other.highest
+        if o is not None and (self.highest is None or o['rating'] > self.highest['rating']):
+            self.highest = o
+        o = other.cheapest
+        if o is not None and (self.cheapest is None or o['price_per_oz_usd'] < self.cheapest['price_per_oz_usd']):
+            self.cheapest = o
+        _merge_counts(self.country_counts, other.country_counts)
+        for country, prices in other.country_prices.items():
+            mine = self.country_prices.get(country)
+            if mine is None:
+                self.country_prices[country] = prices
+            else:
+                mine.merge(prices)
+
+    def result(self):
+        highest, cheapest = self.highest, self.cheapest
+        top_country = _first_max(self.country_counts)
+        exp_country = max(
+            [(c, rnd(p.mean(), 2)) for c, p in self.country_prices.items() if p.n >= 10],
+            key=lambda x: x[1], default=None
+        )
+        return {
+            'highestRatedBean': {
+                'title': highest['title'], 'rating': highest['rating'], 'roaster': highest['roaster']
+            } if highest else None,
+            'mostReviewedCountry': {
+                'country': top_country, 'count': self.country_counts[top_country]
+            } if top_country else None,
+            'mostExpensiveAvgCountry': {
+                'country': exp_country[0], 'avgPrice': exp_country[1]
+            } if exp_country else None,
+            'cheapestHighQuality': {
+                'title': cheapest['title'], 'rating': cheapest['rating'],
+                'price': f"${cheapest['price_per_oz_usd']:.2f}/oz"
+            } if cheapest else None,
+        }
+
+
+class RecentWindow(Accumulator):
+    """Reviews created after `cutoff` (the dashboard's monthly pulse)."""
+
+    def __init__(self, cutoff):
+        self.cutoff = cutoff
+        # ISO dates sort as strings; anything dated 2+ days before the cutoff
+        # is older whatever its UTC offset, so it skips the datetime parse
+        self._skip_before = (cutoff - timedelta(days=2)).date().isoformat()
+        self.count = 0
+        self.n_rated = 0
+        self.rating_total = 0
+        self.origins = {}
+        self.top = None
+
+    def add(self, r, rating, price, scores):
+        created = r.get('created_at')
+        if not created:
+            return
+        if created[4:5] == '-' and created[:10] < self._skip_before:
+            return
+        try:
+            # Handle ISO format with or without microseconds/Z
+            dt = datetime.fromisoformat(created.replace('Z', '+00:00'))
+            if dt <= self.cutoff:
+                return
+        except Exception:
+            return
+        self.count += 1
+        if rating:
+            self.n_rated += 1
+            self.rating_total += rating
+            if self.top is None or rating > self.top['rating']:
+                self.top = r
+        country = r.get('country')
+        if country:
+            self.origins[country] = self.origins.get(country, 0) + 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.n_rated += other.n_rated
+        self.rating_total += other.rating_total
+        _merge_counts(self.origins, other.origins)
+        if other.top is not None and (self.top is None or other.top['rating'] > self.top['rating']):
+            self.top = other.top
+
+    def result(self, total, last_updated):
+        return {
+            'total_reviews': total,
+            'recent_count_30d': self.count,
+            'recent_avg_rating': rnd(self.rating_total / self.n_rated) if self.n_rated else 0,
+            'recent_top_origin': _first_max(self.origins) or "N/A",
+            'recent_top_rated': self.top,
+            'last_updated': last_updated,
+        }
+
+
+class LatestReviews(Accumulator):
+    """The k reviews with the highest ids (min-heap of (id, row))."""
+
+    def __init__(self, k=RECENT_REVIEWS):
+        self.k = k
+        self.heap = []
+
+    def add(self, r, rating=None, price=None, scores=None):
+        rid = r['id']
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, (rid, r))
+        elif rid > self.heap[0][0]:
+            heapq.heapreplace(self.heap, (rid, r))
+
+    def merge(self, other):
+        for _, r in other.heap:
+            self.add(r)
+
+    def result(self):
+        return [r for _, r in sorted(self.heap, key=lambda x: -x[0])]
+
+
+# ─── All aggregates together ─────────────────────────────────────────────────
+
+class ReviewAggregates(Accumulator):
+    """Everything post_process writes, built in one pass over the reviews."""
+
+    def __init__(self, cutoff=None):
+        if cutoff is None:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=30)
+        self.total = 0
+        self.last_updated = None
+        self.roasters = GroupedRatings('roaster')
+        self.countries = GroupedRatings('country')
+        self.years = GroupedRatings('review_year')
+        self.buckets = RatingBuckets()
+        self.roasts = RoastProfiles()
+        self.tiers = PriceTiers()
+        self.highlights = Highlights()
+        self.recent = RecentWindow(cutoff)
+        self.latest = LatestReviews()
+        self.country_names = set()
+        self.year_values = set()
+        self._adders = [part.add for part in self._parts()]
+
+    def _parts(self):
+        return [self.roasters, self.countries, self.years, self.buckets, self.roasts,
+                self.tiers, self.highlights, self.recent, self.latest]
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_adders']  # Bound methods are rebuilt after unpickling
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._adders = [part.add for part in self._parts()]
+
+    def compact(self):
+        """Drop the price values kept for merge(); the state a later run merges into."""
+        for grouped in (self.roasters, self.countries, self.years):
+            for g in grouped.groups.values():
+                g.prices.compact()
+        for e in self.roasts.roasts.values():
+            e['prices'].compact()
+        for prices in self.highlights.country_prices.values():
+            prices.compact()
+
+    def set_recent(self, window):
+        """Swap in a RecentWindow built separately (it depends on today's date)."""
+        self.recent = window
+        self._adders = [part.add for part in self._parts()]
+
+    def add(self, r, rating, price, scores):
+        self.total += 1
+        created = r.get('created_at')
+        if created and (self.last_updated is None or created > self.last_updated):
+            self.last_updated = created
+        country = r.get('country')
+        if country:
+            self.country_names.add(country)
+        year = r.get('review_year')
+        if year:
+            self.year_values.add(year)
+        for add in self._adders:
+            add(r, rating, price, scores)
+
+    def update_all(self, reviews):
+        """add() every review, with every accumulator's per-row work inlined.
+
+        Calling nine add() methods per row (three of them calling GroupStats.add)
+        and re-reading the same fields in each cost more than the aggregation
+        itself. Results are identical to add(); bench_aggregates checks both.
+        """
+        roaster_groups = self.roasters.groups
+        country_groups = self.countries.groups
+        year_groups = self.years.groups
+        bucket_counts = self.buckets.counts
+        overall, roasts = self.roasts.overall, self.roasts.roasts
+        tiers = [(t, lo, hi) for t, (_, _, lo, hi) in zip(self.tiers.tiers, PRICE_TIERS)]
+        hl = self.highlights
+        country_counts, country_prices = hl.country_counts, hl.country_prices
+        recent = self.recent
+        skip_before = recent._skip_before
+        latest = self.latest
+        heap, k = latest.heap, latest.k
+        country_names, year_values = self.country_names, self.year_values
+        last_updated = self.last_updated
+        n = 0
+
+        for r in reviews:
+            n += 1
+            get = r.get
+            rating = get('rating')
+            p = get('price_per_oz_usd')
+            price = p if p and p > 0 else None
+            aroma, acidity, body, flavor, aftertaste = (get('aroma'), get('acidity'), get('body'),
+                                                        get('flavor'), get('aftertaste'))
+            scores = (aroma, acidity, body, flavor, aftertaste) \
+                if aroma and acidity and body and flavor and aftertaste else None
+            created = get('created_at')
+            if created and (last_updated is None or created > last_updated):
+                last_updated = created
+            country = get('country')
+            year = get('review_year')
+            roast = get('roast_category')
+            if country:
+                country_names.add(country)
+            if year:
+                year_values.add(year)
+
+            # GroupedRatings: roaster, country, year
+            if rating:
+                location = get('roaster_location')
+                for groups, key in ((roaster_groups, get('roaster')), (country_groups, country),
+                                    (year_groups, year)):
+                    if not key:
+                        continue
+                    g = groups.get(key)
+                    if g is None:
+                        g = groups[key] = GroupStats()
+                    g.n += 1
+                    g.total += rating
+                    if rating > g.top_score:
+                        g.top_score = rating
+                    if price is not None:
+                        g.prices.add(price)
+                    if location:
+                        g.location = location
+                    if roast:
+                        g.roasts[roast] = g.roasts.get(roast, 0) + 1
+
+                # RatingBuckets
+                i = BUCKET_OF.get(rating)
+                if i is not None:
+                    bucket_counts[i] += 1
+
+                # PriceTiers
+                if price is not None:
+                    for t, lo, hi in tiers:
+                        if lo < price <= hi:
+                            t['n'] += 1
+                            t['total'] += rating
+                            t['min'] = rating if t['min'] is None else min(t['min'], rating)
+                            t['max'] = rating if t['max'] is None else max(t['max'], rating)
+
+            # RoastProfiles
+            if scores is not None:
+                overall.add(scores)
+            entry = roasts.get(roast)
+            if entry is not None:
+                entry['count'] += 1
+                if scores is not None:
+                    entry['scores'].add(scores)
+                if rating:
+                    entry['n_rated'] += 1
+                    entry['rating_total'] += rating
+                if price is not None:
+                    entry['prices'].add(price)
+
+            # Highlights
+            if rating and (hl.highest is None or rating > hl.highest['rating']):
+                hl.highest = r
+            if price is not None and rating and rating >= 90 and (
+                    hl.cheapest is None or price < hl.cheapest['price_per_oz_usd']):
+                hl.cheapest = r
+            if country:
+                country_counts[country] = country_counts.get(country, 0) + 1
+                if price is not None:
+                    prices = country_prices.get(country)
+                    if prices is None:
+                        prices = country_prices[country] = RowOrderSum()
+                    prices.add(price)
+
+            # RecentWindow (the cheap string test first, as in RecentWindow.add)
+            if created and not (created[4:5] == '-' and created[:10] < skip_before):
+                recent.add(r, rating, price, scores)
+
+            # LatestReviews
+            rid = r['id']
+            if len(heap) < k:
+                heapq.heappush(heap, (rid, r))
+            elif rid > heap[0][0]:
+                heapq.heapreplace(heap, (rid, r))
+
+        self.total += n
+        self.last_updated = last_updated
+        return self
+
+    def merge(self, other):
+        """Fold in aggregates of reviews that come after this one's."""
+        self.total += other.total
+        if other.last_updated and (self.last_updated is None or other.last_updated > self.last_updated):
+            self.last_updated = other.last_updated
+        self.country_names |= other.country_names
+        self.year_values |= other.year_values
+        for part, o in zip(self._parts(), other._parts()):
+            part.merge(o)
+        return self
+
+    # ─── Table rows ──────────────────────────────────────────────────────────
+
+    def roaster_rows(self):
+        return [{
+            'name': name,
+            'location': g.location,
+            'review_count': g.n,
+            'avg_rating': g.avg_rating(),
+            'top_score': g.top_score,
+            'avg_price_per_oz': g.avg_price(),
+        } for name, g in self.roasters.groups.items()]
+
+    def country_rows(self):
+        return [{
+            'name': name,
+            'review_count': g.n,
+            'avg_rating': g.avg_rating(),
+            'avg_price_per_oz': g.avg_price(),
+            'top_score': g.top_score,
+            'dominant_roast': _first_max(g.roasts),
+        } for name, g in self.countries.groups.items() if g.n >= 3]
+
+    # ─── insights_cache entries ──────────────────────────────────────────────
+
+    def insights(self):
+        """insights_cache key -> value, in the order post_process always wrote them."""
+        yearly = sorted([{
+            'year': year,
+            'avgRating': g.avg_rating(),
+            'count': g.n,
+            'avgPrice': g.avg_price(),
+        } for year, g in self.years.groups.items()], key=lambda x: x['year'])
+
+        top_roasters = sorted([{
+            'roaster': name[:30] + '…' if len(name) > 30 else name,
+            'avgRating': g.avg_rating(),
+            'count': g.n,
+            'topScore': g.top_score,
+        } for name, g in self.roasters.groups.items() if g.n >= 5],
+            key=lambda x: -x['avgRating'])[:15]
+
+        country_stats = [{
+            'country': name,
+            'count': g.n,
+            'avgRating': g.avg_rating(),
+            'avgPrice': g.avg_price(),
+            'topRoast': _first_max(g.roasts) or 'N/A',
+            'topScore': g.top_score,
+        } for name, g in self.countries.groups.items() if g.n >= 3]
+        country_stats.sort(key=lambda x: -x['count'])
+
+        return {
+            'total_reviews': self.total,
+            'rating_distribution': self.buckets.result(),
+            'yearly_trends': yearly,
+            'top_roasters': top_roasters,
+            'flavor_profiles': self.roasts.flavor_profiles(),
+            'roast_comparison': self.roasts.roast_comparison(),
+            'country_stats': country_stats,
+            'price_tiers': self.tiers.result(),
+            'highlights': self.highlights.result(),
+            'dashboard_stats': self.recent.result(self.total, self.last_updated),
+            'recent_reviews': self.latest.result(),
+            'filter_options': {
+                'countries': sorted(self.country_names),
+                'years': sorted(self.year_values, reverse=True),
+            },
+        }
+
+
+# ─── Sharded aggregation ─────────────────────────────────────────────────────
+
+_SHARD_SOURCE = None  # The full review list, inherited by forked shard workers
+
+
+def _aggregate_shard(reviews, cutoff):
+    return ReviewAggregates(cutoff).update_all(reviews)
+
+
+def _aggregate_slice(start, end, cutoff):
+    return _aggregate_shard(_SHARD_SOURCE[start:end], cutoff)
+
+
+def aggregate(reviews, workers=None, cutoff=None, min_shard_rows=MIN_SHARD_ROWS):
+    """Aggregate reviews in one pass, sharded across processes when large.
+
+    Shards are contiguous slices merged left to right, so ties resolve to the
+    earliest review just as a single pass would. Where fork is available the
+    workers read their slice of the parent's list directly instead of having
+    it pickled over.
+    """
+    global _SHARD_SOURCE
+    if cutoff is None:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=30)
+    workers = workers or os.cpu_count() or 1
+    shards = min(workers, len(reviews) // min_shard_rows)
+    if shards <= 1:
+        return _aggregate_shard(reviews, cutoff)
+    size = -(-len(reviews) // shards)
+    bounds = [(i, min(i + size, len(reviews))) for i in range(0, len(reviews), size)]
+    if 'fork' in mp.get_all_start_methods():
+        _SHARD_SOURCE = reviews
+        try:
+            with ProcessPoolExecutor(max_workers=shards, mp_context=mp.get_context('fork')) as pool:
+                parts = list(pool.map(_aggregate_slice, *zip(*bounds), [cutoff] * len(bounds)))
+        finally:
+            _SHARD_SOURCE = None
+    else:
+        with ProcessPoolExecutor(max_workers=shards) as pool:
+            parts = list(pool.map(_aggregate_shard, [reviews[a:b] for a, b in bounds], [cutoff] * len(bounds)))
+    result = parts[0]
+    for part in parts[1:]:
+        result.merge(part)
+    return result
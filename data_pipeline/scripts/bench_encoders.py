@@ -0,0 +1,145 @@
+"""
+Encoder Backend Parity Check & Benchmark
+Encodes the review corpus (the texts generate_embeddings.py embeds, from
+web/src/data/coffee_data.csv) with the torch and ONNX int8 backends of
+encoders.py, each in a fresh process so import time and peak RSS are its own,
+then checks that they agree:
+
+    cosine     per-text cosine between the two backends' vectors
+    top-k      overlap of each text's k nearest reviews under either backend
+
+and reports import time, model load time, peak RSS and encodes/sec per backend.
+
+Usage:
+    python data_pipeline/scripts/bench_encoders.py                 # full corpus
+    python data_pipeline/scripts/bench_encoders.py --limit 500 --json logs/bench_encoders.json
+"""
+
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+
+BACKENDS = ['torch', 'onnx']
+CSV_PATH = os.path.join('web', 'src', 'data', 'coffee_data.csv')
+MIN_COSINE = 0.98  # Lowest acceptable 1st-percentile cosine between backends
+IMPORTS = {'torch': 'sentence_transformers', 'onnx': 'onnxruntime'}
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def corpus_texts(limit=None):
+    from snapshot import load_csv
+    from generate_embeddings import embed_text
+    df = load_csv(CSV_PATH, columns=['name', 'review', 'roast'])
+    texts = [embed_text(row) for row in df.to_dict('records')]
+    return texts[:limit] if limit else texts
+
+
+def run(name, texts_path, out_path, batch_size):
+    """Child: import, load and encode with one backend; print timings as JSON."""
+    import importlib
+    with open(texts_path) as f:
+        texts = json.load(f)
+    base_rss = peak_rss_mb()
+    t0 = time.perf_counter()
+    importlib.import_module(IMPORTS[name])
+    imported = time.perf_counter()
+    from encoders import load_encoder
+    model = load_encoder(name)
+    loaded = time.perf_counter()
+    model.encode(texts[:batch_size], batch_size=batch_size)  # Warm up
+    t1 = time.perf_counter()
+    vectors = np.asarray(model.encode(texts, batch_size=batch_size), dtype=np.float32)
+    elapsed = time.perf_counter() - t1
+    np.save(out_path, vectors)
+    print(json.dumps({
+        'backend': name,
+        'import_s': imported - t0,
+        'load_s': loaded - imported,
+        'texts_per_s': len(texts) / elapsed,
+        'peak_rss_mb': peak_rss_mb(),
+        'base_rss_mb': base_rss,
+    }))
+
+
+def top_k(vectors, k):
+    scores = vectors @ vectors.T
+    np.fill_diagonal(scores, -np.inf)
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+
+def agreement(a, b, k=10):
+    """Cosine and top-k neighbour overlap of two row-aligned unit-vector matrices."""
+    cos = np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    k = min(k, len(a) - 1)
+    overlap = np.mean([len(np.intersect1d(x, y)) / k for x, y in zip(top_k(a, k), top_k(b, k))]) if k > 0 else 1.0
+    return {'cosine_mean': float(cos.mean()), 'cosine_min': float(cos.min()),
+            'cosine_p1': float(np.percentile(cos, 1)), f'top{k}_overlap': float(overlap)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cosine agreement and speed: torch vs ONNX int8 encoder')
+    parser.add_argument('--limit', type=int, help='Only the first N corpus texts')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('-k', type=int, default=10, help='Neighbours compared per text')
+    parser.add_argument('--min-cosine', type=float, default=MIN_COSINE,
+                        help='Fail if the 1st-percentile cosine is below this')
+    parser.add_argument('--json', help='Also write the results to this file')
+    parser.add_argument('--run', choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument('--texts', help=argparse.SUPPRESS)
+    parser.add_argument('--out', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(args.run, args.texts, args.out, args.batch_size)
+        return
+
+    texts = corpus_texts(args.limit)
+    print(f"📚 {len(texts)} review texts from {CSV_PATH}")
+    results, vectors = [], {}
+    with tempfile.TemporaryDirectory() as tmp:
+        texts_path = os.path.join(tmp, 'texts.json')
+        with open(texts_path, 'w') as f:
+            json.dump(texts, f)
+        for name in BACKENDS:
+            out_path = os.path.join(tmp, f'{name}.npy')
+            out = subprocess.run([sys.executable, __file__, '--run', name, '--texts', texts_path,
+                                  '--out', out_path, '--batch-size', str(args.batch_size)],
+                                 capture_output=True, text=True)
+            if out.returncode != 0:
+                print(f"❌ {name} backend failed:\n{out.stderr.strip()}")
+                sys.exit(1)
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+            vectors[name] = np.load(out_path)
+
+    print(f"\n   {'backend':<8} {'import':>8} {'load':>8} {'texts/s':>9} {'peak RSS':>10}")
+    for r in results:
+        print(f"   {r['backend']:<8} {r['import_s']:7.2f}s {r['load_s']:7.2f}s {r['texts_per_s']:9.1f} "
+              f"{r['peak_rss_mb']:8.0f}MB")
+
+    agree = agreement(vectors['torch'], vectors['onnx'], args.k)
+    overlap_key = next(key for key in agree if key.startswith('top'))
+    print(f"\n   cosine mean {agree['cosine_mean']:.5f}, p1 {agree['cosine_p1']:.5f}, "
+          f"min {agree['cosine_min']:.5f}; {overlap_key.replace('_', ' ')} {agree[overlap_key]:.3f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'texts': len(texts), 'batch_size': args.batch_size, 'results': results,
+                       'agreement': agree}, f, indent=2)
+    if agree['cosine_p1'] < args.min_cosine:
+        print(f"\n❌ Backends disagree: 1st-percentile cosine below {args.min_cosine}")
+        sys.exit(1)
+    print("\n✅ ONNX backend agrees with torch")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Columnar Frame Benchmark
+Runs the post_process aggregation three ways, each in a fresh process so peak
+RSS is its own, and checks they produce identical output:
+
+    reference  list of dicts + the original multi-pass functions
+    dict       list of dicts + one-pass ReviewAggregates (current default)
+    frame      rows streamed into a ReviewFrame + vectorized group-bys
+
+Rows come from bench_aggregates' CSV sample (--scale copies of it).
+
+Usage:
+    python data_pipeline/scripts/bench_frame.py --scale 100
+"""
+
+import sys
+import json
+import time
+import hashlib
+import resource
+import argparse
+import subprocess
+from datetime import datetime, timedelta
+
+MODES = ['reference', 'dict', 'frame']
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def run(mode, scale, now):
+    """Child: aggregate once and print timing, memory and an output digest as JSON."""
+    from bench_aggregates import iter_sample_reviews, reference
+    from aggregates import ReviewAggregates
+    from review_frame import ReviewFrame
+
+    cutoff = now - timedelta(days=30)
+    base_rss = peak_rss_mb()
+    t0 = time.perf_counter()
+    if mode == 'frame':
+        frame = ReviewFrame.from_rows(iter_sample_reviews(scale, now=now), cutoff=cutoff)
+        loaded = time.perf_counter()
+        out = (frame.roaster_rows(), frame.country_rows(), frame.insights())
+    else:
+        rows = list(iter_sample_reviews(scale, now=now))
+        loaded = time.perf_counter()
+        if mode == 'reference':
+            out = reference(rows)
+        else:
+            agg = ReviewAggregates(cutoff).update_all(rows)
+            out = (agg.roaster_rows(), agg.country_rows(), agg.insights())
+    done = time.perf_counter()
+
+    roasters, countries, insights = out
+    # The reference derives its 30-day window from the clock, so leave that key out
+    insights = {k: v for k, v in insights.items() if k != 'dashboard_stats'}
+    digest = hashlib.sha256(json.dumps([roasters, countries, insights], default=str).encode()).hexdigest()
+    print(json.dumps({
+        'mode': mode,
+        'load_s': loaded - t0,
+        'aggregate_s': done - loaded,
+        'total_s': done - t0,
+        'peak_rss_mb': peak_rss_mb(),
+        'base_rss_mb': base_rss,
+        'digest': digest,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Peak RSS and runtime: dict aggregation vs ReviewFrame')
+    parser.add_argument('--scale', type=int, default=50, help='Copies of the CSV sample (~2k rows each)')
+    parser.add_argument('--modes', default=','.join(MODES), help='Comma-separated subset of ' + ', '.join(MODES))
+    parser.add_argument('--json', help='Also write the results to this file')
+    parser.add_argument('--run', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--now', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(args.run, args.scale, datetime.fromisoformat(args.now))
+        return
+
+    now = datetime.now().astimezone().isoformat()
+    results = []
+    for mode in args.modes.split(','):
+        out = subprocess.run([sys.executable, __file__, '--run', mode, '--scale', str(args.scale), '--now', now],
+                             capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"📦 {args.scale} × CSV sample\n")
+    print(f"   {'mode':<10} {'load':>8} {'aggregate':>10} {'total':>8} {'peak RSS':>10} {'Δ RSS':>9}")
+    for r in results:
+        print(f"   {r['mode']:<10} {r['load_s']:7.2f}s {r['aggregate_s']:9.2f}s {r['total_s']:7.2f}s "
+              f"{r['peak_rss_mb']:8.0f}MB {r['peak_rss_mb'] - r['base_rss_mb']:7.0f}MB")
+    if len({r['digest'] for r in results}) == 1:
+        print("\n✅ All modes produced identical output")
+    else:
+        print("\n❌ Outputs differ: " + ', '.join(f"{r['mode']}={r['digest'][:12]}" for r in results))
+        sys.exit(1)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'scale': args.scale, 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
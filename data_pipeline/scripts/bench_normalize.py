@@ -0,0 +1,271 @@
+"""
+Normalization Parity Check & Benchmark
+Compares the normalize.py extractors against the original per-row functions
+from migrate_clean.py (kept below as the reference implementation) and times
+both over a realistic column of values.
+
+Inputs are the origin / roast / review_date columns of
+web/src/data/coffee_data.csv, price strings from a hand-written list covering
+every currency and unit branch, plus any price strings found in
+data_pipeline/logs/*.json dumps.
+
+Usage:
+    python data_pipeline/scripts/bench_normalize.py --check   # parity only
+    python data_pipeline/scripts/bench_normalize.py           # parity + rows/sec
+"""
+
+import os
+import re
+import sys
+import csv
+import glob
+import json
+import time
+import random
+import argparse
+
+import normalize
+from normalize import COFFEE_COUNTRIES, ROAST_MAP, normalize_column
+
+CSV_PATH = os.path.join('web', 'src', 'data', 'coffee_data.csv')
+
+# Price strings in the formats seen on coffeereview.com, one or more per branch
+PRICE_SAMPLES = [
+    '$18.00/12 ounces', '$24.99/16 oz.', '$22/8 ounces', '$1,250.00/5 pounds', '$16.00/340 grams',
+    '18.00/12 ounces', 'E 12.50/250 grams', '€14.00/250 g', 'EUR 20/1 kg', '£9.50/227 grams',
+    'GBP 12/250g', 'NT $450/8 ounces', 'NT$1,200/1 lb', 'TWD 600/227 grams', 'THB 550/250 grams',
+    'KRW 20,000/200 grams', 'GTQ 120/454 grams', '180 pesos/340 grams', 'RMB 128/200 grams',
+    'CNY 98/227 g', '¥2,800/200 grams', 'RM 45/250 grams', 'JPY 1,800/100 g', '1,500 yen/200 grams',
+    'AUD $25/250 grams', 'A$30/500g', 'CAD $21/340 grams', 'C$19.99/12 oz', '#18.00/12 ounces',
+    '$12.00/12-ounce bag', '$14/12 ounce', '$40.00/2 lb', '$19.95/1 pound', '$65/2.2 kilograms',
+    '$15/10 ounces; $120/5 lbs', '$6.50/12 K-Cup pods', 'N/A', 'NA', ' na ', '', 'Unknown',
+    '$8.99/10.5 oz.', '$17.00/12 ouncues', '$17.00/12 ounces (340 grams)', 'HK$200/227 grams',
+    '$24.00/1 kg bag', '$32/250 g. + 250 g', 'Price not available', '$45.00/100 grams (4 x 25g)',
+]
+
+
+# ─── Reference implementation (migrate_clean.py extractors, 601be83) ─────────
+
+def extract_country_reference(origin: str) -> str | None:
+    """Extract country from origin text."""
+    if not origin:
+        return None
+    origin_lower = origin.lower()
+    for country in COFFEE_COUNTRIES:
+        if country.lower() in origin_lower:
+            return country
+    return None
+
+
+def extract_price_reference(price: str) -> tuple[float | None, str | None]:
+    """Extract numeric price and currency from price text."""
+    if not price:
+        return None, None
+    
+    # Skip N/A values
+    if 'N/A' in price.upper() or price.strip().upper() == 'NA':
+        return None, None
+    
+    # Detect currency from price string
+    price_upper = price.upper()
+    
+    # Check for specific currency patterns (order matters - more specific first)
+    if 'NT' in price_upper or 'NTD' in price_upper or 'TWD' in price_upper or 'NT$' in price_upper:
+        currency = 'NTD'
+    elif 'THB' in price_upper:
+        currency = 'THB'  # Thai Baht
+    elif 'KRW' in price_upper:
+        currency = 'KRW'  # Korean Won
+    elif 'GTQ' in price_upper:
+        currency = 'GTQ'  # Guatemalan Quetzal
+    elif 'PESOS' in price_upper:
+        currency = 'MXN'  # Assume Mexican Peso
+    elif 'RMB' in price_upper or 'CNY' in price_upper:
+        currency = 'CNY'  # Chinese Yuan
+    elif '¥' in price:
+        currency = 'CNY'  # Assume Chinese Yuan for ¥
+    elif 'RM' in price_upper and 'RMB' not in price_upper:
+        currency = 'MYR'  # Malaysian Ringgit
+    elif '€' in price or 'EUR' in price_upper or 'EUROS' in price_upper:
+        currency = 'EUR'
+    elif re.match(r'^E\s*\d', price):  # "E 50.00" pattern
+        currency = 'EUR'
+    elif '£' in price or 'GBP' in price_upper:
+        currency = 'GBP'
+    elif 'JPY' in price_upper or 'YEN' in price_upper:
+        currency = 'JPY'
+    elif '$' in price or '#' in price:  # '#' is typo for '$'
+        if 'AUD' in price_upper or 'A$' in price_upper:
+            currency = 'AUD'
+        elif 'CAD' in price_upper or 'C$' in price_upper:
+            currency = 'CAD'
+        else:
+            currency = 'USD'
+    elif re.match(r'^\d+\.\d{2}/', price):  # "18.00/12 ounces" without $
+        currency = 'USD'  # Assume USD if no currency symbol
+    else:
+        currency = None  # Unknown currency
+    
+    # Find first number pattern like 18.00 or just 18 (handle commas in numbers like 40,000)
+    match = re.search(r'(\d{1,3}(?:,\d{3})*(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?)', price)
+    if match:
+        num_str = match.group(1).replace(',', '')
+        return float(num_str), currency
+    return None, None
+
+
+def extract_weight_reference(price: str) -> tuple[float | None, str | None]:
+    """Extract weight/quantity and unit from price text. Returns (weight_oz, unit)."""
+    if not price:
+        return None, None
+    
+    price_lower = price.lower()
+    
+    # Try to match ounces (12 ounces, 8 oz, ouncues typo, etc.)
+    oz_match = re.search(r'(\d+(?:\.\d+)?)\s*[-/]?\s*(ounces?|oz\.?|ounc[eu]+s?)\b', price_lower)
+    if oz_match:
+        return float(oz_match.group(1)), 'oz'
+    
+    # Try to match grams (250 grams, 200g, etc.)
+    gram_match = re.search(r'(\d+(?:\.\d+)?)\s*(grams?|g)\b', price_lower)
+    if gram_match:
+        grams = float(gram_match.group(1))
+        # Convert to ounces (1 oz = 28.35 grams)
+        return round(grams / 28.35, 2), 'g'
+    
+    # Try to match pounds (1 pound, 5 pounds)
+    pound_match = re.search(r'(\d+(?:\.\d+)?)\s*(pounds?|lb)\b', price_lower)
+    if pound_match:
+        pounds = float(pound_match.group(1))
+        # Convert to ounces (1 pound = 16 oz)
+        return round(pounds * 16, 2), 'lb'
+    
+    # Try to match kilograms (1 kg, 1 kilogram)
+    kg_match = re.search(r'(\d+(?:\.\d+)?)\s*(kilograms?|kg\.?)\b', price_lower)
+    if kg_match:
+        kg = float(kg_match.group(1))
+        # Convert to ounces (1 kg = 35.27 oz)
+        return round(kg * 35.27, 2), 'kg'
+    
+    return None, None
+
+
+def extract_year_reference(review_date: str) -> int | None:
+    """Extract year from review date text."""
+    if not review_date:
+        return None
+    # Find 4-digit year
+    match = re.search(r'(20\d{2}|19\d{2})', review_date)
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def normalize_roast_reference(roast_level: str) -> str | None:
+    """Normalize roast level to Light/Medium/Dark."""
+    if not roast_level:
+        return None
+    roast_lower = roast_level.lower().strip()
+    for key, category in ROAST_MAP.items():
+        if key in roast_lower:
+            return category
+    return None
+
+
+REFERENCE = {
+    'extract_country': extract_country_reference,
+    'extract_price': extract_price_reference,
+    'extract_weight': extract_weight_reference,
+    'extract_year': extract_year_reference,
+    'normalize_roast': normalize_roast_reference,
+}
+
+
+# ─── Inputs ───────────────────────────────────────────────────────────────────
+
+def load_columns():
+    """Return {extractor name: list of raw values} from the CSV and sample prices."""
+    origins, roasts, dates = [], [], []
+    if os.path.exists(CSV_PATH):
+        with open(CSV_PATH, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                origins.append(row['origin'])
+                roasts.append(row['roast'])
+                dates.append(row['review_date'])
+    prices = list(PRICE_SAMPLES)
+    for path in glob.glob(os.path.join('data_pipeline', 'logs', '*.json')):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for row in data if isinstance(data, list) else [data]:
+            if isinstance(row, dict) and isinstance(row.get('price'), str):
+                prices.append(row['price'])
+    # Origins mixing several countries, so list-order priority is exercised
+    rng = random.Random(0)
+    for _ in range(500):
+        picks = rng.sample(COFFEE_COUNTRIES, 3)
+        origins.append(f"{picks[0]} and {picks[1].upper()}; {picks[2].lower()} region")
+    return {
+        'extract_country': origins + [None, '', 'Blend of unspecified origins', 'Guinea-Bissau, New Guinea'],
+        'extract_price': prices + [None],
+        'extract_weight': prices + [None],
+        'extract_year': dates + [None, '', 'Spring 1999', 'Reviewed 2024-05'],
+        'normalize_roast': roasts + [None, '', *ROAST_MAP, 'Extra Dark'],
+    }
+
+
+# ─── Parity & timing ──────────────────────────────────────────────────────────
+
+def check(columns):
+    failures = 0
+    for name, values in columns.items():
+        fast = getattr(normalize, name)
+        for v in values:
+            expected, actual = REFERENCE[name](v), fast(v)
+            if expected != actual:
+                failures += 1
+                print(f"  ❌ {name}({v!r}): expected {expected!r}, got {actual!r}")
+    return failures
+
+def rows_per_sec(fn, values, min_seconds=0.5):
+    n, t0 = 0, time.perf_counter()
+    while True:
+        fn(values)
+        n += len(values)
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_seconds:
+            return n / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parity check and benchmark for normalize.py')
+    parser.add_argument('--check', action='store_true', help='Only run the parity check')
+    parser.add_argument('--rows', type=int, default=50_000, help='Rows per benchmark column')
+    args = parser.parse_args()
+
+    columns = load_columns()
+    failures = check(columns)
+    if failures:
+        print(f"❌ {failures} mismatches")
+        sys.exit(1)
+    print(f"✅ All extractors match on {sum(len(v) for v in columns.values())} values")
+    if args.check:
+        return
+
+    print(f"\n⏱️  Rows/sec over {args.rows} rows per column (higher is better):")
+    print(f"   {'extractor':<16} {'reference':>12} {'uncached':>12} {'column':>12}")
+    for name, values in columns.items():
+        col = [values[i % len(values)] for i in range(args.rows)]
+        fast = getattr(normalize, name)
+        ref = rows_per_sec(lambda vs: [REFERENCE[name](v) for v in vs], col)
+        # Compiled patterns alone: bypass the memo cache
+        raw = rows_per_sec(lambda vs: [fast.__wrapped__(v) for v in vs], col)
+        fast.cache_clear()
+        colr = rows_per_sec(lambda vs: normalize_column(vs, fast), col)
+        print(f"   {name:<16} {ref:12,.0f} {raw:12,.0f} {colr:12,.0f}  ({colr / ref:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
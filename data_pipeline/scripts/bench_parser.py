@@ -0,0 +1,250 @@
+"""
+Parser Parity Check & Benchmark
+Compares review_parser.parse_review against the original scraper parser
+(kept below as the reference implementation) and times both.
+
+Pages come from data_pipeline/logs/golden/*.html, each with an expected
+.json produced by the reference parser, plus up to --max-cached pages from
+the HTTP cache.
+
+Usage:
+    python data_pipeline/scripts/bench_parser.py --check          # parity only
+    python data_pipeline/scripts/bench_parser.py                  # parity + pages/sec
+    python data_pipeline/scripts/bench_parser.py --update-golden  # rewrite expected JSON
+"""
+
+import os
+import re
+import sys
+import json
+import glob
+import time
+import argparse
+
+from review_parser import parse_review, PARSER
+from http_cache import HttpCache, CACHE_DIR
+
+GOLDEN_DIR = os.path.join('data_pipeline', 'logs', 'golden')
+
+
+# ─── Reference implementation (BeautifulSoup parse_review, fe07bea) ───────────
+
+def normalize_key(k):
+    """Normalize metadata keys: 'Review Date:' -> 'review_date'"""
+    return k.lower().replace(':', '').replace(' ', '_').strip()
+
+def clean_text(text):
+    """Remove junk patterns from extracted text"""
+    if not text: return ""
+    junk_patterns = [
+        r'Roaster Location:.*', r'Coffee Origin:.*', r'Roast Level:.*',
+        r'Agtron:.*', r'Review Date:.*', r'Aroma:.*', r'Acidity:.*',
+        r'Body:.*', r'Flavor:.*', r'Aftertaste:.*', r'Blind Assessment:?',
+        r'Notes:?', r'Who Should Drink It:?', r'Explore Similar.*', r'Bottom Line:?'
+    ]
+    cleaned = text
+    for p in junk_patterns:
+        cleaned = re.sub(p, '', cleaned, flags=re.IGNORECASE)
+    return cleaned.strip()
+
+def parse_review_reference(url, content):
+    from bs4 import BeautifulSoup
+    try:
+        soup = BeautifulSoup(content, 'html.parser')
+
+        # === 1. METADATA FROM TABLES (there are multiple tables) ===
+        meta = {}
+        tables = soup.select('.review-template-table')  # Get ALL tables, not just first
+        for table in tables:
+            for row in table.find_all('tr'):
+                tds = row.find_all('td')
+                if len(tds) >= 2:
+                    raw_key = tds[0].get_text(strip=True)
+                    raw_val = tds[1].get_text(strip=True)
+                    # Normalize key
+                    key = normalize_key(raw_key)
+                    # Clean value (remove leaked labels)
+                    val = re.sub(r'Review Date.*', '', raw_val, flags=re.I).strip()
+                    meta[key] = val
+
+        # === 2. RATING (High Precision) ===
+        rating = 0
+        rating_el = soup.select_one('.review-template-rating')
+        if rating_el:
+            m = re.search(r'(\d+)', rating_el.get_text())
+            if m: rating = int(m.group(1))
+
+        if rating == 0:
+            # Fallback: Look for big number at start
+            content_txt = soup.get_text()
+            m = re.search(r'(\d{2})\s*\n+\s*[A-Z]', content_txt)
+            if m: rating = int(m.group(1))
+
+        # === 3. ROASTER PARSING ===
+        title_full = soup.title.string if soup.title else ""
+        roaster = meta.get('roaster', 'Unknown')
+        if roaster == "Unknown" and " by " in title_full:
+            roaster = title_full.split(" by ")[1].split(" Review")[0].strip()
+
+        # === 4. PRICE PARSING (handles multiple label formats) ===
+        price = meta.get('price') or meta.get('est._price') or meta.get('est_price') or 'N/A'
+        if price == "N/A" or not price or "Review Date" in price:
+            p_match = re.search(r'\$\d+\.\d+(?:\s*/\s*[\w\s]+)?', soup.get_text())
+            if p_match: price = p_match.group(0).strip()
+        price = re.sub(r'Review Date.*', '', price, flags=re.I).strip()
+
+        # === 5. EXTRACT TEXT SECTIONS ===
+        def extract_section(header_text):
+            h = soup.find(['h2', 'strong', 'p'], string=re.compile(header_text, re.I))
+            if not h: return ""
+            content = []
+            curr = h.find_next()
+            while curr and curr.name not in ['h1', 'h2', 'table']:
+                if curr.name == 'p':
+                    txt = curr.get_text(strip=True)
+                    if any(x in txt for x in ["Notes", "Who Should Drink", "Explore Similar", "Bottom Line"]):
+                        break
+                    content.append(txt)
+                curr = curr.find_next()
+            return ' '.join(content)
+
+        blind_assessment = clean_text(extract_section("Blind Assessment"))
+        notes = clean_text(extract_section("Notes"))
+        bottom_line = clean_text(extract_section("Bottom Line"))
+        with_milk = clean_text(extract_section("With Milk"))  # For espresso reviews
+
+        # === 6. METRIC SCORES (from metadata) ===
+        def get_int(key):
+            val = meta.get(key, '0')
+            m = re.search(r'(\d+)', str(val))
+            return int(m.group(1)) if m else 0
+
+        # === BUILD DATA DICT ===
+        data = {
+            "title": soup.select_one('h1').get_text(strip=True) if soup.select_one('h1') else "Unknown",
+            "roaster": roaster,
+            "roaster_location": meta.get('roaster_location', meta.get('roaster', 'Unknown')),
+            "roast_level": meta.get('roast_level', 'Unknown'),
+            "agtron": meta.get('agtron', 'N/A'),
+            "origin": meta.get('coffee_origin', meta.get('origin', 'Unknown')),
+            "price": price if price else 'N/A',
+            "review_date": meta.get('review_date', 'Unknown'),
+            "rating": rating,
+            "blind_assessment": blind_assessment,
+            "notes": notes,
+            "bottom_line": bottom_line,
+            "with_milk": with_milk if with_milk else None,
+            "url": url,
+        }
+
+        # Store trimmed HTML for future re-parsing
+        entry_content = soup.select_one('.entry-content')
+        data["raw_content"] = str(entry_content) if entry_content else None
+
+        data["aroma"] = get_int('aroma')
+        data["acidity"] = get_int('acidity/structure') or get_int('acidity')  # Handle both labels
+        data["body"] = get_int('body')
+        data["flavor"] = get_int('flavor')
+        data["aftertaste"] = get_int('aftertaste')
+
+        return data
+    except Exception as e:
+        print(f"Error scraping {url}: {e}")
+        return None
+
+
+# ─── Page loading ─────────────────────────────────────────────────────────────
+
+def golden_pages():
+    """Yield (url, html bytes, expected json path) for each golden page."""
+    for path in sorted(glob.glob(os.path.join(GOLDEN_DIR, '*.html'))):
+        slug = os.path.splitext(os.path.basename(path))[0]
+        with open(path, 'rb') as f:
+            yield f"https://www.coffeereview.com/review/{slug}/", f.read(), path[:-5] + '.json'
+
+def cached_pages(limit):
+    """Yield (url, html bytes) for up to `limit` pages in the HTTP cache."""
+    cache = HttpCache(CACHE_DIR, offline=True)
+    for path in sorted(glob.glob(os.path.join(CACHE_DIR, 'urls', '*', '*.json')))[:limit]:
+        with open(path) as f:
+            url = json.load(f)['url']
+        body, _ = cache.get(url)
+        if body is not None:
+            yield url, body
+
+
+# ─── Parity & timing ──────────────────────────────────────────────────────────
+
+def diff(expected, actual):
+    if expected is None or actual is None:
+        return ['<whole row>'] if expected != actual else []
+    return [k for k in expected.keys() | actual.keys() if expected.get(k) != actual.get(k)]
+
+def check(pages, parsers):
+    """Compare every parser against the expected rows. Returns the mismatch count."""
+    failures = 0
+    for url, html, expected in pages:
+        for name, fn in parsers.items():
+            fields = diff(expected, fn(url, html))
+            if fields:
+                failures += 1
+                print(f"  ❌ {name} differs on {url}: {', '.join(sorted(fields))}")
+    return failures
+
+def pages_per_sec(fn, pages, min_seconds=1.0):
+    n, t0 = 0, time.perf_counter()
+    while True:
+        for url, html, _ in pages:
+            fn(url, html)
+            n += 1
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_seconds:
+            return n / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parity check and benchmark for review_parser')
+    parser.add_argument('--check', action='store_true', help='Only run the parity check')
+    parser.add_argument('--update-golden', action='store_true',
+                        help='Regenerate golden .json files with the reference parser')
+    parser.add_argument('--max-cached', type=int, default=500, help='Cached pages to include')
+    args = parser.parse_args()
+
+    golden = list(golden_pages())
+    if args.update_golden:
+        for url, html, json_path in golden:
+            with open(json_path, 'w') as f:
+                json.dump(parse_review_reference(url, html), f, indent=2, ensure_ascii=False)
+                f.write('\n')
+        print(f"✅ Wrote {len(golden)} golden files to {GOLDEN_DIR}")
+        return
+
+    pages = []
+    for url, html, json_path in golden:
+        with open(json_path) as f:
+            pages.append((url, html, json.load(f)))
+    cached = [(url, html, parse_review_reference(url, html)) for url, html in cached_pages(args.max_cached)]
+    pages.extend(cached)
+    print(f"📄 {len(golden)} golden + {len(cached)} cached pages")
+
+    parsers = {'reference': parse_review_reference, f'fast[{PARSER}]': parse_review}
+    if PARSER != 'html.parser':
+        parsers['fast[html.parser]'] = lambda url, html: parse_review(url, html, parser='html.parser')
+    failures = check(pages, parsers)
+    if failures:
+        print(f"❌ {failures} mismatches")
+        sys.exit(1)
+    print(f"✅ All parsers match on {len(pages)} pages")
+    if args.check:
+        return
+
+    print("\n⏱️  Pages/sec (higher is better):")
+    baseline = None
+    for name, fn in parsers.items():
+        rate = pages_per_sec(fn, pages)
+        baseline = baseline or rate
+        print(f"   {name:<20} {rate:8.1f}  ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Buffered Bulk Writer
+Collects rows and sends them as multi-row requests once a row count or byte
+budget is reached. A rejected batch is split in half and retried so one bad
+row cannot block the rest; rows that still fail go to a dead-letter file.
+"""
+
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+DEAD_LETTER_PATH = os.path.join('data_pipeline', 'logs', 'dead_letter.jsonl')
+
+# Error codes worth retrying: PostgREST's "database unreachable / pool timeout"
+# codes and SQLSTATE prefixes for connection loss, serialization failure,
+# deadlock, insufficient resources, statement timeout and shutdown
+TRANSIENT_PGRST = ('PGRST000', 'PGRST001', 'PGRST002', 'PGRST003')
+TRANSIENT_SQLSTATES = ('08', '40001', '40P01', '53', '57014', '57P0')
+
+
+def is_transient(error):
+    """True for errors a retry can fix: connection errors, timeouts, HTTP 5xx / 429
+    and retryable database errors. Anything else (a 4xx, a bad column) is not."""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        import httpx
+    except ImportError:
+        httpx = None
+    if httpx is not None:
+        if isinstance(error, httpx.TransportError):
+            return True
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            return status == 429 or status >= 500
+    # postgrest APIError: an HTTP status when the body was not JSON, else a PGRST / SQLSTATE code
+    code = str(getattr(error, 'code', '') or '')
+    if len(code) == 3 and code.isdigit():
+        return code == '429' or code.startswith('5')
+    return code in TRANSIENT_PGRST or code.startswith(TRANSIENT_SQLSTATES)
+
+
+class BulkWriter:
+    """Buffers rows for `send(rows)`, which performs one round trip.
+
+    `send` may return a list of rows the server did not apply; those are
+    dead-lettered like rows that raised. `on_written(rows)` is called after
+    every successful request with the rows it stored, and `on_failed(rows,
+    error)` with rows that were dead-lettered.
+    """
+
+    def __init__(self, send, max_rows=200, max_bytes=4_000_000, key=None,
+                 on_written=None, on_failed=None, dead_letter_path=DEAD_LETTER_PATH):
+        self.send = send
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.key = key
+        self.on_written = on_written
+        self.on_failed = on_failed
+        self.dead_letter_path = dead_letter_path
+
+        self._buffer = {}  # key (or insertion counter) -> row
+        self._bytes = 0
+        self.round_trips = 0
+        self.written = 0
+        self.failed = 0
+        self.elapsed = 0.0
+
+    def add(self, row):
+        # A multi-row upsert cannot touch the same conflict key twice, so the
+        # newest row for a key replaces the buffered one.
+        k = row[self.key] if self.key else len(self._buffer)
+        replaced = self._buffer.get(k)
+        if replaced is not None:
+            self._bytes -= self._size(replaced)
+        self._buffer[k] = row
+        self._bytes += self._size(row)
+        if len(self._buffer) >= self.max_rows or self._bytes >= self.max_bytes:
+            self.flush()
+
+    @staticmethod
+    def _size(row):
+        return len(json.dumps(row, default=str))
+
+    def flush(self):
+        if not self._buffer:
+            return
+        rows = list(self._buffer.values())
+        self._buffer = {}
+        self._bytes = 0
+        t0 = time.perf_counter()
+        self._send(rows)
+        self.elapsed += time.perf_counter() - t0
+
+    def close(self):
+        self.flush()
+        return self
+
+    def _send(self, rows):
+        self.round_trips += 1
+        try:
+            rejected = self.send(rows) or []
+        except Exception as e:
+            if len(rows) == 1:
+                self._dead_letter(rows, e)
+                return
+            mid = len(rows) // 2
+            print(f"  ⚠️  Batch of {len(rows)} rejected ({e}); retrying as {mid} + {len(rows) - mid}")
+            self._send(rows[:mid])
+            self._send(rows[mid:])
+            return
+
+        if rejected:
+            self._dead_letter(rejected, 'not applied by server')
+        rejected_ids = {id(r) for r in rejected}
+        stored = [r for r in rows if id(r) not in rejected_ids]
+        self.written += len(stored)
+        if self.on_written and stored:
+            self.on_written(stored)
+
+    def _dead_letter(self, rows, error):
+        self.failed += len(rows)
+        os.makedirs(os.path.dirname(self.dead_letter_path) or '.', exist_ok=True)
+        now = datetime.now(timezone.utc).isoformat()
+        with open(self.dead_letter_path, 'a') as f:
+            for row in rows:
+                f.write(json.dumps({'failed_at': now, 'error': str(error), 'row': row}, default=str) + '\n')
+        print(f"  ❌ {len(rows)} row(s) dead-lettered to {self.dead_letter_path}: {error}")
+        if self.on_failed:
+            self.on_failed(rows, error)
+
+    def report(self, label='rows'):
+        per_trip = self.written / self.round_trips if self.round_trips else 0
+        print(f"💾 Wrote {self.written} {label} in {self.round_trips} round trips "
+              f"({per_trip:.1f}/request, {self.elapsed:.1f}s), {self.failed} dead-lettered")
+
+
+def review_patch_sender(supabase, retries=3):
+    """`send` for BulkWriter that applies {'id', ...changed columns} patches.
+
+    Uses the bulk_update_reviews RPC (sql/bulk_update_reviews.sql), so a whole
+    batch of partial updates is one round trip. Transient errors (is_transient)
+    are retried with backoff before the batch counts as rejected; any other
+    error goes straight to BulkWriter's split / dead-letter path. Rows whose
+    id the server did not report as updated are returned as rejected.
+    """
+    def send(rows):
+        for attempt in range(retries):
+            try:
+                result = supabase.rpc('bulk_update_reviews', {'rows': rows}).execute()
+                break
+            except Exception as e:
+                if attempt == retries - 1 or not is_transient(e):
+                    raise
+                time.sleep(1 * (attempt + 1))  # Linear backoff
+        updated = set(result.data or [])
+        return [r for r in rows if r['id'] not in updated]
+    return send
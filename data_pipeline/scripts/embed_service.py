@@ -0,0 +1,309 @@
+"""
+Local Embedding Service
+Keeps one warm all-MiniLM-L6-v2 model behind a small HTTP server, so scripts
+stop paying the torch import + model load each, and concurrent callers share
+batched encode calls.
+
+Requests are coalesced by a dynamic batcher: texts from concurrent requests
+are collected until `max_batch` texts are waiting or `max_wait_ms` has passed
+since the first one arrived, then encoded in one model call and split back.
+
+  POST /encode  {"texts": [...]}  → raw float32 (Accept: application/octet-stream,
+                                    shape in X-Shape) or {"vectors": [[...]]}
+  GET  /health                    → model, batch and request counters
+
+Clients: EmbedClient(url).encode(texts), or set EMBED_SERVICE_URL and the
+scraper, reparse.py, generate_embeddings.py and benchmark_search.py send
+their (cache-missed) texts to the service instead of loading the model.
+
+Usage:
+    python data_pipeline/scripts/embed_service.py serve --port 8765
+    export EMBED_SERVICE_URL=http://127.0.0.1:8765
+    python data_pipeline/scripts/embed_service.py bench --concurrency 1,4,16
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import requests
+from encoders import load_encoder, model_id
+
+HOST = '127.0.0.1'
+PORT = 8765
+MAX_BATCH = 64      # Texts per model call
+MAX_WAIT_MS = 10    # How long the first waiting text holds the batch open
+SERVICE_ENV = 'EMBED_SERVICE_URL'
+
+
+# ─── Server ──────────────────────────────────────────────────────────────────
+
+class DynamicBatcher:
+    """Coalesces concurrent encode requests into batched calls of `encode`."""
+
+    def __init__(self, encode, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.encode = encode
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.busy = 0.0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, texts):
+        """Future resolving to a float32 (len(texts), dim) array."""
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future
+
+    def _collect(self):
+        """Block for the first request, then gather more until full or timed out."""
+        pending = [self._queue.get()]
+        count = len(pending[0][0])
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while count < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            pending.append(item)
+            count += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            texts = [t for batch, _ in pending for t in batch]
+            t0 = time.perf_counter()
+            try:
+                vectors = np.asarray(self.encode(texts), dtype=np.float32)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            with self._lock:
+                self.busy += time.perf_counter() - t0
+                self.requests += len(pending)
+                self.texts += len(texts)
+                self.batches += 1
+            start = 0
+            for batch, future in pending:
+                future.set_result(vectors[start:start + len(batch)])
+                start += len(batch)
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'texts': self.texts, 'batches': self.batches,
+                    'avg_batch': self.texts / self.batches if self.batches else 0,
+                    'busy_s': round(self.busy, 3)}
+
+
+def make_handler(batcher, model_name):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # Keep-alive, so clients reuse connections
+        disable_nagle_algorithm = True  # Headers and body go out as separate writes
+
+        def _send(self, status, body, content_type='application/json', headers=None):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != '/health':
+                return self._send(404, b'{"error": "not found"}')
+            self._send(200, json.dumps({'status': 'ok', 'model': model_name, **batcher.stats()}).encode())
+
+        def do_POST(self):
+            if self.path != '/encode':
+                return self._send(404, b'{"error": "not found"}')
+            try:
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                texts = json.loads(body)['texts']
+                vectors = batcher.submit(texts).result()
+            except Exception as e:
+                return self._send(500, json.dumps({'error': str(e)}).encode())
+            if 'application/octet-stream' in self.headers.get('Accept', ''):
+                shape = f"{vectors.shape[0]},{vectors.shape[1] if vectors.ndim == 2 else 0}"
+                self._send(200, vectors.tobytes(), 'application/octet-stream', {'X-Shape': shape})
+            else:
+                self._send(200, json.dumps({'vectors': vectors.tolist()}).encode())
+
+        def log_message(self, *args):
+            pass  # One line per request would drown the batch stats
+
+    return Handler
+
+
+def serve(host=HOST, port=PORT, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+    model_name = model_id()  # EMBED_BACKEND picks torch or ONNX
+    t0 = time.perf_counter()
+    model = load_encoder()
+    print(f"🧠 Loaded {model_name} in {time.perf_counter() - t0:.1f}s")
+    batcher = DynamicBatcher(lambda texts: model.encode(texts, batch_size=max_batch),
+                             max_batch=max_batch, max_wait_ms=max_wait_ms)
+    server = ThreadingHTTPServer((host, port), make_handler(batcher, model_name))
+    server.daemon_threads = True
+    print(f"🚀 Serving on http://{host}:{port} (max batch {max_batch}, max wait {max_wait_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"Stats: {batcher.stats()}")
+
+
+# ─── Client ──────────────────────────────────────────────────────────────────
+
+class EmbedClient:
+    """Thin client; thread-safe, one keep-alive connection pool per client."""
+
+    def __init__(self, url, timeout=60):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.http = requests.Session()
+
+    def encode(self, texts):
+        """float32 (len(texts), dim) array, in order."""
+        res = self.http.post(f"{self.url}/encode", json={'texts': list(texts)}, timeout=self.timeout,
+                             headers={'Accept': 'application/octet-stream'})
+        res.raise_for_status()
+        rows, dim = (int(x) for x in res.headers['X-Shape'].split(','))
+        return np.frombuffer(res.content, dtype=np.float32).reshape(rows, dim)
+
+    def health(self):
+        return self.http.get(f"{self.url}/health", timeout=self.timeout).json()
+
+
+_client = None
+
+def service_encoder():
+    """EmbedClient.encode for EMBED_SERVICE_URL, or None when the variable is unset."""
+    global _client
+    url = os.getenv(SERVICE_ENV)
+    if not url:
+        return None
+    if _client is None or _client.url != url.rstrip('/'):
+        client = EmbedClient(url)
+        served = client.health().get('model')
+        if served != model_id():  # Its vectors would land in this backend's cache entries
+            raise RuntimeError(f"Embedding service at {url} runs {served}, this process expects {model_id()} "
+                               f"(set the same EMBED_BACKEND for both)")
+        _client = client
+    return _client.encode
+
+
+# ─── Benchmark ───────────────────────────────────────────────────────────────
+
+def _percentiles(latencies):
+    ms = np.array(latencies) * 1000
+    return {p: float(np.percentile(ms, int(p[1:]))) for p in ('p50', 'p95', 'p99')}
+
+
+def load_run(encode, requests_, concurrency):
+    """Fire every request through `encode` from `concurrency` threads; texts/sec + latency."""
+    latencies = []
+
+    def one(texts):
+        t0 = time.perf_counter()
+        encode(texts)
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, requests_))
+    elapsed = time.perf_counter() - t0
+    texts = sum(len(r) for r in requests_)
+    return {'texts_per_s': texts / elapsed, **_percentiles(latencies)}
+
+
+def bench(args):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from snapshot import load_csv
+    df = load_csv('web/src/data/coffee_data.csv', columns=['name', 'review'])
+    corpus = [f"{n} {r}" for n, r in zip(df['name'], df['review'])]
+    rng = np.random.default_rng(0)
+    requests_ = [[corpus[i] for i in rng.integers(0, len(corpus), args.texts_per_request)]
+                 for _ in range(args.requests)]
+
+    # Server in its own process, as it would run for real
+    url = f"http://{HOST}:{args.port}"
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve', '--port', str(args.port),
+                               '--max-batch', str(args.max_batch), '--max-wait-ms', str(args.max_wait_ms)])
+    client = EmbedClient(url)
+    try:
+        t0 = time.perf_counter()
+        while True:
+            try:
+                client.health()
+                break
+            except requests.ConnectionError:
+                if server.poll() is not None or time.perf_counter() - t0 > 300:
+                    raise RuntimeError('embedding service did not start')
+                time.sleep(0.2)
+
+        t0 = time.perf_counter()
+        model = load_encoder()
+        load_s = time.perf_counter() - t0
+        in_process = lambda texts: model.encode(texts, batch_size=len(texts))
+
+        report = {'requests': args.requests, 'texts_per_request': args.texts_per_request,
+                  'max_batch': args.max_batch, 'max_wait_ms': args.max_wait_ms,
+                  'in_process_model_load_s': load_s, 'runs': []}
+        print(f"\n{'mode':<12} {'conc':>5} {'texts/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for concurrency in args.concurrency:
+            for mode, encode in (('in-process', in_process), ('service', client.encode)):
+                encode(requests_[0])  # Warm up
+                run = {'mode': mode, 'concurrency': concurrency,
+                       **load_run(encode, requests_, concurrency)}
+                report['runs'].append(run)
+                print(f"{mode:<12} {concurrency:>5} {run['texts_per_s']:>9.0f} {run['p50']:>8.1f} "
+                      f"{run['p95']:>8.1f} {run['p99']:>8.1f}")
+        report['service'] = client.health()
+        print(f"\nService batching: {report['service']}")
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"Saved report to {args.json}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local embedding service with dynamic batching')
+    parser.add_argument('command', choices=['serve', 'bench'])
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help='Max texts per model call')
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS,
+                        help='Max time the first queued text waits for a batch to fill')
+    parser.add_argument('--concurrency', type=lambda s: [int(x) for x in s.split(',')], default=[1, 4, 16],
+                        help='bench: concurrent client threads to try')
+    parser.add_argument('--requests', type=int, default=400, help='bench: requests per run')
+    parser.add_argument('--texts-per-request', type=int, default=1, help='bench: texts in each request')
+    parser.add_argument('--json', help='bench: write the report here')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(port=args.port, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    else:
+        bench(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Embedding Cache
+Local SQLite store of text embeddings keyed by (model id, hash of the
+normalized text), shared by every script that encodes with the MiniLM model:
+the scraper, reparse.py, scripts/generate_embeddings.py and
+scripts/benchmark_search.py. Text that was encoded before (a rescrape of an
+unchanged review, a re-run, a repeated benchmark query) never reaches the model.
+
+Vectors are stored as raw float32 bytes. Each hit refreshes the entry's
+last-used tick, and once the cache holds more than `max_entries` vectors the
+least recently used are evicted.
+
+Usage:
+    cache = EmbeddingCache()
+    vectors = cache.encode(texts, lambda missing: model.encode(missing))
+    cache.report()
+
+    python data_pipeline/scripts/embedding_cache.py           # stats
+    python data_pipeline/scripts/embedding_cache.py --clear
+"""
+
+import os
+import sqlite3
+import hashlib
+import argparse
+import threading
+import unicodedata
+import numpy as np
+from encoders import model_id
+
+CACHE_PATH = os.path.join('data_pipeline', 'logs', 'embedding_cache.sqlite')
+MAX_ENTRIES = 200_000  # ~300 MB of 384-d float32 vectors
+SQL_CHUNK = 500        # Keys per IN (...) query, under SQLite's variable limit
+
+
+def normalize_text(text):
+    """NFC with runs of whitespace collapsed; the tokenizer sees the same tokens."""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def text_key(text):
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, path=CACHE_PATH, model=None, max_entries=MAX_ENTRIES):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.model_id = model or model_id()  # Per encoder backend, so torch and ONNX vectors never mix
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS vectors (
+                model TEXT NOT NULL,
+                key BLOB NOT NULL,
+                vector BLOB NOT NULL,
+                used INTEGER NOT NULL,
+                PRIMARY KEY (model, key)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS vectors_used ON vectors (used);
+        """)
+        self._tick = self._conn.execute('SELECT COALESCE(MAX(used), 0) FROM vectors').fetchone()[0]
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM vectors').fetchone()[0]
+
+    def get_many(self, texts):
+        """Cached vector (float32 array) per text, or None where missing."""
+        keys = [text_key(t) for t in texts]
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), SQL_CHUNK):
+                chunk = keys[start:start + SQL_CHUNK]
+                marks = ','.join('?' * len(chunk))
+                found.update(self._conn.execute(
+                    f'SELECT key, vector FROM vectors WHERE model = ? AND key IN ({marks})',
+                    [self.model_id, *chunk]))
+            if found:
+                self._tick += 1
+                self._conn.executemany('UPDATE vectors SET used = ? WHERE model = ? AND key = ?',
+                                       [(self._tick, self.model_id, k) for k in found])
+                self._conn.commit()
+            self.hits += sum(k in found for k in keys)
+            self.misses += sum(k not in found for k in keys)
+        return [np.frombuffer(found[k], dtype=np.float32) if k in found else None for k in keys]
+
+    def put_many(self, texts, vectors):
+        with self._lock:
+            self._tick += 1
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO vectors (model, key, vector, used) VALUES (?, ?, ?, ?)',
+                [(self.model_id, text_key(t), np.asarray(v, dtype=np.float32).tobytes(), self._tick)
+                 for t, v in zip(texts, vectors)])
+            self._conn.commit()
+            self._evict()
+
+    def _evict(self):
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                'DELETE FROM vectors WHERE (model, key) IN '
+                '(SELECT model, key FROM vectors ORDER BY used LIMIT ?)', (excess,))
+            self._conn.commit()
+
+    def encode(self, texts, encoder):
+        """Vectors for `texts` (a float32 array, in order); only misses go to `encoder`.
+
+        `encoder(list_of_texts)` returns one vector per text. Duplicate texts
+        in one call are encoded once.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        cached = self.get_many(texts)
+        missing = list(dict.fromkeys(normalize_text(t) for t, v in zip(texts, cached) if v is None))
+        if missing:
+            fresh = dict(zip(missing, encoder(missing)))
+            self.put_many(missing, fresh.values())
+            cached = [v if v is not None else np.asarray(fresh[normalize_text(t)], dtype=np.float32)
+                      for t, v in zip(texts, cached)]
+        return np.array(cached, dtype=np.float32).reshape(len(texts), -1)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM vectors')
+            self._conn.commit()
+
+    def report(self):
+        total = self.hits + self.misses
+        rate = f"{self.hits / total:.0%}" if total else "n/a"
+        print(f"🧠 Embedding cache: {self.hits} hits, {self.misses} misses ({rate} hit rate), "
+              f"{len(self)} vectors stored")
+
+    def close(self):
+        self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or clear the local embedding cache')
+    parser.add_argument('--path', default=CACHE_PATH, help='SQLite cache location')
+    parser.add_argument('--clear', action='store_true', help='Delete every cached vector')
+    args = parser.parse_args()
+
+    cache = EmbeddingCache(args.path)
+    if args.clear:
+        cache.clear()
+        print(f"🧹 Cleared {args.path}")
+    rows = cache._conn.execute('SELECT model, COUNT(*), SUM(LENGTH(vector)) FROM vectors GROUP BY model').fetchall()
+    for model, count, nbytes in rows:
+        print(f"  {model}: {count} vectors ({nbytes / 1e6:.1f} MB)")
+    print(f"✅ {len(cache)} vectors in {args.path} (limit {cache.max_entries})")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
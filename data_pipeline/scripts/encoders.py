@@ -0,0 +1,138 @@
+"""
+Encoder Backends
+Every script that embeds text gets its model from load_encoder(), so the
+backend is picked in one place with EMBED_BACKEND:
+
+    torch  SentenceTransformer('all-MiniLM-L6-v2') on PyTorch (default)
+    onnx   int8-quantized ONNX export of the same model on onnxruntime; no torch
+           import, a quarter of the weights, faster per token on CPU
+
+The ONNX backend reproduces what the web /api/search route computes with
+transformers.js (`pipeline('feature-extraction', 'Xenova/all-MiniLM-L6-v2')`,
+`{pooling: 'mean', normalize: true}`, which loads the same quantized graph):
+token embeddings averaged over the attention mask, then L2-normalized. Inputs
+are truncated at 256 word pieces like the torch model, so corpus vectors from
+either backend are comparable.
+
+The model directory is a local copy of the Xenova/all-MiniLM-L6-v2 layout:
+
+    tokenizer.json
+    onnx/model_quantized.onnx
+
+The two backends' vectors agree closely but not bit for bit, so each has its
+own model id (model_id()) for the embedding cache and generated artifacts.
+The Supabase reviews.embedding column records no model id, so the scripts
+that write it (scrape_and_embed.py, reparse.py) call check_db_writer() and
+refuse any backend but db_backend(): torch, unless EMBED_DB_BACKEND says the
+whole corpus has been re-embedded with another one.
+
+Usage:
+    EMBED_BACKEND=onnx python scripts/generate_embeddings.py
+    python scripts/bench_encoders.py          # cosine agreement + speed vs torch
+"""
+
+import os
+import numpy as np
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+BACKEND_ENV = 'EMBED_BACKEND'
+DB_BACKEND_ENV = 'EMBED_DB_BACKEND'  # Backend of the vectors in reviews.embedding
+MODEL_IDS = {'torch': MODEL_NAME, 'onnx': f'{MODEL_NAME}:onnx-int8'}  # Embedding cache / artifact ids
+ONNX_MODEL_DIR = os.getenv('ONNX_MODEL_DIR', os.path.join('data_pipeline', 'models', MODEL_NAME))
+ONNX_FILE = os.path.join('onnx', 'model_quantized.onnx')
+MAX_SEQ_LENGTH = 256  # Word pieces; the torch model's max_seq_length
+
+
+def _env_backend(var):
+    name = os.getenv(var, 'torch').strip().lower() or 'torch'
+    if name not in MODEL_IDS:
+        raise ValueError(f"{var}={name!r}; expected one of {', '.join(MODEL_IDS)}")
+    return name
+
+
+def backend():
+    return _env_backend(BACKEND_ENV)
+
+
+def db_backend():
+    """Backend that produced every vector in reviews.embedding (default torch)."""
+    return _env_backend(DB_BACKEND_ENV)
+
+
+def check_db_writer():
+    """Raise unless the selected backend matches the vectors already in reviews.embedding."""
+    if backend() != db_backend():
+        raise RuntimeError(f"{BACKEND_ENV}={backend()} would write {model_id()} vectors into reviews.embedding, "
+                           f"which holds {model_id(db_backend())} vectors. Re-embed the whole corpus with "
+                           f"{backend()} and set {DB_BACKEND_ENV}={backend()}, or use {BACKEND_ENV}={db_backend()}")
+
+
+def model_id(name=None):
+    """Id of the vectors a backend produces (default: the selected one)."""
+    return MODEL_IDS[name or backend()]
+
+
+def load_encoder(name=None):
+    """Model with a SentenceTransformer-style .encode(texts, batch_size=...)."""
+    name = name or backend()
+    if name == 'onnx':
+        return OnnxEncoder()
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(MODEL_NAME)
+
+
+def mean_pool(hidden, mask):
+    """Average of the token embeddings where mask is 1, L2-normalized."""
+    mask = mask[:, :, None].astype(np.float32)
+    pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+
+class OnnxEncoder:
+    """all-MiniLM-L6-v2 as an ONNX graph; encode() matches SentenceTransformer.encode."""
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR, model_file=ONNX_FILE, threads=None,
+                 max_seq_length=MAX_SEQ_LENGTH):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        path = os.path.join(model_dir, model_file)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No ONNX model at {path} (set ONNX_MODEL_DIR to the model directory)")
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self._tokenizer.enable_truncation(max_seq_length)
+        self._tokenizer.no_padding()  # Each batch is padded to its own longest text
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _run(self, encodings):
+        width = max(len(e.ids) for e in encodings)
+        ids = np.zeros((len(encodings), width), dtype=np.int64)
+        mask = np.zeros_like(ids)
+        for row, e in enumerate(encodings):
+            ids[row, :len(e.ids)] = e.ids
+            mask[row, :len(e.ids)] = 1
+        feeds = {'input_ids': ids, 'attention_mask': mask, 'token_type_ids': np.zeros_like(ids)}
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+        return mean_pool(hidden, mask)
+
+    def encode(self, texts, batch_size=32, **_):
+        """float32 (len(texts), 384) unit vectors in input order (one vector for a str).
+
+        Texts are batched shortest-first so padding stays small.
+        """
+        if isinstance(texts, str):
+            return self.encode([texts], batch_size)[0]
+        encodings = self._tokenizer.encode_batch(list(texts))
+        order = sorted(range(len(encodings)), key=lambda i: len(encodings[i].ids))
+        out = None
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            vectors = self._run([encodings[i] for i in rows])
+            if out is None:
+                out = np.empty((len(encodings), vectors.shape[1]), dtype=np.float32)
+            out[rows] = vectors
+        return out if out is not None else np.empty((0, 0), dtype=np.float32)
@@ -3,59 +3,134 @@ import xml.etree.ElementTree as ET
 import time
 import os
 import re
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 
 SITEMAP_INDEX = "https://www.coffeereview.com/sitemap_index.xml"
+NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
 
-def get_xml_root(url):
+URLS_PATH = os.path.join('data_pipeline', 'urls.txt')
+# url<TAB>lastmod<TAB>new|modified for every URL the scraper still has to store
+DELTA_PATH = os.path.join('data_pipeline', 'urls_delta.txt')
+# url<TAB>lastmod for every review URL the scraper has stored at that lastmod.
+# Only the scraper appends to it, so a delta URL it has not stored yet (past
+# --limit, or failed) stays in the next delta.
+MANIFEST_PATH = os.path.join('data_pipeline', 'logs', 'sitemap_manifest.tsv')
+
+http = requests.Session()
+
+def iter_entries(url, entry_tag):
+    """Stream a sitemap and yield (loc, lastmod) for each <url>/<sitemap> entry."""
     print(f"Fetching {url}...")
     headers = {'User-Agent': 'Mozilla/5.0 (compatible; BrewIntelligence/1.0)'}
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    # Handle namespaces in XML if necessary, but simple parsing usually works
-    return ET.fromstring(response.content)
+    with http.get(url, headers=headers, stream=True) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True  # Undo gzip transfer encoding
+        for _, elem in ET.iterparse(response.raw, events=('end',)):
+            if elem.tag == NS + entry_tag:
+                loc = elem.findtext(NS + 'loc')
+                if loc:
+                    yield loc.strip(), (elem.findtext(NS + 'lastmod') or '').strip()
+                elem.clear()  # Keep memory flat on large sitemaps
+
+def fetch_review_urls(sm_url, delay):
+    time.sleep(delay)  # Be polite
+    urls = []
+    for url, lastmod in iter_entries(sm_url, 'url'):
+        # check for /review/ but EXCLUDE the main index page
+        if '/review/' in url and url != 'https://www.coffeereview.com/review/':
+            urls.append((url, lastmod))
+    return urls
+
+def load_manifest(path=MANIFEST_PATH):
+    manifest = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                url, _, lastmod = line.rstrip('\n').partition('\t')
+                if url:
+                    manifest[url] = lastmod  # Appended lines win
+    return manifest
+
+def record_stored(entries, path=MANIFEST_PATH):
+    """Append (url, lastmod) pairs the scraper has stored to the manifest."""
+    if not entries:
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as f:
+        f.writelines(f"{url}\t{lastmod}\n" for url, lastmod in entries)
+
+def read_url_file(path):
+    """(urls, {url: lastmod}, modified urls) from urls.txt or a urls_delta.txt."""
+    urls, lastmods, modified = [], {}, set()
+    with open(path) as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            url = fields[0].strip()
+            if not url:
+                continue
+            urls.append(url)
+            if len(fields) > 1:
+                lastmods[url] = fields[1]
+            if len(fields) > 2 and fields[2] == 'modified':
+                modified.add(url)
+    return urls, lastmods, modified
+
+def write_lines(path, lines):
+    """Write lines atomically; returns False (and leaves the file alone) if unchanged."""
+    content = ''.join(line + '\n' for line in lines)
+    if os.path.exists(path):
+        with open(path) as f:
+            if f.read() == content:
+                return False
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        f.write(content)
+    os.replace(path + '.tmp', path)
+    return True
 
 def main():
+    parser = argparse.ArgumentParser(description='Discover review URLs from the coffeereview.com sitemaps')
+    parser.add_argument('--workers', type=int, default=4, help='Sitemaps fetched concurrently')
+    parser.add_argument('--delay', type=float, default=0.5, help='Seconds each worker waits before a request')
+    parser.add_argument('--full', action='store_true', help='Ignore the manifest; every URL goes in the delta')
+    args = parser.parse_args()
+
     try:
-        root = get_xml_root(SITEMAP_INDEX)
-        
         # 1. Find the review sitemap(s)
         # Use Regex to avoid matching the domain name "coffeereview.com"
-        review_sitemaps = []
         # Matches: /review-sitemap.xml, /review-sitemap2.xml, /post-sitemap.xml
         pattern = re.compile(r'/(review|post)-sitemap\d*\.xml$')
+        review_sitemaps = [loc for loc, _ in iter_entries(SITEMAP_INDEX, 'sitemap') if pattern.search(loc)]
 
-        for child in root:
-            # Look for children that contain 'loc'
-            loc = child.find('{http://www.sitemaps.org/schemas/sitemap/0.9}loc')
-            if loc is not None and loc.text:
-                if pattern.search(loc.text):
-                    review_sitemaps.append(loc.text)
-        
         print(f"Found {len(review_sitemaps)} potential review sitemaps: {review_sitemaps}")
 
-        review_urls = []
-
-        # 2. Iterate through review sitemaps to get actual URLs
-        for sm_url in review_sitemaps:
-            time.sleep(1) # Be polite
-            sm_root = get_xml_root(sm_url)
-            for child in sm_root:
-                loc = child.find('{http://www.sitemaps.org/schemas/sitemap/0.9}loc')
-                if loc is not None:
-                    url = loc.text
-                    # check for /review/ but EXCLUDE the main index page
-                    if '/review/' in url and url != 'https://www.coffeereview.com/review/':
-                        review_urls.append(url)
-
-        print(f"Total Review URLs found: {len(review_urls)}")
-
-        # 3. Save to file
-        output_path = os.path.join('data_pipeline', 'urls.txt')
-        with open(output_path, 'w') as f:
-            for url in review_urls:
-                f.write(url + '\n')
-        
-        print(f"Saved to {output_path}")
+        # 2. Fetch the review sitemaps concurrently (results keep sitemap order)
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(lambda sm: fetch_review_urls(sm, args.delay), review_sitemaps))
+
+        current = {}
+        for entries in results:
+            for url, lastmod in entries:
+                current.setdefault(url, lastmod)
+
+        print(f"Total Review URLs found: {len(current)}")
+
+        # 3. Diff against what the scraper has stored
+        stored = load_manifest(MANIFEST_PATH)
+        previous = {} if args.full else stored
+        delta = [(url, lastmod, 'new' if url not in previous else 'modified')
+                 for url, lastmod in current.items()
+                 if url not in previous or (lastmod and previous[url] != lastmod)]
+        new = sum(1 for _, _, kind in delta if kind == 'new')
+        print(f"Delta: {len(delta)} URLs ({new} new, {len(delta) - new} modified)")
+
+        # 4. Save (the manifest is only compacted here; the scraper advances it)
+        changed = write_lines(URLS_PATH, list(current))
+        print(f"Saved to {URLS_PATH}" if changed else f"{URLS_PATH} unchanged")
+        write_lines(DELTA_PATH, ['\t'.join(entry) for entry in delta])
+        print(f"Saved delta to {DELTA_PATH}")
+        write_lines(MANIFEST_PATH, [f"{url}\t{lastmod}" for url, lastmod in stored.items()])
 
     except Exception as e:
         print(f"Error: {e}")
@@ -0,0 +1,120 @@
+"""
+HTTP Response Cache
+On-disk cache of fetched review pages. Bodies are gzip-compressed and stored
+by content hash; a small per-URL record remembers which body a URL served and
+its ETag / Last-Modified so later fetches can revalidate with a conditional
+request (a 304 costs a few hundred bytes instead of the full page).
+
+Layout:
+    <root>/urls/<sha256(url)[:2]>/<sha256(url)>.json
+    <root>/objects/<sha256(body)[:2]>/<sha256(body)>.html.gz
+"""
+
+import os
+import gzip
+import json
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+CACHE_DIR = os.path.join('data_pipeline', 'logs', 'http_cache')
+
+
+def _sha(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class HttpCache:
+    """URL → body cache with conditional revalidation.
+
+    With `offline=True` nothing touches the network: cached pages are served
+    as-is and uncached URLs return None.
+    """
+
+    def __init__(self, root=CACHE_DIR, offline=False):
+        self.root = root
+        self.offline = offline
+        self._lock = threading.Lock()
+        self.hits = 0           # Served from disk without a request (offline)
+        self.revalidated = 0    # 304 Not Modified
+        self.downloaded = 0     # Full 200 responses
+        self.misses = 0         # Offline and not cached
+        self.bytes_in = 0       # Response bytes received
+
+    def _record_path(self, url):
+        h = _sha(url.encode())
+        return os.path.join(self.root, 'urls', h[:2], f"{h}.json")
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], f"{digest}.html.gz")
+
+    def _count(self, field, n=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + n)
+
+    # ─── Storage ─────────────────────────────────────────────────────────────
+
+    def get(self, url):
+        """Return (body, record) for a cached URL, or (None, None)."""
+        try:
+            with open(self._record_path(url)) as f:
+                record = json.load(f)
+            with gzip.open(self._object_path(record['sha256']), 'rb') as f:
+                return f.read(), record
+        except (OSError, ValueError, KeyError):
+            return None, None
+
+    def put(self, url, body, headers):
+        digest = _sha(body)
+        obj = self._object_path(digest)
+        if not os.path.exists(obj):
+            _write_atomic(obj, gzip.compress(body, compresslevel=6))
+        record = {
+            'url': url,
+            'sha256': digest,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'fetched_at': datetime.now(timezone.utc).isoformat(),
+        }
+        _write_atomic(self._record_path(url), json.dumps(record).encode())
+
+    # ─── Fetching ────────────────────────────────────────────────────────────
+
+    def fetch(self, session, url, headers=None):
+        """Fetch through the cache. Returns (body or None, used_network)."""
+        body, record = self.get(url)
+        if self.offline:
+            self._count('hits' if body is not None else 'misses')
+            return body, False
+
+        request_headers = dict(headers or {})
+        if body is not None:
+            if record.get('etag'):
+                request_headers['If-None-Match'] = record['etag']
+            if record.get('last_modified'):
+                request_headers['If-Modified-Since'] = record['last_modified']
+
+        res = session.get(url, headers=request_headers)
+        self._count('bytes_in', len(res.content))
+        if res.status_code == 304 and body is not None:
+            self._count('revalidated')
+            return body, True
+        if res.status_code != 200:
+            return None, True
+
+        self._count('downloaded')
+        self.put(url, res.content, res.headers)
+        return res.content, True
+
+    def report(self):
+        print(f"🗄️  HTTP cache: {self.downloaded} downloaded, {self.revalidated} not modified (304), "
+              f"{self.hits} served offline, {self.misses} offline misses — "
+              f"{self.bytes_in / 1024:.0f} KiB received")
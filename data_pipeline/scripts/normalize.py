@@ -0,0 +1,245 @@
+"""
+Normalization Engine
+Fast, memoized versions of the migrate_clean extractors.
+
+- Patterns are compiled once at import and lookup tables (lower-cased
+  country names) are built once, instead of per row.
+- Every extractor is wrapped in a bounded LRU cache keyed on the raw string,
+  since price and origin strings repeat heavily across reviews.
+- normalize_column() applies an extractor to a whole column (list or pandas
+  Series), computing each distinct value once.
+
+Outputs are identical to the original per-row functions;
+bench_normalize.py checks that and times both.
+"""
+
+import re
+from functools import lru_cache
+
+CACHE_SIZE = 16384  # Distinct raw strings remembered per extractor
+
+# Coffee-producing countries (comprehensive list)
+COFFEE_COUNTRIES = [
+    'Ethiopia', 'Kenya', 'Colombia', 'Guatemala', 'Brazil', 'Costa Rica',
+    'Panama', 'Honduras', 'Peru', 'Rwanda', 'Indonesia', 'Yemen', 'Mexico',
+    'El Salvador', 'Nicaragua', 'Burundi', 'Tanzania', 'Uganda', 'Jamaica',
+    'Hawaii', 'Papua New Guinea', 'Bolivia', 'Ecuador', 'India', 'Vietnam',
+    'Thailand', 'Myanmar', 'Laos', 'China', 'Philippines', 'Taiwan',
+    'Democratic Republic of Congo', 'Congo', 'Malawi', 'Zambia', 'Zimbabwe',
+    'Cameroon', 'Ivory Coast', 'Ghana', 'Togo', 'Sierra Leone', 'Liberia',
+    'Guinea', 'Central African Republic', 'Gabon', 'Angola', 'Madagascar',
+    'Reunion', 'Mauritius', 'Comoros', 'Sao Tome', 'Cape Verde',
+    'Dominican Republic', 'Haiti', 'Puerto Rico', 'Cuba', 'Venezuela',
+    'Sumatra', 'Java', 'Sulawesi', 'Bali', 'Flores', 'Timor'
+]
+
+# Roast level normalization
+ROAST_MAP = {
+    'light': 'Light',
+    'light-medium': 'Light',
+    'medium-light': 'Medium',
+    'medium': 'Medium',
+    'medium-dark': 'Dark',
+    'dark-medium': 'Dark',
+    'dark': 'Dark',
+    'very dark': 'Dark',
+    'espresso': 'Dark'
+}
+
+# Approximate exchange rates to USD (as of Feb 2024)
+EXCHANGE_RATES = {
+    'USD': 1.0,
+    'NTD': 0.031,    # ~32 NTD = $1 USD
+    'EUR': 1.08,     # 1 EUR = $1.08 USD
+    'GBP': 1.27,     # 1 GBP = $1.27 USD
+    'AUD': 0.65,     # 1 AUD = $0.65 USD
+    'CAD': 0.74,     # 1 CAD = $0.74 USD
+    'JPY': 0.0067,   # ~150 JPY = $1 USD
+    'MYR': 0.21,     # ~4.7 MYR = $1 USD (Malaysian Ringgit)
+    'CNY': 0.14,     # ~7.1 CNY = $1 USD (Chinese Yuan)
+    'THB': 0.028,    # ~36 THB = $1 USD (Thai Baht)
+    'KRW': 0.00075,  # ~1,330 KRW = $1 USD (Korean Won)
+    'GTQ': 0.13,     # ~7.8 GTQ = $1 USD (Guatemalan Quetzal)
+    'MXN': 0.058,    # ~17 MXN = $1 USD (Mexican Peso)
+}
+
+
+
+# ─── Precompiled matchers ────────────────────────────────────────────────────
+
+# Lower-cased once; substring tests beat a combined regex on strings this short
+_COUNTRIES_LOWER = tuple((c.lower(), c) for c in COFFEE_COUNTRIES)
+
+_EURO_PREFIX = re.compile(r'^E\s*\d')
+_BARE_USD = re.compile(r'^\d+\.\d{2}/')
+_NUMBER = re.compile(r'(\d{1,3}(?:,\d{3})*(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?)')
+
+# (pattern, unit, oz conversion) in priority order
+_WEIGHTS = [
+    (re.compile(r'(\d+(?:\.\d+)?)\s*[-/]?\s*(?:ounces?|oz\.?|ounc[eu]+s?)\b'), 'oz', None),
+    (re.compile(r'(\d+(?:\.\d+)?)\s*(?:grams?|g)\b'), 'g', lambda v: round(v / 28.35, 2)),  # 1 oz = 28.35 grams
+    (re.compile(r'(\d+(?:\.\d+)?)\s*(?:pounds?|lb)\b'), 'lb', lambda v: round(v * 16, 2)),  # 1 pound = 16 oz
+    (re.compile(r'(\d+(?:\.\d+)?)\s*(?:kilograms?|kg\.?)\b'), 'kg', lambda v: round(v * 35.27, 2)),  # 1 kg = 35.27 oz
+]
+_YEAR = re.compile(r'(20\d{2}|19\d{2})')
+
+
+# ─── Extractors ──────────────────────────────────────────────────────────────
+
+@lru_cache(maxsize=CACHE_SIZE)
+def extract_country(origin: str) -> str | None:
+    """Extract country from origin text."""
+    if not origin:
+        return None
+    origin_lower = origin.lower()
+    for country_lower, country in _COUNTRIES_LOWER:
+        if country_lower in origin_lower:
+            return country
+    return None
+
+
+def _detect_currency(price: str, upper: str) -> str | None:
+    if 'NT' in upper or 'TWD' in upper:
+        return 'NTD'
+    if 'THB' in upper:
+        return 'THB'  # Thai Baht
+    if 'KRW' in upper:
+        return 'KRW'  # Korean Won
+    if 'GTQ' in upper:
+        return 'GTQ'  # Guatemalan Quetzal
+    if 'PESOS' in upper:
+        return 'MXN'  # Assume Mexican Peso
+    if 'RMB' in upper or 'CNY' in upper or '¥' in price:
+        return 'CNY'  # Chinese Yuan
+    if 'RM' in upper:
+        return 'MYR'  # Malaysian Ringgit
+    if '€' in price or 'EUR' in upper or _EURO_PREFIX.match(price):
+        return 'EUR'
+    if '£' in price or 'GBP' in upper:
+        return 'GBP'
+    if 'JPY' in upper or 'YEN' in upper:
+        return 'JPY'
+    if '$' in price or '#' in price:  # '#' is typo for '$'
+        if 'AUD' in upper or 'A$' in upper:
+            return 'AUD'
+        if 'CAD' in upper or 'C$' in upper:
+            return 'CAD'
+        return 'USD'
+    if _BARE_USD.match(price):  # "18.00/12 ounces" without $
+        return 'USD'  # Assume USD if no currency symbol
+    return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def extract_price(price: str) -> tuple[float | None, str | None]:
+    """Extract numeric price and currency from price text."""
+    if not price:
+        return None, None
+    upper = price.upper()
+    if 'N/A' in upper or upper.strip() == 'NA':
+        return None, None
+    currency = _detect_currency(price, upper)
+    match = _NUMBER.search(price)
+    if match:
+        return float(match.group(1).replace(',', '')), currency
+    return None, None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def extract_weight(price: str) -> tuple[float | None, str | None]:
+    """Extract weight/quantity and unit from price text. Returns (weight_oz, unit)."""
+    if not price:
+        return None, None
+    price_lower = price.lower()
+    for pattern, unit, to_oz in _WEIGHTS:
+        match = pattern.search(price_lower)
+        if match:
+            value = float(match.group(1))
+            return (to_oz(value) if to_oz else value), unit
+    return None, None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def extract_year(review_date: str) -> int | None:
+    """Extract year from review date text."""
+    if not review_date:
+        return None
+    match = _YEAR.search(review_date)
+    return int(match.group(1)) if match else None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_roast(roast_level: str) -> str | None:
+    """Normalize roast level to Light/Medium/Dark."""
+    if not roast_level:
+        return None
+    roast_lower = roast_level.lower().strip()
+    for key, category in ROAST_MAP.items():
+        if key in roast_lower:
+            return category
+    return None
+
+
+# ─── Derived columns of one row ──────────────────────────────────────────────
+
+# Source column -> the columns migrate_clean derives from it
+DERIVED_COLUMNS = {
+    'price': ('price_numeric', 'currency', 'weight_oz', 'weight_unit', 'price_per_oz_usd'),
+    'origin': ('country',),
+    'review_date': ('review_year',),
+    'roast_level': ('roast_category',),
+}
+
+
+def derive_columns(row: dict, sources) -> dict:
+    """migrate_clean's derived values for the `sources` columns of `row`.
+
+    Unlike migrate_clean, which only fills blanks, every derived column of a
+    source is returned, as None when nothing can be extracted, so a changed
+    source never leaves a stale value behind. price_per_oz_usd falls back to 0,
+    migrate_clean's "processed" marker, so it does not pick the row up again.
+    """
+    out = {}
+    if 'price' in sources:
+        price, currency = extract_price(row.get('price'))
+        weight_oz, weight_unit = extract_weight(row.get('price'))
+        if weight_oz is None or weight_oz <= 0:
+            weight_oz = weight_unit = None
+        price_per_oz = 0
+        if weight_oz and price is not None and currency in EXCHANGE_RATES:
+            price_per_oz = round(round(price * EXCHANGE_RATES[currency], 2) / weight_oz, 2)
+        out.update(price_numeric=price, currency=currency, weight_oz=weight_oz,
+                   weight_unit=weight_unit, price_per_oz_usd=price_per_oz)
+    if 'origin' in sources:
+        out['country'] = extract_country(row.get('origin'))
+    if 'review_date' in sources:
+        out['review_year'] = extract_year(row.get('review_date'))
+    if 'roast_level' in sources:
+        out['roast_category'] = normalize_roast(row.get('roast_level'))
+    return out
+
+
+# ─── Column entry point ──────────────────────────────────────────────────────
+
+def normalize_column(values, extractor):
+    """Apply an extractor to a whole column, computing each distinct value once.
+
+    Accepts a list (returns a list) or a pandas Series (returns a Series with
+    the same index).
+    """
+    seen = {}
+    out = []
+    for v in values:
+        if v not in seen:
+            seen[v] = extractor(v)
+        out.append(seen[v])
+    if hasattr(values, 'index') and hasattr(values, 'to_list'):
+        import pandas as pd
+        return pd.Series(out, index=values.index, name=values.name)
+    return out
+
+
+def cache_info():
+    """Hit/miss counters of each extractor's memo cache."""
+    return {fn.__name__: fn.cache_info() for fn in
+            (extract_country, extract_price, extract_weight, extract_year, normalize_roast)}
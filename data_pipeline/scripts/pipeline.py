@@ -0,0 +1,236 @@
+"""
+Staged Pipeline
+Runs work through a chain of worker stages connected by bounded queues, so
+network, CPU and DB latency overlap instead of adding up.
+"""
+
+import queue
+import threading
+import time
+
+_DONE = object()  # End-of-stream marker, one per worker
+
+
+class Stage:
+    """A named step with its own worker threads and a bounded inbox.
+
+    `fn(item)` returns the item to hand downstream, or None to drop it.
+    """
+
+    def __init__(self, name, fn, workers=1, maxsize=32):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.inbox = queue.Queue(maxsize=maxsize)
+        self.next = None
+
+        self._lock = threading.Lock()
+        self._alive = workers
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy = 0.0      # Seconds spent inside fn
+        self.wait = 0.0      # Seconds blocked waiting for input
+        self.blocked = 0.0   # Seconds blocked on a full downstream queue
+        self.max_depth = 0
+        self._depth_sum = 0
+        self._depth_samples = 0
+
+    # ─── Queue helpers ───────────────────────────────────────────────────────
+
+    def put(self, item):
+        """Enqueue an item, returning the seconds spent blocked on a full inbox."""
+        t0 = time.perf_counter()
+        self.inbox.put(item)
+        return time.perf_counter() - t0
+
+    def _get(self, timeout=None):
+        t0 = time.perf_counter()
+        item = self.inbox.get(timeout=timeout)
+        waited = time.perf_counter() - t0
+        depth = self.inbox.qsize()
+        with self._lock:
+            self.wait += waited
+            self.max_depth = max(self.max_depth, depth + 1)
+            self._depth_sum += depth
+            self._depth_samples += 1
+        return item
+
+    def _emit(self, item):
+        if self.next is None or item is None:
+            return
+        blocked = self.next.put(item)
+        with self._lock:
+            self.blocked += blocked
+
+    def _finish_worker(self):
+        with self._lock:
+            self._alive -= 1
+            last = self._alive == 0
+        if last and self.next is not None:
+            for _ in range(self.next.workers):
+                self.next.put(_DONE)
+
+    # ─── Worker loop ─────────────────────────────────────────────────────────
+
+    def _run(self):
+        while True:
+            item = self._get()
+            if item is _DONE:
+                break
+            t0 = time.perf_counter()
+            try:
+                out = self.fn(item)
+            except Exception as e:
+                out = None
+                with self._lock:
+                    self.errors += 1
+                print(f"  ❌ [{self.name}] {e}")
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                self.busy += elapsed
+                if out is None:
+                    self.dropped += 1
+                else:
+                    self.processed += 1
+            self._emit(out)
+        self._finish_worker()
+
+    def start(self):
+        threads = []
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            threads.append(t)
+        return threads
+
+    @property
+    def avg_depth(self):
+        return self._depth_sum / self._depth_samples if self._depth_samples else 0
+
+
+class BatchStage(Stage):
+    """A stage whose fn takes a list of items and returns a same-length list.
+
+    Items are collected until `batch_size` is reached or `flush_ms` has passed
+    since the first item of the batch arrived, whichever comes first.
+    """
+
+    def __init__(self, name, fn, batch_size=32, flush_ms=200, workers=1, maxsize=32):
+        super().__init__(name, fn, workers=workers, maxsize=maxsize)
+        self.batch_size = batch_size
+        self.flush_ms = flush_ms
+        self.batches = 0
+
+    def _collect(self):
+        """Gather the next batch, returning (items, saw_end_of_stream)."""
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            try:
+                item = self._get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+            if deadline is None:
+                deadline = time.perf_counter() + self.flush_ms / 1000
+        return batch, False
+
+    def _run(self):
+        done = False
+        while not done:
+            batch, done = self._collect()
+            if not batch:
+                continue
+            t0 = time.perf_counter()
+            try:
+                outs = self.fn(batch)
+            except Exception as e:
+                outs = [None] * len(batch)
+                with self._lock:
+                    self.errors += len(batch)
+                print(f"  ❌ [{self.name}] batch of {len(batch)} failed: {e}")
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                self.busy += elapsed
+                self.batches += 1
+                for out in outs:
+                    if out is None:
+                        self.dropped += 1
+                    else:
+                        self.processed += 1
+            for out in outs:
+                self._emit(out)
+        self._finish_worker()
+
+
+class RateLimiter:
+    """Spaces wait() returns at least `interval` seconds apart across all threads.
+
+    Each caller reserves the next free slot under the lock and sleeps outside
+    it, so the gap holds however many workers share the limiter.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class Pipeline:
+    """Chains stages together and feeds them from an iterable."""
+
+    def __init__(self, stages):
+        self.stages = stages
+        for upstream, downstream in zip(stages, stages[1:]):
+            upstream.next = downstream
+        self.fed = 0
+        self.feed_blocked = 0.0
+        self.elapsed = 0.0
+
+    def run(self, items):
+        threads = []
+        for stage in self.stages:
+            threads.extend(stage.start())
+
+        t0 = time.perf_counter()
+        head = self.stages[0]
+        for item in items:
+            self.feed_blocked += head.put(item)
+            self.fed += 1
+        for _ in range(head.workers):
+            head.put(_DONE)
+
+        for t in threads:
+            t.join()
+        self.elapsed = time.perf_counter() - t0
+        return self
+
+    def report(self):
+        """Print throughput, queue depth and per-stage wait times."""
+        tail = self.stages[-1]
+        rate = tail.processed / self.elapsed if self.elapsed else 0
+        print(f"\n📊 Pipeline: {self.fed} in → {tail.processed} out in {self.elapsed:.1f}s "
+              f"({rate:.2f} items/s)")
+        print(f"   {'stage':<8} {'workers':>7} {'ok':>6} {'drop':>5} {'err':>4} "
+              f"{'busy s':>8} {'wait s':>8} {'blocked s':>9} {'q max':>6} {'q avg':>6}")
+        for s in self.stages:
+            print(f"   {s.name:<8} {s.workers:>7} {s.processed:>6} {s.dropped:>5} {s.errors:>4} "
+                  f"{s.busy:>8.1f} {s.wait:>8.1f} {s.blocked:>9.1f} {s.max_depth:>6} {s.avg_depth:>6.1f}")
+        for s in self.stages:
+            if isinstance(s, BatchStage) and s.batches:
+                per_sec = s.processed / s.busy if s.busy else 0
+                print(f"   {s.name}: {s.processed} items in {s.batches} batches "
+                      f"(avg {s.processed / s.batches:.1f}/batch, {per_sec:.1f} items/s while busy)")
+        print(f"   feeder blocked {self.feed_blocked:.1f}s on a full '{self.stages[0].name}' queue")
@@ -2,14 +2,26 @@
 Post-Process Pipeline (Phase 1)
 Runs after scrape_and_embed.py + migrate_clean.py
 Computes aggregates and stores them in roasters, countries, insights_cache tables.
+
+Incremental by default: the aggregate state of every review up to an id
+watermark is kept in logs/post_process_state.pkl, and a run only fetches and
+folds in reviews above it (plus the last 30 days for the dashboard window).
+--full rebuilds from every review and reports whether the incremental state
+had drifted (e.g. after reparse.py edited old rows). --frame does a full
+rebuild through the columnar ReviewFrame without holding any row dicts.
 """
 
 import os
 import json
-from collections import defaultdict
+import hashlib
+import time
+import pickle
+import argparse
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 from supabase import create_client
+from review_reader import fetch_reviews, iter_reviews
+from aggregates import aggregate, RecentWindow, MIN_SHARD_ROWS
 
 load_dotenv()
 
@@ -18,70 +30,30 @@ supabase = create_client(
     os.getenv("SUPABASE_KEY")
 )
 
+REVIEW_COLUMNS = (
+    'id, title, roaster, roaster_location, rating, price, '
+    'price_per_oz_usd, country, review_year, roast_category, '
+    'aroma, acidity, body, flavor, aftertaste, roast_level, origin, created_at'
+)
 
-# ─── Helpers ──────────────────────────────────────────────────────────────────
+STATE_PATH = os.path.join('data_pipeline', 'logs', 'post_process_state.pkl')
+STATE_VERSION = 3  # Bump when ReviewAggregates changes shape; old state triggers a full rebuild
 
-def avg(nums):
-    return sum(nums) / len(nums) if nums else 0
 
-def rnd(n, d=1):
-    return round(n, d)
+# ─── Helpers ──────────────────────────────────────────────────────────────────
 
 def fetch_all_reviews():
-    """Fetch all reviews, paginating past Supabase's 1000-row limit."""
-    all_reviews = []
-    page = 0
-    chunk = 1000
-
-    while True:
-        result = supabase.table('reviews').select(
-            'id, title, roaster, roaster_location, rating, price, '
-            'price_per_oz_usd, country, review_year, roast_category, '
-            'aroma, acidity, body, flavor, aftertaste, roast_level, origin, created_at'
-        ).range(page * chunk, (page + 1) * chunk - 1).execute()
-
-        if not result.data:
-            break
-        all_reviews.extend(result.data)
-        if len(result.data) < chunk:
-            break
-        page += 1
-
+    """Fetch all reviews in id order, reading id ranges concurrently (no OFFSET paging)."""
+    all_reviews = fetch_reviews(supabase, REVIEW_COLUMNS)
     print(f"📦 Fetched {len(all_reviews)} reviews")
     return all_reviews
 
 
 # ─── Roasters Table ──────────────────────────────────────────────────────────
 
-def compute_roasters(reviews):
-    """Aggregate roaster stats and upsert into roasters table."""
-    roaster_map = defaultdict(lambda: {
-        'ratings': [], 'prices': [], 'location': None, 'top_score': 0
-    })
-
-    for r in reviews:
-        name = r.get('roaster')
-        if not name or not r.get('rating'):
-            continue
-        entry = roaster_map[name]
-        entry['ratings'].append(r['rating'])
-        if r.get('roaster_location'):
-            entry['location'] = r['roaster_location']
-        if r['rating'] > entry['top_score']:
-            entry['top_score'] = r['rating']
-        if r.get('price_per_oz_usd') and r['price_per_oz_usd'] > 0:
-            entry['prices'].append(r['price_per_oz_usd'])
-
-    rows = []
-    for name, data in roaster_map.items():
-        rows.append({
-            'name': name,
-            'location': data['location'],
-            'review_count': len(data['ratings']),
-            'avg_rating': rnd(avg(data['ratings'])),
-            'top_score': data['top_score'],
-            'avg_price_per_oz': rnd(avg(data['prices']), 2) if data['prices'] else None,
-        })
+def compute_roasters(agg):
+    """Upsert the aggregated roaster stats into the roasters table."""
+    rows = agg.roaster_rows()
 
     # Batch upsert
     for i in range(0, len(rows), 500):
@@ -94,43 +66,9 @@ def compute_roasters(reviews):
 
 # ─── Countries Table ─────────────────────────────────────────────────────────
 
-def compute_countries(reviews):
-    """Aggregate country stats and upsert into countries table."""
-    country_map = defaultdict(lambda: {
-        'ratings': [], 'prices': [], 'roasts': [], 'top_score': 0
-    })
-
-    for r in reviews:
-        country = r.get('country')
-        if not country or not r.get('rating'):
-            continue
-        entry = country_map[country]
-        entry['ratings'].append(r['rating'])
-        if r.get('price_per_oz_usd') and r['price_per_oz_usd'] > 0:
-            entry['prices'].append(r['price_per_oz_usd'])
-        if r.get('roast_category'):
-            entry['roasts'].append(r['roast_category'])
-        if r['rating'] > entry['top_score']:
-            entry['top_score'] = r['rating']
-
-    rows = []
-    for name, data in country_map.items():
-        if len(data['ratings']) < 3:
-            continue
-        # Find dominant roast
-        roast_counts = defaultdict(int)
-        for rc in data['roasts']:
-            roast_counts[rc] += 1
-        dominant = max(roast_counts, key=roast_counts.get) if roast_counts else None
-
-        rows.append({
-            'name': name,
-            'review_count': len(data['ratings']),
-            'avg_rating': rnd(avg(data['ratings'])),
-            'avg_price_per_oz': rnd(avg(data['prices']), 2) if data['prices'] else None,
-            'top_score': data['top_score'],
-            'dominant_roast': dominant,
-        })
+def compute_countries(agg):
+    """Upsert the aggregated country stats (3+ reviews) into the countries table."""
+    rows = agg.country_rows()
 
     for i in range(0, len(rows), 500):
         batch = rows[i:i+500]
@@ -142,298 +80,214 @@ def compute_countries(reviews):
 
 # ─── Insights Cache ──────────────────────────────────────────────────────────
 
-def compute_and_cache_insights(reviews):
-    """Compute all 7 insight aggregations + highlights and store in insights_cache."""
-
-    cache_entries = {}
-
-    # 0. Total reviews
-    cache_entries['total_reviews'] = len(reviews)
-
-    # 1. Rating Distribution
-    buckets = [
-        {'range': '80-82', 'count': 0, 'min': 80, 'max': 82},
-        {'range': '83-85', 'count': 0, 'min': 83, 'max': 85},
-        {'range': '86-88', 'count': 0, 'min': 86, 'max': 88},
-        {'range': '89-91', 'count': 0, 'min': 89, 'max': 91},
-        {'range': '92-94', 'count': 0, 'min': 92, 'max': 94},
-        {'range': '95-97', 'count': 0, 'min': 95, 'max': 97},
-        {'range': '98+', 'count': 0, 'min': 98, 'max': 100},
-    ]
-    for r in reviews:
-        rating = r.get('rating')
-        if not rating:
-            continue
-        for b in buckets:
-            if b['min'] <= rating <= b['max']:
-                b['count'] += 1
-                break
-    cache_entries['rating_distribution'] = buckets
-
-    # 2. Yearly Trends
-    year_map = defaultdict(lambda: {'ratings': [], 'prices': []})
-    for r in reviews:
-        if not r.get('review_year') or not r.get('rating'):
-            continue
-        entry = year_map[r['review_year']]
-        entry['ratings'].append(r['rating'])
-        if r.get('price_per_oz_usd') and r['price_per_oz_usd'] > 0:
-            entry['prices'].append(r['price_per_oz_usd'])
-
-    yearly = sorted([
-        {
-            'year': year,
-            'avgRating': rnd(avg(data['ratings'])),
-            'count': len(data['ratings']),
-            'avgPrice': rnd(avg(data['prices']), 2) if data['prices'] else None,
-        }
-        for year, data in year_map.items()
-    ], key=lambda x: x['year'])
-    cache_entries['yearly_trends'] = yearly
-
-    # 3. Top Roasters (min 5 reviews, top 15 by avg rating)
-    roaster_map = defaultdict(lambda: {'ratings': [], 'top_score': 0})
-    for r in reviews:
-        if not r.get('roaster') or not r.get('rating'):
-            continue
-        entry = roaster_map[r['roaster']]
-        entry['ratings'].append(r['rating'])
-        if r['rating'] > entry['top_score']:
-            entry['top_score'] = r['rating']
-
-    top_roasters = sorted([
-        {
-            'roaster': name[:30] + '…' if len(name) > 30 else name,
-            'avgRating': rnd(avg(data['ratings'])),
-            'count': len(data['ratings']),
-            'topScore': data['top_score'],
-        }
-        for name, data in roaster_map.items()
-        if len(data['ratings']) >= 5
-    ], key=lambda x: -x['avgRating'])[:15]
-    cache_entries['top_roasters'] = top_roasters
-
-    # 4. Flavor Profiles (overall + per roast)
-    def flavor_profile(subset, label):
-        with_scores = [r for r in subset if all(r.get(k) for k in ['aroma', 'acidity', 'body', 'flavor', 'aftertaste'])]
-        if not with_scores:
-            return {'label': label, 'aroma': 0, 'acidity': 0, 'body': 0, 'flavor': 0, 'aftertaste': 0}
-        return {
-            'label': label,
-            'aroma': rnd(avg([r['aroma'] for r in with_scores])),
-            'acidity': rnd(avg([r['acidity'] for r in with_scores])),
-            'body': rnd(avg([r['body'] for r in with_scores])),
-            'flavor': rnd(avg([r['flavor'] for r in with_scores])),
-            'aftertaste': rnd(avg([r['aftertaste'] for r in with_scores])),
-        }
-
-    profiles = [flavor_profile(reviews, 'Overall')]
-    for roast in ['Light', 'Medium', 'Dark']:
-        subset = [r for r in reviews if r.get('roast_category') == roast]
-        profiles.append(flavor_profile(subset, roast))
-    cache_entries['flavor_profiles'] = profiles
-
-    # 5. Roast Comparison
-    roast_comparison = []
-    for roast in ['Light', 'Medium', 'Dark']:
-        subset = [r for r in reviews if r.get('roast_category') == roast]
-        with_rating = [r for r in subset if r.get('rating')]
-        with_price = [r for r in subset if r.get('price_per_oz_usd') and r['price_per_oz_usd'] > 0]
-        with_scores = [r for r in subset if all(r.get(k) for k in ['aroma', 'acidity', 'body', 'flavor', 'aftertaste'])]
-
-        roast_comparison.append({
-            'roast': roast,
-            'count': len(subset),
-            'avgRating': rnd(avg([r['rating'] for r in with_rating])),
-            'avgPrice': rnd(avg([r['price_per_oz_usd'] for r in with_price]), 2) if with_price else None,
-            'avgAroma': rnd(avg([r['aroma'] for r in with_scores])) if with_scores else 0,
-            'avgAcidity': rnd(avg([r['acidity'] for r in with_scores])) if with_scores else 0,
-            'avgBody': rnd(avg([r['body'] for r in with_scores])) if with_scores else 0,
-            'avgFlavor': rnd(avg([r['flavor'] for r in with_scores])) if with_scores else 0,
-            'avgAftertaste': rnd(avg([r['aftertaste'] for r in with_scores])) if with_scores else 0,
-        })
-    cache_entries['roast_comparison'] = roast_comparison
-
-    # 6. Country Stats
-    c_map = defaultdict(lambda: {'ratings': [], 'prices': [], 'roasts': [], 'top_score': 0})
-    for r in reviews:
-        country = r.get('country')
-        if not country or not r.get('rating'):
-            continue
-        entry = c_map[country]
-        entry['ratings'].append(r['rating'])
-        if r.get('price_per_oz_usd') and r['price_per_oz_usd'] > 0:
-            entry['prices'].append(r['price_per_oz_usd'])
-        if r.get('roast_category'):
-            entry['roasts'].append(r['roast_category'])
-        if r['rating'] > entry['top_score']:
-            entry['top_score'] = r['rating']
-
-    country_stats = []
-    for name, data in c_map.items():
-        if len(data['ratings']) < 3:
+# Fields the web reads (shared/review-card.tsx, dashboard/kpi-cards.tsx); the
+# rest of what the aggregates carry is dropped before writing.
+RECENT_REVIEW_FIELDS = (
+    'id', 'title', 'roaster', 'rating', 'price', 'price_per_oz_usd', 'country',
+    'origin', 'roast_category', 'aroma', 'acidity', 'body', 'flavor',
+)
+TOP_RATED_FIELDS = ('title', 'rating', 'roaster')
+
+
+def trim_insights(entries):
+    """Copy of the insight entries without the fields no page reads."""
+    entries = dict(entries)
+    if 'recent_reviews' in entries:
+        entries['recent_reviews'] = [{f: r.get(f) for f in RECENT_REVIEW_FIELDS}
+                                     for r in entries['recent_reviews']]
+    stats = entries.get('dashboard_stats')
+    if stats and stats.get('recent_top_rated'):
+        top = stats['recent_top_rated']
+        entries['dashboard_stats'] = {**stats, 'recent_top_rated': {f: top.get(f) for f in TOP_RATED_FIELDS}}
+    return entries
+
+
+def canonical(value):
+    """Compact JSON with sorted keys: the form whose hash detects a changed key."""
+    return json.dumps(value, default=str, separators=(',', ':'), sort_keys=True, ensure_ascii=False)
+
+
+def request_bytes(rows):
+    """Size of the JSON body an upsert of rows sends."""
+    return len(json.dumps(rows, default=str).encode()) if rows else 0
+
+
+def stored_hashes():
+    """key -> content_hash currently in insights_cache, or None if the column is missing."""
+    try:
+        data = supabase.table('insights_cache').select('key, content_hash').execute().data
+    except Exception as e:
+        print(f"  ⚠️  Could not read insights_cache.content_hash ({e}); "
+              "run sql/insights_cache_hash.sql. Writing every key.")
+        return None
+    return {row['key']: row['content_hash'] for row in data}
+
+
+def compute_and_cache_insights(agg):
+    """Store all 7 insight aggregations + highlights, dashboard stats etc. in insights_cache.
+
+    Each key is written only when the hash of its canonical form differs from
+    the stored one, so computed_at moves only for keys whose content changed.
+    """
+    cache_entries = agg.insights()
+    legacy_bytes = request_bytes([{'key': k, 'data': v} for k, v in cache_entries.items()])
+
+    previous = stored_hashes()
+    computed_at = datetime.now(timezone.utc).isoformat()
+    rows = []
+    for key, value in trim_insights(cache_entries).items():
+        text = canonical(value)
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        if previous is not None and previous.get(key) == digest:
             continue
-        roast_counts = defaultdict(int)
-        for rc in data['roasts']:
-            roast_counts[rc] += 1
-        top_roast = max(roast_counts, key=roast_counts.get) if roast_counts else 'N/A'
-        country_stats.append({
-            'country': name,
-            'count': len(data['ratings']),
-            'avgRating': rnd(avg(data['ratings'])),
-            'avgPrice': rnd(avg(data['prices']), 2) if data['prices'] else None,
-            'topRoast': top_roast,
-            'topScore': data['top_score'],
-        })
-    country_stats.sort(key=lambda x: -x['count'])
-    cache_entries['country_stats'] = country_stats
-
-    # 7. Price Tiers
-    tiers_def = [
-        {'tier': 'Budget', 'range': '<$1.50/oz', 'min': 0, 'max': 1.5},
-        {'tier': 'Mid-Range', 'range': '$1.50-$3/oz', 'min': 1.5, 'max': 3},
-        {'tier': 'Premium', 'range': '$3-$5/oz', 'min': 3, 'max': 5},
-        {'tier': 'Luxury', 'range': '$5+/oz', 'min': 5, 'max': float('inf')},
-    ]
-    price_tiers = []
-    for t in tiers_def:
-        in_tier = [r for r in reviews
-                   if r.get('price_per_oz_usd') and r['price_per_oz_usd'] > t['min']
-                   and r['price_per_oz_usd'] <= t['max'] and r.get('rating')]
-        ratings = [r['rating'] for r in in_tier]
-        price_tiers.append({
-            'tier': t['tier'],
-            'range': t['range'],
-            'count': len(in_tier),
-            'avgRating': rnd(avg(ratings)),
-            'minRating': min(ratings) if ratings else 0,
-            'maxRating': max(ratings) if ratings else 0,
-        })
-    cache_entries['price_tiers'] = price_tiers
-
-    # 8. Highlights
-    sorted_by_rating = sorted(
-        [r for r in reviews if r.get('rating')],
-        key=lambda x: -x['rating']
-    )
-    highest = sorted_by_rating[0] if sorted_by_rating else None
-
-    country_counts = defaultdict(int)
-    for r in reviews:
-        if r.get('country'):
-            country_counts[r['country']] += 1
-    top_country = max(country_counts.items(), key=lambda x: x[1]) if country_counts else None
-
-    country_prices = defaultdict(list)
-    for r in reviews:
-        if r.get('country') and r.get('price_per_oz_usd') and r['price_per_oz_usd'] > 0:
-            country_prices[r['country']].append(r['price_per_oz_usd'])
-    exp_country = max(
-        [(c, rnd(avg(p), 2)) for c, p in country_prices.items() if len(p) >= 10],
-        key=lambda x: x[1], default=None
-    )
-
-    hq_cheap = sorted(
-        [r for r in reviews if r.get('rating') and r['rating'] >= 90
-         and r.get('price_per_oz_usd') and r['price_per_oz_usd'] > 0],
-        key=lambda x: x['price_per_oz_usd']
-    )
-    cheapest = hq_cheap[0] if hq_cheap else None
-
-    highlights = {
-        'highestRatedBean': {
-            'title': highest['title'], 'rating': highest['rating'], 'roaster': highest['roaster']
-        } if highest else None,
-        'mostReviewedCountry': {
-            'country': top_country[0], 'count': top_country[1]
-        } if top_country else None,
-        'mostExpensiveAvgCountry': {
-            'country': exp_country[0], 'avgPrice': exp_country[1]
-        } if exp_country else None,
-        'cheapestHighQuality': {
-            'title': cheapest['title'], 'rating': cheapest['rating'],
-            'price': f"${cheapest['price_per_oz_usd']:.2f}/oz"
-        } if cheapest else None,
-    }
-    cache_entries['highlights'] = highlights
-
-    # 9. Dashboard Stats (Recent / Monthly Pulse)
-    # Calculate stats for the last 30 days
-    now = datetime.now(timezone.utc)
-    cutoff = now - timedelta(days=30)
-    
-    recent_subset = []
-    for r in reviews:
-        if r.get('created_at'):
-            try:
-                # Handle ISO format with or without microseconds/Z
-                ts = r['created_at'].replace('Z', '+00:00')
-                dt = datetime.fromisoformat(ts)
-                if dt > cutoff:
-                    recent_subset.append(r)
-            except Exception as e:
-                pass
-    
-    # Recent Stats
-    recent_count = len(recent_subset)
-    recent_ratings = [r['rating'] for r in recent_subset if r.get('rating')]
-    recent_avg_rating = rnd(avg(recent_ratings)) if recent_ratings else 0
-    
-    # Top Origin (Recent)
-    recent_origins = defaultdict(int)
-    for r in recent_subset:
-        if r.get('country'):
-            recent_origins[r['country']] += 1
-    top_recent_origin = max(recent_origins.items(), key=lambda x: x[1])[0] if recent_origins else "N/A"
-    
-    # Top Rated (Recent)
-    sorted_recent = sorted([r for r in recent_subset if r.get('rating')], key=lambda x: -x['rating'])
-    top_recent_bean = sorted_recent[0] if sorted_recent else None
-    
-    dashboard_stats = {
-        'total_reviews': len(reviews),
-        'recent_count_30d': recent_count,
-        'recent_avg_rating': recent_avg_rating,
-        'recent_top_origin': top_recent_origin,
-        'recent_top_rated': top_recent_bean,
-        'last_updated': max([r['created_at'] for r in reviews if r.get('created_at')], default=None)
+        row = {'key': key, 'data': json.loads(text), 'computed_at': computed_at}
+        if previous is not None:
+            row['content_hash'] = digest
+        rows.append(row)
+
+    if rows:
+        supabase.table('insights_cache').upsert(rows, on_conflict='key').execute()
+
+    print(f"  ✅ Cached {len(rows)} insight keys ({len(cache_entries) - len(rows)} unchanged, skipped)")
+    print(f"     Request body {request_bytes(rows) / 1024:.1f} KB "
+          f"(every key untrimmed: {legacy_bytes / 1024:.1f} KB)")
+
+
+# ─── Incremental State ───────────────────────────────────────────────────────
+
+def load_state():
+    """Saved {'version', 'watermark', 'last_created_at', 'agg'}, or None if unusable."""
+    try:
+        with open(STATE_PATH, 'rb') as f:
+            state = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if state.get('version') != STATE_VERSION:
+        print(f"  ⚠️  State version {state.get('version')} != {STATE_VERSION}, rebuilding")
+        return None
+    return state
+
+
+def save_state(agg, watermark):
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    agg.compact()  # Only ever merged into, so the per-price values can go
+    state = {'version': STATE_VERSION, 'watermark': watermark,
+             'last_created_at': agg.last_updated, 'agg': agg}
+    with open(STATE_PATH + '.tmp', 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(STATE_PATH + '.tmp', STATE_PATH)
+
+
+def fetch_recent_window(cutoff):
+    """The dashboard's 30-day window, from its own small query."""
+    rows = fetch_reviews(supabase, REVIEW_COLUMNS, where=lambda q: q.gt('created_at', cutoff.isoformat()))
+    window = RecentWindow(cutoff)
+    for r in rows:
+        window.update(r)
+    return window
+
+
+def fold_new_reviews(state, workers):
+    """Fold reviews above the state's watermark into its aggregates. Returns (agg, watermark, new count)."""
+    agg, watermark = state['agg'], state['watermark']
+    new = fetch_reviews(supabase, REVIEW_COLUMNS, after_id=watermark)
+    if new:
+        agg.merge(aggregate(new, workers=workers, cutoff=agg.recent.cutoff))
+        watermark = new[-1]['id']
+    return agg, watermark, len(new)
+
+
+def outputs(agg):
+    """Everything the run writes, serialized for comparison."""
+    return {
+        'roasters': json.dumps(agg.roaster_rows(), default=str),
+        'countries': json.dumps(agg.country_rows(), default=str),
+        **{k: json.dumps(v, default=str) for k, v in agg.insights().items()},
     }
-    cache_entries['dashboard_stats'] = dashboard_stats
 
-    # 10. Recent Reviews (Top 12 by ID, assuming ID is chronological)
-    sorted_by_id = sorted(reviews, key=lambda x: -x['id'])
-    cache_entries['recent_reviews'] = sorted_by_id[:12]
 
-    # 11. Filter Metadata (for Reviews page)
-    unique_countries = sorted(list(set([r['country'] for r in reviews if r.get('country')])))
-    unique_years = sorted(list(set([r['review_year'] for r in reviews if r.get('review_year')])), reverse=True)
-    cache_entries['filter_options'] = {'countries': unique_countries, 'years': unique_years}
+def full_rebuild(workers, previous=None):
+    """Aggregate every review; with a previous state, report where it had drifted."""
+    reviews = fetch_all_reviews()
+    if not reviews:
+        return None, 0
+
+    print("\n🧮 Aggregating in one pass...")
+    t0 = time.perf_counter()
+    agg = aggregate(reviews, workers=workers)
+    print(f"  ✅ {agg.total} reviews aggregated in {time.perf_counter() - t0:.2f}s")
 
-    # ─── Write all entries to insights_cache ─────────────────────────────────
-    rows = [{'key': k, 'data': json.dumps(v, default=str)} for k, v in cache_entries.items()]
-    supabase.table('insights_cache').upsert(rows, on_conflict='key').execute()
+    if previous is not None:
+        watermark = previous['watermark']
+        inc = previous['agg']
+        inc.merge(aggregate([r for r in reviews if r['id'] > watermark], workers=workers,
+                            cutoff=inc.recent.cutoff))
+        inc.set_recent(agg.recent)
+        expected, actual = outputs(agg), outputs(inc)
+        drifted = [k for k in expected if expected[k] != actual[k]]
+        if drifted:
+            print(f"  ⚠️  Incremental state had drifted on: {', '.join(drifted)} (replaced by the rebuild)")
+        else:
+            print(f"  ✅ Incremental state (through id {watermark}) matches the full rebuild")
 
-    print(f"  ✅ Cached {len(rows)} insight keys")
+    return agg, reviews[-1]['id']
 
 
 # ─── Main ────────────────────────────────────────────────────────────────────
 
 def main():
+    parser = argparse.ArgumentParser(description='Compute roasters, countries and insights_cache aggregates')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help=f'Aggregation processes (only used above {MIN_SHARD_ROWS} reviews per shard)')
+    parser.add_argument('--full', action='store_true',
+                        help='Rebuild from every review and check the incremental state against it')
+    parser.add_argument('--frame', action='store_true',
+                        help='Full rebuild streamed into a columnar ReviewFrame (low memory); '
+                             'leaves the incremental state untouched')
+    args = parser.parse_args()
+
     print("🔄 Starting post-processing pipeline...")
 
-    reviews = fetch_all_reviews()
-    if not reviews:
-        print("⚠️  No reviews found. Exiting.")
+    if args.frame:
+        from review_frame import ReviewFrame
+        t0 = time.perf_counter()
+        agg = ReviewFrame.from_rows(iter_reviews(supabase, REVIEW_COLUMNS))
+        if not agg.n:
+            print("⚠️  No reviews found. Exiting.")
+            return
+        print(f"📦 Streamed {agg.n} reviews into a {agg.nbytes() / 1e6:.1f} MB frame "
+              f"in {time.perf_counter() - t0:.2f}s")
+        compute_roasters(agg)
+        compute_countries(agg)
+        compute_and_cache_insights(agg)
+        print("\n✨ Post-processing complete!")
         return
 
-    print("\n📊 Computing roaster aggregates...")
-    compute_roasters(reviews)
-
-    print("🌍 Computing country aggregates...")
-    compute_countries(reviews)
-
-    print("📈 Computing insights cache...")
-    compute_and_cache_insights(reviews)
+    state = load_state()
+    if args.full or state is None:
+        if state is None and not args.full:
+            print(f"  No usable state at {STATE_PATH}; doing a full rebuild")
+        agg, watermark = full_rebuild(args.workers, previous=state)
+        if agg is None:
+            print("⚠️  No reviews found. Exiting.")
+            return
+    else:
+        print(f"⏩ Incremental run from id {state['watermark']} ({state['agg'].total} reviews in state)")
+        agg, watermark, new = fold_new_reviews(state, args.workers)
+        print(f"  ✅ Folded in {new} new reviews")
+        agg.set_recent(fetch_recent_window(datetime.now(timezone.utc) - timedelta(days=30)))
+
+    print("📊 Writing roaster aggregates...")
+    compute_roasters(agg)
+
+    print("🌍 Writing country aggregates...")
+    compute_countries(agg)
+
+    print("📈 Writing insights cache...")
+    compute_and_cache_insights(agg)
+
+    save_state(agg, watermark)
+    print(f"💾 Saved aggregate state through id {watermark} to {STATE_PATH}")
 
     print("\n✨ Post-processing complete!")
 
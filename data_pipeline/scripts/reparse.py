@@ -0,0 +1,171 @@
+"""
+Offline Re-Parse
+Re-extracts metadata, scores and text sections from the stored raw_content
+(.entry-content HTML) of every review, without scraping. Pages of reviews are
+streamed out of the DB by id while the previous page is parsed across a
+process pool (one worker per core). Only the columns that changed are written
+back, in bulk, and the embedding is recomputed only for rows whose embedded
+text (title + blind assessment + notes) changed. When price, origin,
+review_date or roast_level changes, the columns migrate_clean derives from it
+(price_numeric, price_per_oz_usd, country, ...) are recomputed in the same patch.
+
+raw_content lacks the page <title>, so a fragment can lose values the full page
+had (e.g. a roaster taken from the title). Parsed values that are the
+parser's "not found" defaults therefore never overwrite a stored value.
+
+Usage:
+    python data_pipeline/scripts/reparse.py --dry-run     # report what would change
+    python data_pipeline/scripts/reparse.py               # apply changes
+"""
+
+import os
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from review_parser import parse_review
+from normalize import DERIVED_COLUMNS, derive_columns
+from bulk_writer import BulkWriter, review_patch_sender
+from embedding_cache import EmbeddingCache
+from encoders import check_db_writer
+
+load_dotenv()
+
+# Columns re-derived from raw_content
+REPARSE_COLUMNS = [
+    'title', 'roaster', 'roaster_location', 'roast_level', 'agtron', 'origin',
+    'price', 'review_date', 'rating', 'blind_assessment', 'notes', 'bottom_line',
+    'with_milk', 'aroma', 'acidity', 'body', 'flavor', 'aftertaste',
+]
+DERIVED = [col for cols in DERIVED_COLUMNS.values() for col in cols]  # Re-derived when their source changes
+MISSING = ('Unknown', 'N/A', '', 0, None)  # What parse_review emits when a field is absent
+
+
+def embed_text(row):
+    """Same text scrape_and_embed embeds: title + blind assessment + notes"""
+    return f"{row['title']} {row['blind_assessment']} {row.get('notes', '')}"
+
+
+def reparse_row(row):
+    """Parse one stored review. Returns (patch of changed columns, new embed text or None)."""
+    parsed = parse_review(row['url'], row['raw_content'])
+    if parsed is None:
+        return None, None
+    patch = {}
+    for col in REPARSE_COLUMNS:
+        new = parsed.get(col)
+        if new in MISSING and row.get(col) not in MISSING:
+            continue
+        if new != row.get(col):
+            patch[col] = new
+    if not patch:
+        return None, None
+    merged = {**row, **patch}
+    derived = derive_columns(merged, [col for col in DERIVED_COLUMNS if col in patch])
+    patch.update({col: v for col, v in derived.items() if v != row.get(col)})
+    new_text = embed_text(merged)
+    return patch, (new_text if new_text != embed_text(row) else None)
+
+
+def fetch_page(supabase, after_id, page_size):
+    return supabase.table('reviews').select(
+        'id, url, raw_content, ' + ', '.join(REPARSE_COLUMNS + DERIVED)
+    ).gt('id', after_id).not_.is_('raw_content', 'null').order('id').limit(page_size).execute().data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-parse stored raw_content and write back changed columns')
+    parser.add_argument('--dry-run', action='store_true', help='Report changes without writing')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Parser processes')
+    parser.add_argument('--page-size', type=int, default=200, help='Reviews fetched per request')
+    parser.add_argument('--start-id', type=int, default=0, help='Only re-parse reviews with id above this')
+    parser.add_argument('--limit', type=int, default=None, help='Stop after this many reviews')
+    parser.add_argument('--no-embed', action='store_true', help='Never recompute embeddings')
+    parser.add_argument('--no-embed-cache', action='store_true', help='Encode every changed text, ignoring the embedding cache')
+    args = parser.parse_args()
+    if not (args.no_embed or args.dry_run):
+        check_db_writer()  # Refuse to mix backends in reviews.embedding
+
+    from supabase import create_client
+    supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+
+    writer = BulkWriter(review_patch_sender(supabase), max_rows=500)
+    embed_cache = None if args.no_embed_cache else EmbeddingCache()
+    changed_cols = Counter()
+    scanned = changed = reembedded = 0
+    pending_embed = []  # (patch, text)
+
+    def flush_embeddings():
+        nonlocal reembedded
+        if not pending_embed:
+            return
+        if args.dry_run:
+            reembedded += len(pending_embed)
+            pending_embed.clear()
+            return
+        from scrape_and_embed import get_model
+        from embed_service import service_encoder
+        texts = [t for _, t in pending_embed]
+        encode = service_encoder() or (lambda missing: get_model().encode(missing, batch_size=64))
+        vectors = embed_cache.encode(texts, encode) if embed_cache is not None else encode(texts)
+        for (patch, _), vec in zip(pending_embed, vectors):
+            patch['embedding'] = vec.tolist()
+            writer.add(patch)
+        reembedded += len(pending_embed)
+        pending_embed.clear()
+
+    print(f"🔁 Re-parsing raw_content with {args.workers} workers (id > {args.start_id})...")
+    t0 = time.perf_counter()
+    last_id = args.start_id
+    with ProcessPoolExecutor(max_workers=args.workers) as pool, ThreadPoolExecutor(max_workers=1) as io:
+        next_page = io.submit(fetch_page, supabase, last_id, args.page_size)
+        while True:
+            rows = next_page.result()
+            if not rows:
+                break
+            if args.limit is not None:
+                rows = rows[:args.limit - scanned]
+            last_id = rows[-1]['id']
+            # Prefetch the next page while this one is parsed
+            next_page = io.submit(fetch_page, supabase, last_id, args.page_size)
+
+            chunksize = max(1, len(rows) // (args.workers * 4))
+            for row, (patch, new_text) in zip(rows, pool.map(reparse_row, rows, chunksize=chunksize)):
+                if not patch:
+                    continue
+                changed += 1
+                changed_cols.update(patch.keys())
+                patch = {'id': row['id'], **patch}
+                if new_text is not None and not args.no_embed:
+                    pending_embed.append((patch, new_text))
+                elif not args.dry_run:
+                    writer.add(patch)
+
+            scanned += len(rows)
+            if len(pending_embed) >= 64:
+                flush_embeddings()
+            print(f"  ...{scanned} scanned, {changed} changed (last id {last_id})")
+            if args.limit is not None and scanned >= args.limit:
+                break
+        next_page.cancel()
+    flush_embeddings()
+    writer.close()
+
+    elapsed = time.perf_counter() - t0
+    print(f"\n✅ Re-parsed {scanned} reviews in {elapsed:.1f}s ({scanned / elapsed if elapsed else 0:.0f}/s)")
+    print(f"   Rows changed:  {changed}")
+    print(f"   Re-embedded:   {reembedded}")
+    for col, n in changed_cols.most_common():
+        print(f"     {col:<18} {n}")
+    if args.dry_run:
+        print("   (dry run — nothing written)")
+    else:
+        writer.report('patches')
+        if embed_cache is not None:
+            embed_cache.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""
+Columnar Review Frame
+Holds reviews as typed NumPy columns instead of one dict per review: float64
+ratings, prices and cupping scores (NaN when missing) and int32 category codes
+for roaster, country, roast category, year and roaster location. Rows can be
+streamed in (e.g. straight from review_reader.iter_reviews), so the full list
+of dicts never exists.
+
+Every post_process aggregate is then a vectorized group-by (bincount /
+ufunc.at over category codes) and produces exactly what aggregates.py
+produces:
+- Categories are numbered in first-seen order, and group output is ordered by
+  each group's first qualifying row, so ties break the same way.
+- np.bincount adds weights in row order, so per-group price sums match
+  sum(list) bit for bit; other sums are of small integers and exact.
+- Averages are rounded with Python's round() on Python floats.
+
+The few outputs that need whole rows (the 12 newest reviews and the 30-day
+dashboard window) are kept by the streaming accumulators from aggregates.py
+while the columns are filled.
+"""
+
+from array import array
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from aggregates import (
+    SCORE_KEYS, ROASTS, RATING_BUCKETS, PRICE_TIERS, RecentWindow, LatestReviews, rnd,
+)
+
+NAN = float('nan')
+
+
+def _num(x):
+    """A float64 column value back to the int/float the row dict held."""
+    x = float(x)
+    return int(x) if x.is_integer() else x
+
+
+def _seq_sum(values):
+    """Sum in row order, like sum(list) (np.sum would add pairwise)."""
+    if len(values) == 0:
+        return 0
+    return float(np.bincount(np.zeros(len(values), dtype=np.intp), weights=values)[0])
+
+
+class Categories:
+    """Value -> int code in first-seen order (None and '' get codes too)."""
+
+    def __init__(self):
+        self.index = {}
+        self.values = []
+        self.codes = array('i')
+
+    def add(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def finish(self):
+        self.codes = np.frombuffer(self.codes, dtype=np.int32) if len(self.codes) else np.zeros(0, np.int32)
+        truthy = np.array([bool(v) for v in self.values], dtype=bool)
+        # True where the row's value is truthy (the dict code's `if r.get(...)`)
+        self.present = truthy[self.codes] if len(self.values) else np.zeros(0, bool)
+        return self
+
+
+class ReviewFrame:
+    """Columnar reviews + vectorized aggregates (same outputs as ReviewAggregates)."""
+
+    def __init__(self, cutoff=None):
+        self.ids = array('q')
+        self.titles = []
+        self._floats = {k: array('d') for k in ['rating', 'price'] + SCORE_KEYS}
+        self.roaster = Categories()
+        self.country = Categories()
+        self.roast = Categories()
+        self.year = Categories()
+        self.location = Categories()
+        if cutoff is None:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=30)
+        self.latest = LatestReviews()
+        self.recent = RecentWindow(cutoff)
+        self.last_updated = None
+        self.n = 0
+
+    @classmethod
+    def from_rows(cls, rows, cutoff=None):
+        """Build from any iterable of review dicts, one row at a time."""
+        frame = cls(cutoff)
+        for r in rows:
+            frame.append(r)
+        return frame.finish()
+
+    def append(self, r):
+        get = r.get
+        self.n += 1
+        self.ids.append(r['id'])
+        self.titles.append(get('title'))
+        floats = self._floats
+        for key, col in (('rating', 'rating'), ('price_per_oz_usd', 'price')):
+            v = get(key)
+            floats[col].append(NAN if v is None else v)
+        for k in SCORE_KEYS:
+            v = get(k)
+            floats[k].append(NAN if v is None else v)
+        self.roaster.add(get('roaster'))
+        self.country.add(get('country'))
+        self.roast.add(get('roast_category'))
+        self.year.add(get('review_year'))
+        self.location.add(get('roaster_location'))
+        created = get('created_at')
+        if created and (self.last_updated is None or created > self.last_updated):
+            self.last_updated = created
+        self.latest.update(r)
+        self.recent.update(r)
+
+    def finish(self):
+        self.ids = np.frombuffer(self.ids, dtype=np.int64) if self.n else np.zeros(0, np.int64)
+        for k, col in self._floats.items():
+            setattr(self, k, np.frombuffer(col, dtype=np.float64) if self.n else np.zeros(0))
+        del self._floats
+        for cats in (self.roaster, self.country, self.roast, self.year, self.location):
+            cats.finish()
+        # Truthiness masks the dict code tests with `if r.get(...)`
+        self.rated = np.isfinite(self.rating) & (self.rating != 0)
+        self.priced = np.isfinite(self.price) & (self.price != 0)
+        self.usable_price = self.priced & (self.price > 0)
+        scored = np.ones(self.n, dtype=bool)
+        for k in SCORE_KEYS:
+            v = getattr(self, k)
+            scored &= np.isfinite(v) & (v != 0)
+        self.scored = scored
+        return self
+
+    def nbytes(self):
+        arrays = [self.ids, self.rating, self.price, *(getattr(self, k) for k in SCORE_KEYS)]
+        arrays += [c.codes for c in (self.roaster, self.country, self.roast, self.year, self.location)]
+        return sum(a.nbytes for a in arrays)
+
+    # ─── Group-by core ───────────────────────────────────────────────────────
+
+    def _groups(self, cats, mask):
+        """Per-category stats over rows in `mask`, in first-qualifying-row order.
+
+        Returns a list of (category value, stats dict) for categories with rows.
+        """
+        k = len(cats.values)
+        rows = np.flatnonzero(mask)
+        codes = cats.codes[rows]
+        n = np.bincount(codes, minlength=k)
+        total = np.bincount(codes, weights=self.rating[rows], minlength=k)
+        top = np.zeros(k)
+        np.maximum.at(top, codes, self.rating[rows])
+
+        priced = rows[self.usable_price[rows]]
+        pcodes = cats.codes[priced]
+        pn = np.bincount(pcodes, minlength=k)
+        ptotal = np.bincount(pcodes, weights=self.price[priced], minlength=k)
+
+        present, first = np.unique(codes, return_index=True)
+        order = present[np.argsort(first, kind='stable')]
+        return [(cats.values[c], {
+            'code': c,
+            'n': int(n[c]),
+            'avg_rating': rnd(float(total[c]) / int(n[c])),
+            'top_score': _num(top[c]),
+            'avg_price': rnd(float(ptotal[c]) / int(pn[c]), 2) if pn[c] else None,
+        }) for c in order]
+
+    def _last_location(self, mask):
+        """Roaster code -> last truthy roaster_location among rows in mask."""
+        rows = np.flatnonzero(mask & self.location.present)
+        last = np.full(len(self.roaster.values), -1, dtype=np.int64)
+        np.maximum.at(last, self.roaster.codes[rows], rows)
+        return {c: self.location.values[self.location.codes[i]] for c, i in enumerate(last) if i >= 0}
+
+    def _dominant_roast(self, cats, mask):
+        """Category code -> most frequent truthy roast_category (first seen on ties)."""
+        rows = np.flatnonzero(mask & self.roast.present)
+        r = len(self.roast.values)
+        if not len(rows):
+            return {}
+        key = cats.codes[rows].astype(np.int64) * r + self.roast.codes[rows]
+        counts = np.bincount(key, minlength=len(cats.values) * r).reshape(-1, r)
+        first = np.full(len(cats.values) * r, np.iinfo(np.int64).max)
+        np.minimum.at(first, key, rows)
+        first = first.reshape(-1, r)
+        dominant = {}
+        for c in np.flatnonzero(counts.sum(axis=1)):
+            best = np.flatnonzero(counts[c] == counts[c].max())
+            dominant[c] = self.roast.values[best[np.argmin(first[c][best])]]
+        return dominant
+
+    # ─── Table rows ──────────────────────────────────────────────────────────
+
+    def roaster_rows(self):
+        mask = self.roaster.present & self.rated
+        locations = self._last_location(mask)
+        return [{
+            'name': name,
+            'location': locations.get(g['code']),
+            'review_count': g['n'],
+            'avg_rating': g['avg_rating'],
+            'top_score': g['top_score'],
+            'avg_price_per_oz': g['avg_price'],
+        } for name, g in self._groups(self.roaster, mask)]
+
+    def _country_groups(self):
+        mask = self.country.present & self.rated
+        return self._groups(self.country, mask), self._dominant_roast(self.country, mask)
+
+    def country_rows(self, _groups=None):
+        groups, dominant = _groups or self._country_groups()
+        return [{
+            'name': name,
+            'review_count': g['n'],
+            'avg_rating': g['avg_rating'],
+            'avg_price_per_oz': g['avg_price'],
+            'top_score': g['top_score'],
+            'dominant_roast': dominant.get(g['code']),
+        } for name, g in groups if g['n'] >= 3]
+
+    # ─── Insights ────────────────────────────────────────────────────────────
+
+    def rating_distribution(self):
+        out = []
+        remaining = self.rated.copy()
+        for label, lo, hi in RATING_BUCKETS:
+            hit = remaining & (self.rating >= lo) & (self.rating <= hi)
+            remaining &= ~hit
+            out.append({'range': label, 'count': int(hit.sum()), 'min': lo, 'max': hi})
+        return out
+
+    def yearly_trends(self):
+        groups = self._groups(self.year, self.year.present & self.rated)
+        return sorted([{
+            'year': year,
+            'avgRating': g['avg_rating'],
+            'count': g['n'],
+            'avgPrice': g['avg_price'],
+        } for year, g in groups], key=lambda x: x['year'])
+
+    def top_roasters(self):
+        groups = self._groups(self.roaster, self.roaster.present & self.rated)
+        return sorted([{
+            'roaster': name[:30] + '…' if len(name) > 30 else name,
+            'avgRating': g['avg_rating'],
+            'count': g['n'],
+            'topScore': g['top_score'],
+        } for name, g in groups if g['n'] >= 5], key=lambda x: -x['avgRating'])[:15]
+
+    def _score_avgs(self, mask):
+        rows = mask & self.scored
+        n = int(rows.sum())
+        return {k: (rnd(float(getattr(self, k)[rows].sum()) / n) if n else 0) for k in SCORE_KEYS}
+
+    def _roast_mask(self, roast):
+        code = self.roast.index.get(roast)
+        return self.roast.codes == code if code is not None else np.zeros(self.n, dtype=bool)
+
+    def flavor_profiles(self):
+        everything = np.ones(self.n, dtype=bool)
+        return [{'label': 'Overall', **self._score_avgs(everything)}] + \
+               [{'label': roast, **self._score_avgs(self._roast_mask(roast))} for roast in ROASTS]
+
+    def roast_comparison(self):
+        rows = []
+        for roast in ROASTS:
+            subset = self._roast_mask(roast)
+            rated = subset & self.rated
+            n_rated = int(rated.sum())
+            prices = self.price[subset & self.usable_price]
+            avgs = self._score_avgs(subset)
+            rows.append({
+                'roast': roast,
+                'count': int(subset.sum()),
+                'avgRating': rnd(float(self.rating[rated].sum()) / n_rated if n_rated else 0),
+                'avgPrice': rnd(_seq_sum(prices) / len(prices), 2) if len(prices) else None,
+                'avgAroma': avgs['aroma'],
+                'avgAcidity': avgs['acidity'],
+                'avgBody': avgs['body'],
+                'avgFlavor': avgs['flavor'],
+                'avgAftertaste': avgs['aftertaste'],
+            })
+        return rows
+
+    def country_stats(self, _groups=None):
+        groups, dominant = _groups or self._country_groups()
+        stats = [{
+            'country': name,
+            'count': g['n'],
+            'avgRating': g['avg_rating'],
+            'avgPrice': g['avg_price'],
+            'topRoast': dominant.get(g['code']) or 'N/A',
+            'topScore': g['top_score'],
+        } for name, g in groups if g['n'] >= 3]
+        stats.sort(key=lambda x: -x['count'])
+        return stats
+
+    def price_tiers(self):
+        out = []
+        base = self.priced & self.rated
+        for name, label, lo, hi in PRICE_TIERS:
+            ratings = self.rating[base & (self.price > lo) & (self.price <= hi)]
+            n = len(ratings)
+            out.append({
+                'tier': name,
+                'range': label,
+                'count': n,
+                'avgRating': rnd(float(ratings.sum()) / n if n else 0),
+                'minRating': _num(ratings.min()) if n else 0,
+                'maxRating': _num(ratings.max()) if n else 0,
+            })
+        return out
+
+    def highlights(self):
+        highest = cheapest = None
+        rated = np.flatnonzero(self.rated)
+        if len(rated):
+            highest = rated[np.argmax(self.rating[rated])]  # argmax returns the first max
+        hq = np.flatnonzero(self.rated & (self.rating >= 90) & self.usable_price)
+        if len(hq):
+            cheapest = hq[np.argmin(self.price[hq])]
+
+        # Most reviewed country: over every review with a country
+        top_country = None
+        rows = np.flatnonzero(self.country.present)
+        if len(rows):
+            codes = self.country.codes[rows]
+            counts = np.bincount(codes, minlength=len(self.country.values))
+            present, first = np.unique(codes, return_index=True)
+            ordered = present[np.argsort(first, kind='stable')]
+            best = ordered[np.argmax(counts[ordered])]
+            top_country = (self.country.values[best], int(counts[best]))
+
+        # Most expensive average country: 10+ priced reviews, first seen on ties
+        exp_country = None
+        rows = np.flatnonzero(self.country.present & self.usable_price)
+        if len(rows):
+            codes = self.country.codes[rows]
+            k = len(self.country.values)
+            n = np.bincount(codes, minlength=k)
+            total = np.bincount(codes, weights=self.price[rows], minlength=k)
+            present, first = np.unique(codes, return_index=True)
+            ordered = present[np.argsort(first, kind='stable')]
+            exp_country = max(
+                [(self.country.values[c], rnd(float(total[c]) / int(n[c]), 2)) for c in ordered if n[c] >= 10],
+                key=lambda x: x[1], default=None
+            )
+
+        def roaster_of(i):
+            return self.roaster.values[self.roaster.codes[i]]
+
+        return {
+            'highestRatedBean': {
+                'title': self.titles[highest], 'rating': _num(self.rating[highest]), 'roaster': roaster_of(highest)
+            } if highest is not None else None,
+            'mostReviewedCountry': {
+                'country': top_country[0], 'count': top_country[1]
+            } if top_country else None,
+            'mostExpensiveAvgCountry': {
+                'country': exp_country[0], 'avgPrice': exp_country[1]
+            } if exp_country else None,
+            'cheapestHighQuality': {
+                'title': self.titles[cheapest], 'rating': _num(self.rating[cheapest]),
+                'price': f"${float(self.price[cheapest]):.2f}/oz"
+            } if cheapest is not None else None,
+        }
+
+    def insights(self):
+        """insights_cache key -> value, identical to ReviewAggregates.insights()."""
+        countries = self._country_groups()
+        return {
+            'total_reviews': self.n,
+            'rating_distribution': self.rating_distribution(),
+            'yearly_trends': self.yearly_trends(),
+            'top_roasters': self.top_roasters(),
+            'flavor_profiles': self.flavor_profiles(),
+            'roast_comparison': self.roast_comparison(),
+            'country_stats': self.country_stats(countries),
+            'price_tiers': self.price_tiers(),
+            'highlights': self.highlights(),
+            'dashboard_stats': self.recent.result(self.n, self.last_updated),
+            'recent_reviews': self.latest.result(),
+            'filter_options': {
+                'countries': sorted({v for v in self.country.values if v}),
+                'years': sorted({v for v in self.year.values if v}, reverse=True),
+            },
+        }
@@ -0,0 +1,214 @@
+"""
+Review Page Parser
+Single-pass extraction of a coffeereview.com review page into a reviews row.
+
+The tree is built once (lxml when installed, otherwise html.parser) and walked
+once to index every tag the extractor needs: metadata tables, the rating badge,
+title, h1, .entry-content and the section headers. Section bodies are read
+from that index, the full-page text is built at most once (only for the rating
+and price fallbacks), and all patterns are precompiled.
+
+Output matches the original scrape_and_embed.parse_review field for field;
+`bench_parser.py --check` verifies that against the golden pages.
+"""
+
+import re
+
+try:
+    import lxml  # noqa: F401
+    PARSER = 'lxml'
+except ImportError:
+    PARSER = 'html.parser'
+
+JUNK_PATTERNS = [
+    r'Roaster Location:.*', r'Coffee Origin:.*', r'Roast Level:.*',
+    r'Agtron:.*', r'Review Date:.*', r'Aroma:.*', r'Acidity:.*',
+    r'Body:.*', r'Flavor:.*', r'Aftertaste:.*', r'Blind Assessment:?',
+    r'Notes:?', r'Who Should Drink It:?', r'Explore Similar.*', r'Bottom Line:?'
+]
+_JUNK = [re.compile(p, re.IGNORECASE) for p in JUNK_PATTERNS]
+# Literal prefix of each junk pattern; a pattern can only match where its prefix occurs
+_JUNK_PREFIXES = [re.sub(r'(:\?|\.\*)$', '', p) for p in JUNK_PATTERNS]
+# Zero-width lookahead so overlapping prefixes are all reported in one scan
+_JUNK_SCAN = re.compile(
+    '(?=' + '|'.join(f'(?P<j{i}>{prefix})' for i, prefix in enumerate(_JUNK_PREFIXES)) + ')',
+    re.IGNORECASE
+)
+
+_REVIEW_DATE = re.compile(r'Review Date.*', re.I)
+_FIRST_INT = re.compile(r'(\d+)')
+_BIG_NUMBER = re.compile(r'(\d{2})\s*\n+\s*[A-Z]')
+_PRICE = re.compile(r'\$\d+\.\d+(?:\s*/\s*[\w\s]+)?')
+
+SECTIONS = {
+    'blind_assessment': re.compile('Blind Assessment', re.I),
+    'notes': re.compile('Notes', re.I),
+    'bottom_line': re.compile('Bottom Line', re.I),
+    'with_milk': re.compile('With Milk', re.I),  # For espresso reviews
+}
+SECTION_HEADER_TAGS = ('h2', 'strong', 'p')
+SECTION_END_TAGS = ('h1', 'h2', 'table')
+SECTION_STOP_WORDS = ("Notes", "Who Should Drink", "Explore Similar", "Bottom Line")
+
+
+def normalize_key(k):
+    """Normalize metadata keys: 'Review Date:' -> 'review_date'"""
+    return k.lower().replace(':', '').replace(' ', '_').strip()
+
+
+def _junk_present(text):
+    return {int(m.lastgroup[1:]) for m in _JUNK_SCAN.finditer(text)}
+
+
+def clean_text(text):
+    """Remove junk patterns from extracted text.
+
+    Equivalent to applying every pattern in order with re.sub, but patterns
+    whose prefix is absent are skipped. The scan is redone after any removal,
+    since deleting text can splice a new match together.
+    """
+    if not text: return ""
+    present = _junk_present(text)
+    for i, pattern in enumerate(_JUNK):
+        if i in present:
+            cleaned = pattern.sub('', text)
+            if cleaned != text:
+                text = cleaned
+                present = _junk_present(text)
+    return text.strip()
+
+
+def _has_class(tag, name):
+    classes = tag.get('class')
+    return bool(classes) and name in classes
+
+
+def parse_review(url, content, parser=None):
+    """Parse a fetched review page into a reviews row (without embedding)."""
+    from bs4 import BeautifulSoup, Tag  # Deferred: only parse workers need it
+    try:
+        soup = BeautifulSoup(content, parser or PARSER)
+
+        # === 0. ONE WALK: index every tag the extractor looks at ===
+        tags = []
+        tables, rating_el, title_el, h1, entry_content = [], None, None, None, None
+        headers = {}  # section -> index into tags
+        pending = dict(SECTIONS)
+        for el in soup.descendants:
+            if not isinstance(el, Tag):
+                continue
+            idx = len(tags)
+            tags.append(el)
+            name = el.name
+            if _has_class(el, 'review-template-table'):
+                tables.append(el)
+            if name == 'title' and title_el is None:
+                title_el = el
+            elif name == 'h1' and h1 is None:
+                h1 = el
+            if pending and name in SECTION_HEADER_TAGS:
+                string = el.string
+                if string is not None:
+                    for section, pattern in list(pending.items()):
+                        if pattern.search(string):
+                            headers[section] = idx
+                            del pending[section]
+            if rating_el is None and _has_class(el, 'review-template-rating'):
+                rating_el = el
+            if entry_content is None and _has_class(el, 'entry-content'):
+                entry_content = el
+
+        page_text = None
+        def full_text():
+            nonlocal page_text
+            if page_text is None:
+                page_text = soup.get_text()
+            return page_text
+
+        # === 1. METADATA FROM TABLES (there are multiple tables) ===
+        meta = {}
+        for table in tables:
+            for row in table.find_all('tr'):
+                tds = row.find_all('td')
+                if len(tds) >= 2:
+                    key = normalize_key(tds[0].get_text(strip=True))
+                    # Clean value (remove leaked labels)
+                    meta[key] = _REVIEW_DATE.sub('', tds[1].get_text(strip=True)).strip()
+
+        # === 2. RATING (High Precision) ===
+        rating = 0
+        if rating_el is not None:
+            m = _FIRST_INT.search(rating_el.get_text())
+            if m: rating = int(m.group(1))
+        if rating == 0:
+            # Fallback: Look for big number at start
+            m = _BIG_NUMBER.search(full_text())
+            if m: rating = int(m.group(1))
+
+        # === 3. ROASTER PARSING ===
+        title_full = title_el.string if title_el is not None else ""
+        roaster = meta.get('roaster', 'Unknown')
+        if roaster == "Unknown" and " by " in title_full:
+            roaster = title_full.split(" by ")[1].split(" Review")[0].strip()
+
+        # === 4. PRICE PARSING (handles multiple label formats) ===
+        price = meta.get('price') or meta.get('est._price') or meta.get('est_price') or 'N/A'
+        if price == "N/A" or not price or "Review Date" in price:
+            p_match = _PRICE.search(full_text())
+            if p_match: price = p_match.group(0).strip()
+        price = _REVIEW_DATE.sub('', price).strip()
+
+        # === 5. EXTRACT TEXT SECTIONS ===
+        def extract_section(section):
+            start = headers.get(section)
+            if start is None: return ""
+            content = []
+            for i in range(start + 1, len(tags)):
+                curr = tags[i]
+                if curr.name in SECTION_END_TAGS:
+                    break
+                if curr.name == 'p':
+                    txt = curr.get_text(strip=True)
+                    if any(x in txt for x in SECTION_STOP_WORDS):
+                        break
+                    content.append(txt)
+            return ' '.join(content)
+
+        sections = {section: clean_text(extract_section(section)) for section in SECTIONS}
+
+        # === 6. METRIC SCORES (from metadata) ===
+        def get_int(key):
+            m = _FIRST_INT.search(str(meta.get(key, '0')))
+            return int(m.group(1)) if m else 0
+
+        # === BUILD DATA DICT ===
+        data = {
+            "title": h1.get_text(strip=True) if h1 is not None else "Unknown",
+            "roaster": roaster,
+            "roaster_location": meta.get('roaster_location', meta.get('roaster', 'Unknown')),
+            "roast_level": meta.get('roast_level', 'Unknown'),
+            "agtron": meta.get('agtron', 'N/A'),
+            "origin": meta.get('coffee_origin', meta.get('origin', 'Unknown')),
+            "price": price if price else 'N/A',
+            "review_date": meta.get('review_date', 'Unknown'),
+            "rating": rating,
+            "blind_assessment": sections['blind_assessment'],
+            "notes": sections['notes'],
+            "bottom_line": sections['bottom_line'],
+            "with_milk": sections['with_milk'] or None,
+            "url": url,
+        }
+
+        # Store trimmed HTML for future re-parsing
+        data["raw_content"] = str(entry_content) if entry_content is not None else None
+
+        data["aroma"] = get_int('aroma')
+        data["acidity"] = get_int('acidity/structure') or get_int('acidity')  # Handle both labels
+        data["body"] = get_int('body')
+        data["flavor"] = get_int('flavor')
+        data["aftertaste"] = get_int('aftertaste')
+
+        return data
+    except Exception as e:
+        print(f"Error scraping {url}: {e}")
+        return None
@@ -0,0 +1,86 @@
+"""
+Parallel Review Reader
+Reads a whole table (or everything above an id) without OFFSET pagination.
+
+The id bounds are fetched first and split into fixed-width id ranges; each
+range is read with keyset predicates (`id >= lo AND id <= hi`, then
+`id > last` if a range still holds more than one page), so every request is an
+index range scan no matter how deep into the table it is. Ranges are fetched
+concurrently over the client's shared HTTP connection pool and handed back in
+id order, either streamed or as one list.
+
+Usage:
+    from review_reader import fetch_reviews, iter_reviews
+    rows = fetch_reviews(supabase, 'id, rating, country')
+    for row in iter_reviews(supabase, 'id, raw_content', after_id=5000): ...
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+PAGE_SIZE = 1000  # PostgREST max rows per request
+WORKERS = 8       # Concurrent requests; the work is network-bound
+
+
+def id_bounds(supabase, table='reviews', where=None):
+    """(min id, max id) of the rows matching `where`, or (None, None) if none."""
+    def edge(desc):
+        q = supabase.table(table).select('id')
+        if where:
+            q = where(q)
+        data = q.order('id', desc=desc).limit(1).execute().data
+        return data[0]['id'] if data else None
+    return edge(False), edge(True)
+
+
+def split_ranges(lo, hi, width=PAGE_SIZE):
+    """Inclusive (lo, hi) id ranges covering lo..hi, each `width` ids wide."""
+    return [(start, min(start + width - 1, hi)) for start in range(lo, hi + 1, width)]
+
+
+def fetch_range(supabase, table, columns, lo, hi, where=None, page_size=PAGE_SIZE):
+    """All rows with lo <= id <= hi, in id order (keyset pages if more than one)."""
+    rows = []
+    last = lo - 1
+    while True:
+        q = supabase.table(table).select(columns)
+        if where:
+            q = where(q)
+        page = q.gt('id', last).lte('id', hi).order('id').limit(page_size).execute().data
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        last = page[-1]['id']
+
+
+def iter_reviews(supabase, columns, table='reviews', after_id=0, where=None,
+                 workers=WORKERS, range_width=PAGE_SIZE):
+    """Stream rows with id > after_id in id order, fetching ranges concurrently.
+
+    `where(query)` may add extra PostgREST filters. At most 2 × workers ranges
+    are buffered, so memory stays bounded however large the table is. `columns`
+    must include `id`.
+    """
+    lo, hi = id_bounds(supabase, table, where=lambda q: (where(q) if where else q).gt('id', after_id))
+    if lo is None:
+        return
+    ranges = iter(split_ranges(lo, hi, range_width))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        inflight = deque()
+
+        def submit_next():
+            r = next(ranges, None)
+            if r is not None:
+                inflight.append(pool.submit(fetch_range, supabase, table, columns, r[0], r[1], where))
+
+        for _ in range(2 * workers):
+            submit_next()
+        while inflight:
+            rows = inflight.popleft().result()
+            submit_next()
+            yield from rows
+
+
+def fetch_reviews(supabase, columns, **kwargs):
+    """List form of iter_reviews()."""
+    return list(iter_reviews(supabase, columns, **kwargs))
@@ -1,177 +1,215 @@
-import re
-import os
 import time
+_T0 = time.perf_counter()  # Startup clock, reported by main()
+
+import os
+import sys
 import requests
 import argparse
-from bs4 import BeautifulSoup
-from sentence_transformers import SentenceTransformer
-from supabase import create_client, Client
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
+from pipeline import Stage, BatchStage, Pipeline, RateLimiter
+from bulk_writer import BulkWriter
+from seen_index import SeenUrlIndex
+from http_cache import HttpCache, CACHE_DIR
+from review_parser import parse_review
+from fetch_sitemap import read_url_file, record_stored
 
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-model = SentenceTransformer('all-MiniLM-L6-v2')
-
-def normalize_key(k):
-    """Normalize metadata keys: 'Review Date:' -> 'review_date'"""
-    return k.lower().replace(':', '').replace(' ', '_').strip()
-
-def clean_text(text):
-    """Remove junk patterns from extracted text"""
-    if not text: return ""
-    junk_patterns = [
-        r'Roaster Location:.*', r'Coffee Origin:.*', r'Roast Level:.*', 
-        r'Agtron:.*', r'Review Date:.*', r'Aroma:.*', r'Acidity:.*', 
-        r'Body:.*', r'Flavor:.*', r'Aftertaste:.*', r'Blind Assessment:?',
-        r'Notes:?', r'Who Should Drink It:?', r'Explore Similar.*', r'Bottom Line:?'
-    ]
-    cleaned = text
-    for p in junk_patterns:
-        cleaned = re.sub(p, '', cleaned, flags=re.IGNORECASE)
-    return cleaned.strip()
-
-def scrape_review(url):
+
+# The model (torch / onnxruntime) and Supabase client are expensive to import and build, so
+# they are created on first real use; `--help` and no-op runs never pay for them.
+_model = None
+_supabase = None
+_embed_cache = None  # EmbeddingCache set up by main(); None encodes everything
+_encode_batch = 8    # Inner batch size of the model's encode (--encode-batch)
+_encoded = {'texts': 0, 'seconds': 0.0}  # Texts the encoder actually ran on
+
+def get_model():
+    global _model
+    if _model is None:
+        from encoders import load_encoder  # EMBED_BACKEND picks torch or ONNX
+        _model = load_encoder()
+    return _model
+
+def get_supabase():
+    global _supabase
+    if _supabase is None:
+        from supabase import create_client
+        _supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _supabase
+
+def startup_ms():
+    return (time.perf_counter() - _T0) * 1000
+
+HEADERS = {'User-Agent': 'Mozilla/5.0 (compatible; BrewIntelligence/2.0)'}
+http = requests.Session()  # Shared keep-alive pool for the fetch workers
+
+def fetch_page(url, cache=None):
+    """Get a review page's HTML bytes (or None), through `cache` if given.
+
+    Returns (content, used_network); only an offline cache skips the network.
+    """
     print(f"Scraping {url}...")
-    headers = {'User-Agent': 'Mozilla/5.0 (compatible; BrewIntelligence/2.0)'}
     try:
-        res = requests.get(url, headers=headers)
-        if res.status_code != 200: return None
-        soup = BeautifulSoup(res.content, 'html.parser')
-        
-        # === 1. METADATA FROM TABLES (there are multiple tables) ===
-        meta = {}
-        tables = soup.select('.review-template-table')  # Get ALL tables, not just first
-        for table in tables:
-            for row in table.find_all('tr'):
-                tds = row.find_all('td')
-                if len(tds) >= 2:
-                    raw_key = tds[0].get_text(strip=True)
-                    raw_val = tds[1].get_text(strip=True)
-                    # Normalize key
-                    key = normalize_key(raw_key)
-                    # Clean value (remove leaked labels)
-                    val = re.sub(r'Review Date.*', '', raw_val, flags=re.I).strip()
-                    meta[key] = val
-
-        # === 2. RATING (High Precision) ===
-        rating = 0
-        rating_el = soup.select_one('.review-template-rating')
-        if rating_el:
-            m = re.search(r'(\d+)', rating_el.get_text())
-            if m: rating = int(m.group(1))
-        
-        if rating == 0:
-            # Fallback: Look for big number at start
-            content_txt = soup.get_text()
-            m = re.search(r'(\d{2})\s*\n+\s*[A-Z]', content_txt)
-            if m: rating = int(m.group(1))
-
-        # === 3. ROASTER PARSING ===
-        title_full = soup.title.string if soup.title else ""
-        roaster = meta.get('roaster', 'Unknown')
-        if roaster == "Unknown" and " by " in title_full:
-            roaster = title_full.split(" by ")[1].split(" Review")[0].strip()
-
-        # === 4. PRICE PARSING (handles multiple label formats) ===
-        price = meta.get('price') or meta.get('est._price') or meta.get('est_price') or 'N/A'
-        if price == "N/A" or not price or "Review Date" in price:
-            p_match = re.search(r'\$\d+\.\d+(?:\s*/\s*[\w\s]+)?', soup.get_text())
-            if p_match: price = p_match.group(0).strip()
-        price = re.sub(r'Review Date.*', '', price, flags=re.I).strip()
-
-        # === 5. EXTRACT TEXT SECTIONS ===
-        def extract_section(header_text):
-            h = soup.find(['h2', 'strong', 'p'], string=re.compile(header_text, re.I))
-            if not h: return ""
-            content = []
-            curr = h.find_next()
-            while curr and curr.name not in ['h1', 'h2', 'table']:
-                if curr.name == 'p':
-                    txt = curr.get_text(strip=True)
-                    if any(x in txt for x in ["Notes", "Who Should Drink", "Explore Similar", "Bottom Line"]): 
-                        break
-                    content.append(txt)
-                curr = curr.find_next()
-            return ' '.join(content)
-
-        blind_assessment = clean_text(extract_section("Blind Assessment"))
-        notes = clean_text(extract_section("Notes"))
-        bottom_line = clean_text(extract_section("Bottom Line"))
-        with_milk = clean_text(extract_section("With Milk"))  # For espresso reviews
-
-        # === 6. METRIC SCORES (from metadata) ===
-        def get_int(key):
-            val = meta.get(key, '0')
-            m = re.search(r'(\d+)', str(val))
-            return int(m.group(1)) if m else 0
-
-        # === BUILD DATA DICT ===
-        data = {
-            "title": soup.select_one('h1').get_text(strip=True) if soup.select_one('h1') else "Unknown",
-            "roaster": roaster,
-            "roaster_location": meta.get('roaster_location', meta.get('roaster', 'Unknown')),
-            "roast_level": meta.get('roast_level', 'Unknown'),
-            "agtron": meta.get('agtron', 'N/A'),
-            "origin": meta.get('coffee_origin', meta.get('origin', 'Unknown')),
-            "price": price if price else 'N/A',
-            "review_date": meta.get('review_date', 'Unknown'),
-            "rating": rating,
-            "blind_assessment": blind_assessment,
-            "notes": notes,
-            "bottom_line": bottom_line,
-            "with_milk": with_milk if with_milk else None,
-            "url": url,
-        }
-        
-        # Store trimmed HTML for future re-parsing
-        entry_content = soup.select_one('.entry-content')
-        data["raw_content"] = str(entry_content) if entry_content else None
-        
-        data["aroma"] = get_int('aroma')
-        data["acidity"] = get_int('acidity/structure') or get_int('acidity')  # Handle both labels
-        data["body"] = get_int('body')
-        data["flavor"] = get_int('flavor')
-        data["aftertaste"] = get_int('aftertaste')
-
-        return data
+        if cache is not None:
+            return cache.fetch(http, url, headers=HEADERS)
+        res = http.get(url, headers=HEADERS)
+        if res.status_code != 200: return None, True
+        return res.content, True
     except Exception as e:
         print(f"Error scraping {url}: {e}")
-        return None
-
-def process_batch(urls):
-    for url in urls:
-        data = scrape_review(url)
-        if data:
-            # Generate embedding from title + blind assessment + notes
-            embed_text = f"{data['title']} {data['blind_assessment']} {data.get('notes', '')}"
-            data['embedding'] = model.encode(embed_text).tolist()
-            try:
-                # DEBUG: Print full data dict
-                print(f"  --- DEBUG DATA ---")
-                for k, v in data.items():
-                    if k != 'embedding':
-                        display = v[:80] + '...' if isinstance(v, str) and len(v) > 80 else v
-                        print(f"    {k}: {display}")
-                print(f"  --- END DEBUG ---")
-                
-                supabase.table('reviews').upsert(data, on_conflict='url').execute()
-                print(f"  ✅ Synced: {data['title']} | Score: {data['rating']} | Price: {data['price']}")
-            except Exception as e:
-                print(f"  ❌ DB Error: {e}")
-        time.sleep(1)  # 1 second delay between requests
+        return None, True
+
+def scrape_review(url, cache=None):
+    content, _ = fetch_page(url, cache)
+    return parse_review(url, content) if content else None
+
+def embed_text_for(data):
+    """Text we embed: title + blind assessment + notes"""
+    return f"{data['title']} {data['blind_assessment']} {data.get('notes', '')}"
+
+def encode_texts(texts):
+    """Encode texts in inner batches of _encode_batch; vectors come back in input
+    order. The encoder sorts texts by length itself, so each padded batch holds
+    texts of similar length. With EMBED_SERVICE_URL set the shared embedding
+    service encodes them instead of a local model."""
+    from embed_service import service_encoder
+    remote = service_encoder()
+    t0 = time.perf_counter()
+    if remote is not None:
+        vectors = remote(texts)
+    else:
+        vectors = get_model().encode(texts, batch_size=_encode_batch)
+    _encoded['texts'] += len(texts)
+    _encoded['seconds'] += time.perf_counter() - t0
+    return vectors
+
+def report_encoder():
+    texts, seconds = _encoded['texts'], _encoded['seconds']
+    rate = f"{texts / seconds:.1f} encodes/s" if seconds else "n/a"
+    print(f"🧮 Encoder: {texts} texts in {seconds:.1f}s ({rate} at --encode-batch {_encode_batch})")
+
+def embed_batch(batch):
+    """Encode a micro-batch of rows and attach their vectors.
+
+    Texts already in the embedding cache skip the model (and its load).
+    """
+    texts = [embed_text_for(d) for d in batch]
+    vectors = _embed_cache.encode(texts, encode_texts) if _embed_cache is not None else encode_texts(texts)
+    for data, vec in zip(batch, vectors):
+        data['embedding'] = vec.tolist()
+    return batch
+
+def upsert_reviews(rows):
+    """One multi-row upsert round trip against the reviews table."""
+    get_supabase().table('reviews').upsert(rows, on_conflict='url').execute()
+
+def report_synced(rows):
+    for data in rows:
+        print(f"  ✅ Synced: {data['title']} | Score: {data['rating']} | Price: {data['price']}")
+
+def debug_review(data):
+    # DEBUG: Print full data dict
+    print(f"  --- DEBUG DATA ---")
+    for k, v in data.items():
+        if k != 'embedding':
+            display = v[:80] + '...' if isinstance(v, str) and len(v) > 80 else v
+            print(f"    {k}: {display}")
+    print(f"  --- END DEBUG ---")
+
+def process_batch(urls, fetch_workers=4, parse_workers=2, delay=1.0, queue_size=32,
+                  embed_batch_size=32, embed_flush_ms=500, write_rows=200, write_bytes=4_000_000,
+                  seen=None, cache=None, lastmods=None):
+    """Scrape, parse, embed and store reviews as an overlapping staged pipeline.
+
+    fetch (N threads) → parse (process pool) → embed (micro-batched) → write
+    (buffered bulk upserts), with bounded queues in between so a slow stage
+    applies backpressure upstream. Pages come through the HTTP `cache` when
+    given, and stored URLs are added to `seen`. Stored URLs that came from the
+    sitemap delta (`lastmods`) are recorded in the sitemap manifest.
+    """
+    def on_written(rows):
+        report_synced(rows)
+        if seen is not None:
+            seen.add([r['url'] for r in rows])
+        if lastmods:
+            record_stored([(r['url'], lastmods[r['url']]) for r in rows if r['url'] in lastmods])
+
+    writer = BulkWriter(upsert_reviews, max_rows=write_rows, max_bytes=write_bytes,
+                        key='url', on_written=on_written)
+
+    def write(data):
+        debug_review(data)
+        writer.add(data)
+        return data
+
+    limiter = RateLimiter(delay)
+
+    def fetch(url):
+        if cache is None or not cache.offline:
+            limiter.wait()  # Politeness delay, shared by every fetcher
+        content, _ = fetch_page(url, cache)
+        return (url, content) if content else None
+
+    with ProcessPoolExecutor(max_workers=parse_workers) as pool:
+        def parse(item):
+            return pool.submit(parse_review, *item).result()
+
+        pipeline = Pipeline([
+            Stage('fetch', fetch, workers=fetch_workers, maxsize=queue_size),
+            Stage('parse', parse, workers=parse_workers, maxsize=queue_size),
+            BatchStage('embed', embed_batch, batch_size=embed_batch_size,
+                       flush_ms=embed_flush_ms, maxsize=queue_size),
+            Stage('write', write, workers=1, maxsize=queue_size),
+        ])
+        pipeline.run(urls)
+    writer.close()
+
+    pipeline.report()
+    if cache is not None:
+        cache.report()
+    if _embed_cache is not None:
+        _embed_cache.report()
+    report_encoder()
+    writer.report('reviews')
+    return writer
 
 def main():
+    global _embed_cache, _encode_batch
     parser = argparse.ArgumentParser()
+    parser.add_argument('--urls-file', default='data_pipeline/urls.txt',
+                        help='URL list to scrape (e.g. data_pipeline/urls_delta.txt from fetch_sitemap.py)')
     parser.add_argument('--limit', type=int, default=10, help='Number of URLs to process')
     parser.add_argument('--offset', type=int, default=0, help='Skip first N URLs (for resuming)')
-    parser.add_argument('--skip-existing', action='store_true', help='Skip URLs already in database')
+    parser.add_argument('--skip-existing', action='store_true',
+                        help='Skip URLs already in database (except URLs the sitemap delta marks modified)')
+    parser.add_argument('--no-sync', action='store_true',
+                        help='With --skip-existing, trust the local seen-URL index without syncing it')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='On-disk HTTP cache for fetched pages')
+    parser.add_argument('--no-cache', action='store_true', help='Always download pages, bypassing the cache')
+    parser.add_argument('--offline', action='store_true', help='Serve pages only from the cache; never hit the network')
+    parser.add_argument('--embed-cache', default=None, help='Embedding cache location (SQLite)')
+    parser.add_argument('--no-embed-cache', action='store_true', help='Encode every review, ignoring the embedding cache')
+    parser.add_argument('--fetch-workers', type=int, default=4, help='Concurrent page downloads')
+    parser.add_argument('--parse-workers', type=int, default=2, help='HTML parser processes')
+    parser.add_argument('--delay', type=float, default=1.0, help='Minimum seconds between network requests, across all fetchers')
+    parser.add_argument('--queue-size', type=int, default=32, help='Max items buffered between stages')
+    parser.add_argument('--embed-batch', type=int, default=32, help='Max reviews per encode call')
+    parser.add_argument('--encode-batch', type=int, default=_encode_batch,
+                        help='Texts per padded forward pass inside each encode call')
+    parser.add_argument('--embed-flush-ms', type=int, default=500, help='Max ms to wait for a full embed batch')
+    parser.add_argument('--write-rows', type=int, default=200, help='Rows per bulk upsert')
+    parser.add_argument('--write-bytes', type=int, default=4_000_000, help='Max JSON bytes per bulk upsert')
+    parser.add_argument('--startup-budget-ms', type=float, default=None,
+                        help='Exit non-zero if a run with nothing to do takes longer than this')
     args = parser.parse_args()
+    from encoders import check_db_writer
+    check_db_writer()  # Refuse to mix backends in reviews.embedding
     
-    with open('data_pipeline/urls.txt', 'r') as f:
-        urls = [l.strip() for l in f if l.strip()]
+    urls, lastmods, modified = read_url_file(args.urls_file)
     urls.reverse()  # Start from newest
     
     # Apply offset
@@ -179,24 +217,49 @@ def main():
         print(f"⏭️  Skipping first {args.offset} URLs...")
         urls = urls[args.offset:]
     
-    # Apply limit
-    urls = urls[:args.limit]
-    
-    # Skip existing URLs if flag is set
+    # Skip existing URLs if flag is set (before the limit, so it counts URLs to scrape)
+    seen = None
     if args.skip_existing:
-        print("🔍 Checking database for existing URLs...")
-        try:
-            existing = supabase.table('reviews').select('url').execute()
-            existing_urls = {r['url'] for r in existing.data}
-            before = len(urls)
-            urls = [u for u in urls if u not in existing_urls]
-            print(f"   Filtered: {before} → {len(urls)} (skipping {before - len(urls)} existing)")
-        except Exception as e:
-            print(f"   ⚠️  Could not check existing: {e}")
+        seen = SeenUrlIndex()
+        if not args.no_sync:
+            print(f"🔍 Syncing seen-URL index (id > {seen.watermark})...")
+            try:
+                pulled = seen.sync(get_supabase())
+                print(f"   Pulled {pulled} new URLs, index holds {len(seen)}")
+            except Exception as e:
+                print(f"   ⚠️  Could not sync, using local index as-is: {e}")
+        before = len(urls)
+        existing = [u for u in urls if u in seen and u not in modified]
+        urls = [u for u in urls if u not in seen or u in modified]
+        print(f"   Filtered: {before} → {len(urls)} (skipping {before - len(urls)} existing)")
+        # Already stored at this lastmod: they leave the sitemap delta
+        record_stored([(u, lastmods[u]) for u in existing if u in lastmods])
+    
+    # Apply limit; delta URLs past it stay in the next delta
+    urls = urls[:args.limit]
     
+    if not urls:
+        elapsed = startup_ms()
+        print(f"✅ Nothing to scrape. ⏱️  Finished in {elapsed:.0f} ms (model never loaded)")
+        if args.startup_budget_ms is not None and elapsed > args.startup_budget_ms:
+            print(f"❌ No-op run exceeded the {args.startup_budget_ms:.0f} ms startup budget")
+            sys.exit(1)
+        return
+
+    cache = None if args.no_cache else HttpCache(args.cache_dir, offline=args.offline)
+    _encode_batch = args.encode_batch
+    if not args.no_embed_cache:
+        from embedding_cache import EmbeddingCache, CACHE_PATH
+        _embed_cache = EmbeddingCache(args.embed_cache or CACHE_PATH)
+
+    print(f"⏱️  Startup: {startup_ms():.0f} ms")
     print(f"\n📦 Processing {len(urls)} URLs...\n")
-    process_batch(urls)
-    print(f"\n✨ Done! Processed {len(urls)} reviews.")
+    writer = process_batch(urls, fetch_workers=args.fetch_workers, parse_workers=args.parse_workers,
+                           delay=args.delay, queue_size=args.queue_size,
+                           embed_batch_size=args.embed_batch, embed_flush_ms=args.embed_flush_ms,
+                           write_rows=args.write_rows, write_bytes=args.write_bytes, seen=seen,
+                           cache=cache, lastmods=lastmods)
+    print(f"\n✨ Done! Stored {writer.written}/{len(urls)} reviews.")
 
 if __name__ == "__main__":
     main()
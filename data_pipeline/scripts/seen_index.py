@@ -0,0 +1,114 @@
+"""
+Seen-URL Index
+Local SQLite mirror of the review URLs already stored in Supabase, so
+--skip-existing is an in-memory set lookup instead of a capped DB query.
+
+Syncs incrementally: only rows with an id above the last synced id are pulled.
+
+Usage:
+    python data_pipeline/scripts/seen_index.py            # incremental sync
+    python data_pipeline/scripts/seen_index.py --rebuild  # drop and re-pull everything
+"""
+
+import os
+import sqlite3
+import argparse
+import threading
+
+INDEX_PATH = os.path.join('data_pipeline', 'logs', 'seen_urls.sqlite')
+PAGE_SIZE = 1000  # PostgREST max rows per request
+
+
+class SeenUrlIndex:
+    def __init__(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, id INTEGER);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self._urls = {url for (url,) in self._conn.execute('SELECT url FROM urls')}
+
+    def __contains__(self, url):
+        return url in self._urls
+
+    def __len__(self):
+        return len(self._urls)
+
+    @property
+    def watermark(self):
+        """Highest reviews.id pulled from the DB so far (0 if never synced)."""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'last_id'").fetchone()
+        return int(row[0]) if row else 0
+
+    def add(self, urls, ids=None):
+        """Record URLs as stored. Safe to call from a writer thread."""
+        ids = ids or [None] * len(urls)
+        with self._lock:
+            self._conn.executemany(
+                'INSERT INTO urls (url, id) VALUES (?, ?) '
+                'ON CONFLICT(url) DO UPDATE SET id = COALESCE(excluded.id, urls.id)',
+                list(zip(urls, ids))
+            )
+            self._conn.commit()
+            self._urls.update(urls)
+
+    def sync(self, supabase, page_size=PAGE_SIZE):
+        """Pull every review URL with an id above the watermark, keyset-paged by id."""
+        last_id = self.watermark
+        pulled = 0
+        while True:
+            result = supabase.table('reviews').select('id, url') \
+                .gt('id', last_id).order('id').limit(page_size).execute()
+            if not result.data:
+                break
+            self.add([r['url'] for r in result.data], [r['id'] for r in result.data])
+            last_id = result.data[-1]['id']
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_id', ?)", (str(last_id),)
+                )
+                self._conn.commit()
+            pulled += len(result.data)
+            if len(result.data) < page_size:
+                break
+        return pulled
+
+    def rebuild(self, supabase):
+        """Forget everything local and re-pull the full URL list."""
+        with self._lock:
+            self._conn.executescript('DELETE FROM urls; DELETE FROM meta;')
+            self._urls.clear()
+        return self.sync(supabase)
+
+    def close(self):
+        self._conn.close()
+
+
+def main():
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    parser = argparse.ArgumentParser(description='Sync the local seen-URL index from Supabase')
+    parser.add_argument('--rebuild', action='store_true', help='Drop the local index and re-pull all URLs')
+    parser.add_argument('--path', default=INDEX_PATH, help='SQLite index location')
+    args = parser.parse_args()
+
+    load_dotenv()
+    supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    index = SeenUrlIndex(args.path)
+
+    if args.rebuild:
+        print(f"🧱 Rebuilding {args.path}...")
+        pulled = index.rebuild(supabase)
+    else:
+        print(f"🔄 Syncing {args.path} from id > {index.watermark}...")
+        pulled = index.sync(supabase)
+    print(f"✅ Pulled {pulled} URLs — index holds {len(index)} (watermark id {index.watermark})")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
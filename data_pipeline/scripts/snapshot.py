@@ -0,0 +1,332 @@
+"""
+Local Columnar Snapshot
+Mirrors the reviews table (embeddings included) into memory-mappable column
+files under data_pipeline/snapshot/reviews/, so scripts can load it in well
+under a second without paging Supabase or re-parsing a CSV.
+
+Each column is one raw little-endian file that only ever grows:
+  num     float64 (NaN = null), or the dtype recorded in the manifest
+  str     UTF-8 bytes back to back + int64 end offsets + uint8 valid mask
+  vector  float32 rows of `dim` values + uint8 valid mask
+manifest.json records the row count, the id watermark and every file's size.
+A run fetches only rows with id above the watermark and appends them; the
+manifest is replaced last, so an interrupted append is truncated away on the
+next run. Edits to rows already in the snapshot (migrate_clean, reparse) are
+only picked up by --rebuild.
+
+The same format caches CSV files (load_csv): the first load converts the CSV,
+later loads reuse the columns until the CSV's size or mtime changes.
+
+Usage:
+    python data_pipeline/scripts/snapshot.py              # append new reviews
+    python data_pipeline/scripts/snapshot.py --rebuild    # re-mirror everything
+
+    from snapshot import load_reviews, load_csv
+    snap = load_reviews(['id', 'rating', 'embedding'])   # only these files are opened
+    snap['embedding']                                     # (n, 384) float32 memmap
+    df = load_csv('web/src/data/coffee_data.csv', columns=['name', 'review'])
+"""
+
+import os
+import json
+import time
+import shutil
+import argparse
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SNAPSHOT_DIR = os.path.join('data_pipeline', 'snapshot')
+REVIEWS_DIR = os.path.join(SNAPSHOT_DIR, 'reviews')
+CSV_DIR = os.path.join(SNAPSHOT_DIR, 'csv')
+FORMAT_VERSION = 1
+EMBEDDING_DIM = 384   # all-MiniLM-L6-v2
+CHUNK_ROWS = 5000     # Rows buffered between appends (and manifest saves)
+
+# Every reviews column except raw_content (trimmed HTML, only reparse.py reads it)
+REVIEW_SCHEMA = {
+    'id': ('num', '<i8'),
+    'title': ('str', None),
+    'roaster': ('str', None),
+    'roaster_location': ('str', None),
+    'roast_level': ('str', None),
+    'agtron': ('str', None),
+    'price': ('str', None),
+    'origin': ('str', None),
+    'review_date': ('str', None),
+    'rating': ('num', '<f8'),
+    'aroma': ('num', '<f8'),
+    'acidity': ('num', '<f8'),
+    'body': ('num', '<f8'),
+    'flavor': ('num', '<f8'),
+    'aftertaste': ('num', '<f8'),
+    'blind_assessment': ('str', None),
+    'notes': ('str', None),
+    'bottom_line': ('str', None),
+    'with_milk': ('str', None),
+    'url': ('str', None),
+    'created_at': ('str', None),
+    'country': ('str', None),
+    'price_numeric': ('num', '<f8'),
+    'currency': ('str', None),
+    'weight_oz': ('num', '<f8'),
+    'weight_unit': ('str', None),
+    'price_per_oz_usd': ('num', '<f8'),
+    'review_year': ('num', '<f8'),
+    'roast_category': ('str', None),
+    'embedding': ('vector', '<f4'),
+}
+
+
+# ─── Column Files ────────────────────────────────────────────────────────────
+
+def _files(name, kind):
+    """Files backing one column, data file first."""
+    if kind == 'str':
+        return [f'{name}.utf8', f'{name}.end', f'{name}.valid']
+    if kind == 'vector':
+        return [f'{name}.vec', f'{name}.valid']
+    return [f'{name}.bin']
+
+
+class StringColumn:
+    """Read-only view of a str column; values decode on access (None = null)."""
+
+    def __init__(self, data, ends, valid):
+        self.data, self.ends, self.valid = data, ends, valid
+
+    def __len__(self):
+        return len(self.ends)
+
+    def __getitem__(self, i):
+        if not self.valid[i]:
+            return None
+        start = int(self.ends[i - 1]) if i else 0
+        return bytes(self.data[start:int(self.ends[i])]).decode('utf-8')
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def tolist(self, na=None):
+        buf = memoryview(self.data)
+        ends = self.ends.tolist()
+        starts = [0] + ends[:-1]
+        return [str(buf[s:e], 'utf-8') if ok else na
+                for s, e, ok in zip(starts, ends, self.valid.tolist())]
+
+
+class Table:
+    """A columnar table on disk: the manifest plus lazily opened column files."""
+
+    def __init__(self, root, mmap=True):
+        self.root = root
+        self.mmap = mmap
+        with open(os.path.join(root, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        self.n = self.manifest['rows']
+        self._open = {}
+
+    @property
+    def columns(self):
+        return list(self.manifest['columns'])
+
+    @property
+    def watermark(self):
+        return self.manifest.get('watermark')
+
+    def _array(self, file, dtype, shape):
+        path = os.path.join(self.root, file)
+        count = int(np.prod(shape))
+        if count == 0:
+            return np.empty(shape, dtype=dtype)
+        if self.mmap:
+            return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+        return np.fromfile(path, dtype=dtype, count=count).reshape(shape)
+
+    def __getitem__(self, name):
+        if name not in self._open:
+            kind, dtype = self.manifest['columns'][name]
+            n = self.n
+            if kind == 'str':
+                size = self.manifest['bytes'][f'{name}.utf8']
+                self._open[name] = StringColumn(self._array(f'{name}.utf8', np.uint8, (size,)),
+                                                self._array(f'{name}.end', '<i8', (n,)),
+                                                self._array(f'{name}.valid', bool, (n,)))
+            elif kind == 'vector':
+                dim = self.manifest['dim']
+                self._open[name] = self._array(f'{name}.vec', dtype, (n, dim))
+            else:
+                self._open[name] = self._array(f'{name}.bin', dtype, (n,))
+        return self._open[name]
+
+    def valid(self, name):
+        """Non-null mask of a str or vector column (num columns use NaN)."""
+        return self._array(f'{name}.valid', bool, (self.n,))
+
+    def frame(self, columns=None, na=None):
+        """pandas DataFrame of the given columns (vectors become lists of arrays)."""
+        import pandas as pd
+        data = {}
+        for name in columns or self.columns:
+            kind = self.manifest['columns'][name][0]
+            col = self[name]
+            if kind == 'str':
+                # The dtype slot of a str column is the pandas dtype it came from, if any
+                data[name] = pd.Series(col.tolist(na=na), dtype=self.manifest['columns'][name][1])
+            elif kind == 'vector':
+                data[name] = list(np.asarray(col))
+            else:
+                data[name] = np.array(col)
+        return pd.DataFrame(data)
+
+
+def _encode(kind, dtype, values, dim):
+    """One chunk of a column as the parts of its files, in _files() order."""
+    if kind == 'str':
+        blobs = [v.encode('utf-8') if isinstance(v, str) else b'' for v in values]
+        valid = np.fromiter((isinstance(v, str) for v in values), dtype=bool, count=len(values))
+        return [b''.join(blobs), np.cumsum([len(b) for b in blobs], dtype='<i8'), valid]
+    if kind == 'vector':
+        out = np.zeros((len(values), dim), dtype=dtype)
+        valid = np.zeros(len(values), dtype=bool)
+        for i, v in enumerate(values):
+            if v is None:
+                continue
+            if isinstance(v, str):  # pgvector comes back as '[0.1,0.2,...]'
+                v = np.fromstring(v.strip('[]'), dtype=np.float32, sep=',')
+            out[i] = v
+            valid[i] = True
+        return [out, valid]
+    return [np.array([np.nan if v is None else v for v in values], dtype=dtype)]
+
+
+class TableWriter:
+    """Appends row chunks to a Table's files and publishes them via the manifest."""
+
+    def __init__(self, root, schema, dim=EMBEDDING_DIM, rebuild=False, **extra):
+        self.root = root
+        path = os.path.join(root, 'manifest.json')
+        manifest = None
+        if not rebuild and os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+            wanted = {k: list(v) for k, v in schema.items()}
+            if manifest.get('version') != FORMAT_VERSION or manifest['columns'] != wanted:
+                print(f"  ⚠️  Snapshot at {root} has another format or schema, rebuilding")
+                manifest = None
+        if manifest is None:
+            shutil.rmtree(root, ignore_errors=True)
+            os.makedirs(root)
+            manifest = {'version': FORMAT_VERSION, 'rows': 0, 'watermark': None, 'dim': dim,
+                        'columns': {k: list(v) for k, v in schema.items()},
+                        'bytes': {f: 0 for k, (kind, _) in schema.items() for f in _files(k, kind)}}
+            manifest.update(extra)
+        self.manifest = manifest
+        # Drop anything a crashed append wrote past the last published manifest
+        for file, size in manifest['bytes'].items():
+            with open(os.path.join(root, file), 'ab') as f:
+                f.truncate(size)
+
+    def append(self, rows, watermark=None):
+        if not rows:
+            return
+        m = self.manifest
+        for name, (kind, dtype) in m['columns'].items():
+            parts = _encode(kind, dtype, [r.get(name) for r in rows], m['dim'])
+            if kind == 'str':  # End offsets continue from the bytes already stored
+                parts[1] += m['bytes'][f'{name}.utf8']
+            for file, part in zip(_files(name, kind), parts):
+                data = part if isinstance(part, bytes) else np.ascontiguousarray(part).tobytes()
+                with open(os.path.join(self.root, file), 'ab') as f:
+                    f.write(data)
+                m['bytes'][file] += len(data)
+        m['rows'] += len(rows)
+        if watermark is not None:
+            m['watermark'] = watermark
+        self.save()
+
+    def save(self):
+        path = os.path.join(self.root, 'manifest.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(path + '.tmp', path)
+
+
+# ─── Loaders ─────────────────────────────────────────────────────────────────
+
+def load_reviews(columns=None, root=REVIEWS_DIR, mmap=True):
+    """Open the reviews snapshot. Only the requested columns' files are touched."""
+    table = Table(root, mmap=mmap)
+    for name in columns or []:
+        table[name]
+    return table
+
+
+def load_csv(path, columns=None, cache_dir=CSV_DIR):
+    """pandas DataFrame of a CSV, served from a columnar cache after the first read.
+
+    Matches pd.read_csv(path)[columns]: dtypes are kept and missing strings
+    come back as NaN. The cache is rebuilt when the CSV's size or mtime changes.
+    Used by the scripts/ tools that read web/src/data/coffee_data.csv, a
+    dataset with its own columns (name, roast, 100g_USD, ...) and rows that
+    are not the reviews table, so load_reviews() cannot stand in for it.
+    """
+    import pandas as pd
+    st = os.stat(path)
+    source = {'path': path, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    root = os.path.join(cache_dir, os.path.splitext(os.path.basename(path))[0])
+    try:
+        table = Table(root)
+        if table.manifest.get('source') != source or table.manifest.get('version') != FORMAT_VERSION:
+            raise FileNotFoundError
+    except (OSError, ValueError, KeyError):
+        df = pd.read_csv(path)
+        schema = {c: ('num', df[c].dtype.str) if pd.api.types.is_numeric_dtype(df[c])
+                  else ('str', str(df[c].dtype)) for c in df.columns}
+        writer = TableWriter(root, schema, rebuild=True, source=source)
+        writer.append(df.astype(object).where(df.notna(), None).to_dict('records'))
+        writer.save()
+        return df[columns] if columns else df
+    return table.frame(columns, na=np.nan)
+
+
+# ─── Snapshot Command ────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description='Mirror the reviews table into a local columnar snapshot')
+    parser.add_argument('--rebuild', action='store_true', help='Discard the snapshot and mirror every row')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent id-range reads')
+    args = parser.parse_args()
+
+    from supabase import create_client
+    from review_reader import iter_reviews
+    supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+
+    writer = TableWriter(REVIEWS_DIR, REVIEW_SCHEMA, rebuild=args.rebuild)
+    start = writer.manifest['watermark'] or 0
+    print(f"📸 Snapshotting reviews with id > {start} into {REVIEWS_DIR} "
+          f"({writer.manifest['rows']} rows already)")
+
+    t0 = time.perf_counter()
+    added = 0
+    chunk = []
+    for row in iter_reviews(supabase, ', '.join(REVIEW_SCHEMA), after_id=start, workers=args.workers):
+        chunk.append(row)
+        if len(chunk) >= CHUNK_ROWS:
+            writer.append(chunk, watermark=chunk[-1]['id'])
+            added += len(chunk)
+            print(f"  ...{added} rows appended (id {chunk[-1]['id']})")
+            chunk = []
+    if chunk:
+        writer.append(chunk, watermark=chunk[-1]['id'])
+        added += len(chunk)
+
+    m = writer.manifest
+    size = sum(m['bytes'].values())
+    print(f"✅ Appended {added} rows in {time.perf_counter() - t0:.1f}s; snapshot holds {m['rows']} rows "
+          f"through id {m['watermark']} ({size / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
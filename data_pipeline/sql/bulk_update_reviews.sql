@@ -0,0 +1,30 @@
+-- Bulk partial update for reviews
+-- Run this in Supabase SQL Editor
+--
+-- Applies many row patches in one request. Each element of `rows` is a JSON
+-- object with the row's `id` plus only the columns to change; columns that are
+-- absent keep their current value. Returns the ids that were updated, so the
+-- caller can report any id that is missing as failed.
+
+create or replace function bulk_update_reviews(rows jsonb)
+returns setof bigint
+language sql
+as $$
+  update reviews r set
+    (title, roaster, roaster_location, roast_level, agtron, price, origin,
+     review_date, rating, aroma, acidity, body, flavor, aftertaste,
+     blind_assessment, notes, bottom_line, with_milk, embedding,
+     country, price_numeric, currency, weight_oz, weight_unit,
+     price_per_oz_usd, review_year, roast_category)
+  = (
+    select p.title, p.roaster, p.roaster_location, p.roast_level, p.agtron, p.price, p.origin,
+           p.review_date, p.rating, p.aroma, p.acidity, p.body, p.flavor, p.aftertaste,
+           p.blind_assessment, p.notes, p.bottom_line, p.with_milk, p.embedding,
+           p.country, p.price_numeric, p.currency, p.weight_oz, p.weight_unit,
+           p.price_per_oz_usd, p.review_year, p.roast_category
+    from jsonb_populate_record(r, patch.value) p
+  )
+  from jsonb_array_elements(rows) as patch
+  where r.id = (patch.value->>'id')::bigint
+  returning r.id;
+$$;
@@ -29,5 +29,6 @@ CREATE TABLE IF NOT EXISTS countries (
 CREATE TABLE IF NOT EXISTS insights_cache (
   key text PRIMARY KEY,
   data jsonb NOT NULL,
+  content_hash text,  -- sha256 of the canonical JSON; unchanged keys are not rewritten
   computed_at timestamptz DEFAULT now()
 );
\ No newline at end of file
@@ -0,0 +1,8 @@
+-- Change-aware insights_cache writes
+-- Run this in Supabase SQL Editor
+--
+-- post_process.py stores a sha256 of each key's canonical JSON next to it and
+-- skips keys whose hash is unchanged, so computed_at only moves when the
+-- content does.
+
+ALTER TABLE insights_cache ADD COLUMN IF NOT EXISTS content_hash text;
@@ -0,0 +1,229 @@
+"""
+IVF-Flat Approximate Nearest-Neighbour Index
+Partitions the (unit-length) review embeddings into `nlist` clusters with
+spherical k-means; a query scores only the vectors in its `nprobe` nearest
+clusters instead of the whole corpus. With nlist growing as ~4·sqrt(N), the
+vectors scanned per query grow far slower than the corpus.
+
+Knobs:
+  nlist   clusters; more = smaller lists = faster queries, lower recall at a fixed nprobe
+  nprobe  clusters scanned per query; more = higher recall, slower queries
+
+Vectors are stored grouped by cluster in one contiguous matrix (each cluster a
+slice, so probing copies nothing). New vectors go to a small delta buffer that
+is scanned brute force and folded into the clusters once it passes
+MERGE_FRACTION of the index. Centroids stay fixed after a build; rebuild when
+the corpus has grown a lot.
+
+Usage:
+    python scripts/ann_index.py build                 # from the local reviews snapshot
+    python scripts/ann_index.py update                # add snapshot rows above the index's max id
+    python scripts/benchmark_search.py --backends exact,ivf --nprobe 16   # recall / latency
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_pipeline', 'scripts'))
+
+INDEX_DIR = os.path.join('data_pipeline', 'snapshot', 'ann')
+INDEX_VERSION = 1
+NPROBE = 16
+KMEANS_ITERS = 10
+TRAIN_PER_LIST = 64     # k-means training sample: this many vectors per cluster
+MERGE_FRACTION = 0.05   # Fold the delta buffer into the clusters past this share of the index
+CHUNK = 65536           # Rows per block when assigning vectors to clusters
+
+
+def default_nlist(n):
+    return max(1, min(int(4 * np.sqrt(n)), n // 8 or 1))
+
+
+def assign(vectors, centroids):
+    """Nearest centroid (max inner product) of every vector, in chunks."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), CHUNK):
+        out[start:start + CHUNK] = np.argmax(vectors[start:start + CHUNK] @ centroids.T, axis=1)
+    return out
+
+
+def train_centroids(vectors, nlist, iters=KMEANS_ITERS, seed=0):
+    """Spherical k-means on a sample of the vectors."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * TRAIN_PER_LIST)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))])
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iters):
+        labels = assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=nlist)
+        empty = counts == 0
+        sums[empty] = sample[rng.choice(len(sample), empty.sum())]  # Re-seed empty clusters
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = (sums / np.where(norms == 0, 1, norms)).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index over unit vectors, searched by inner product."""
+
+    def __init__(self, centroids, vectors, ids, offsets, nprobe=NPROBE,
+                 delta_vectors=None, delta_ids=None):
+        self.centroids = centroids
+        self.vectors, self.ids, self.offsets = vectors, ids, offsets
+        self.nprobe = nprobe
+        dim = centroids.shape[1]
+        self.delta_vectors = np.empty((0, dim), np.float32) if delta_vectors is None else delta_vectors
+        self.delta_ids = np.empty(0, np.int64) if delta_ids is None else delta_ids
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    def __len__(self):
+        return len(self.ids) + len(self.delta_ids)
+
+    @classmethod
+    def build(cls, vectors, ids=None, nlist=None, nprobe=NPROBE, seed=0):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids = np.arange(len(vectors), dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+        centroids = train_centroids(vectors, nlist or default_nlist(len(vectors)), seed=seed)
+        index = cls(centroids, vectors[:0], ids[:0], np.zeros(len(centroids) + 1, np.int64), nprobe)
+        index._regroup(vectors, ids)
+        return index
+
+    def _regroup(self, vectors, ids):
+        """Store vectors grouped by cluster: one contiguous slice per list."""
+        labels = assign(vectors, self.centroids)
+        order = np.argsort(labels, kind='stable')
+        self.vectors = vectors[order]
+        self.ids = ids[order]
+        self.offsets = np.zeros(self.nlist + 1, np.int64)
+        np.cumsum(np.bincount(labels, minlength=self.nlist), out=self.offsets[1:])
+
+    def add(self, vectors, ids):
+        """Insert new unit vectors; they are searchable immediately."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.centroids.shape[1])
+        self.delta_vectors = np.concatenate([self.delta_vectors, vectors])
+        self.delta_ids = np.concatenate([self.delta_ids, np.asarray(ids, dtype=np.int64)])
+        if len(self.delta_ids) > MERGE_FRACTION * max(len(self.ids), 1):
+            self.merge()
+
+    def merge(self):
+        """Fold the delta buffer into the clusters."""
+        if not len(self.delta_ids):
+            return
+        self._regroup(np.concatenate([np.asarray(self.vectors), self.delta_vectors]),
+                      np.concatenate([np.asarray(self.ids), self.delta_ids]))
+        self.delta_vectors = self.delta_vectors[:0]
+        self.delta_ids = self.delta_ids[:0]
+
+    def search(self, queries, k, nprobe=None):
+        """(scores, ids), each (len(queries), k), best first; -inf / -1 pad short results."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        delta_scores = queries @ self.delta_vectors.T if len(self.delta_ids) else None
+
+        out_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        out_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        offsets = self.offsets
+        for qi, q in enumerate(queries):
+            parts, part_ids = [], []
+            for lst in probes[qi]:
+                lo, hi = offsets[lst], offsets[lst + 1]
+                if hi > lo:
+                    parts.append(self.vectors[lo:hi] @ q)
+                    part_ids.append(self.ids[lo:hi])
+            if delta_scores is not None:
+                parts.append(delta_scores[qi])
+                part_ids.append(self.delta_ids)
+            if not parts:
+                continue
+            scores = np.concatenate(parts)
+            cand = np.concatenate(part_ids)
+            kk = min(k, len(scores))
+            top = np.argpartition(-scores, kk - 1)[:kk]
+            top = top[np.argsort(-scores[top], kind='stable')]
+            out_scores[qi, :kk] = scores[top]
+            out_ids[qi, :kk] = cand[top]
+        return out_scores, out_ids
+
+    # ─── Persistence ─────────────────────────────────────────────────────────
+
+    ARRAYS = ('centroids', 'vectors', 'ids', 'offsets', 'delta_vectors', 'delta_ids')
+
+    def save(self, path=INDEX_DIR):
+        os.makedirs(path, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, name + '.tmp.npy'), np.asarray(getattr(self, name)))
+        for name in self.ARRAYS:
+            os.replace(os.path.join(path, name + '.tmp.npy'), os.path.join(path, name + '.npy'))
+        meta = {'version': INDEX_VERSION, 'nlist': self.nlist, 'nprobe': self.nprobe,
+                'dim': int(self.centroids.shape[1]), 'size': len(self),
+                'max_id': int(max(self.ids.max(initial=-1), self.delta_ids.max(initial=-1)))}
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=1)
+
+    @classmethod
+    def load(cls, path=INDEX_DIR, mmap=True):
+        """Open a saved index; the grouped vectors are memory-mapped by default."""
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('version') != INDEX_VERSION:
+            raise ValueError(f"Index at {path} is version {meta.get('version')}, expected {INDEX_VERSION}")
+        arrays = {name: np.load(os.path.join(path, name + '.npy'),
+                                mmap_mode='r' if mmap and name == 'vectors' else None)
+                  for name in cls.ARRAYS}
+        index = cls(arrays['centroids'], arrays['vectors'], arrays['ids'], arrays['offsets'],
+                    meta['nprobe'], arrays['delta_vectors'], arrays['delta_ids'])
+        index.meta = meta
+        return index
+
+
+# ─── Build / Update from the Snapshot ────────────────────────────────────────
+
+def snapshot_vectors(after_id=None):
+    """(ids, unit vectors) of the snapshot rows that have an embedding."""
+    from snapshot import load_reviews
+    from embedding_artifact import unit_rows
+    snap = load_reviews(['id', 'embedding'])
+    keep = np.array(snap.valid('embedding'))
+    ids = np.asarray(snap['id'])
+    if after_id is not None:
+        keep &= ids > after_id
+    return ids[keep], unit_rows(snap['embedding'][keep])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or extend the IVF index over review embeddings')
+    parser.add_argument('command', choices=['build', 'update'])
+    parser.add_argument('--nlist', type=int, help='Clusters (default ~4·sqrt(N))')
+    parser.add_argument('--nprobe', type=int, default=NPROBE, help='Default clusters probed per query')
+    parser.add_argument('--path', default=INDEX_DIR)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.command == 'build':
+        ids, vectors = snapshot_vectors()
+        print(f"🧭 Building IVF index over {len(ids)} embeddings...")
+        index = IVFIndex.build(vectors, ids, nlist=args.nlist, nprobe=args.nprobe)
+    else:
+        index = IVFIndex.load(args.path, mmap=False)
+        ids, vectors = snapshot_vectors(after_id=index.meta['max_id'])
+        print(f"➕ Adding {len(ids)} embeddings above id {index.meta['max_id']}...")
+        index.add(vectors, ids)
+    index.save(args.path)
+    sizes = np.diff(index.offsets)
+    print(f"✅ {len(index)} vectors in {index.nlist} lists (median {int(np.median(sizes))}, "
+          f"max {sizes.max()}; {len(index.delta_ids)} in delta) saved to {args.path} "
+          f"in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
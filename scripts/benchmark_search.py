@@ -1,12 +1,43 @@
+"""
+Semantic Search Benchmark
+Scores queries against the search embeddings with exact (brute-force) search,
+vectorized: one normalized matrix product per query batch plus argpartition for
+the top k. Any registered backend is timed the same way and its recall@k is
+measured against the exact results.
+
+Reports single-query latency (p50/p95/p99), QPS at several batch sizes and
+recall@k, as JSON so runs can be diffed for regressions.
+
+Usage:
+    python scripts/benchmark_search.py                         # scripts/search_queries.txt, exact only
+    python scripts/benchmark_search.py --queries queries.txt --json bench.json
+    python scripts/benchmark_search.py --synthetic 200000      # no model/embeddings needed
+    python scripts/benchmark_search.py --snapshot              # every review embedding in the local snapshot
+    python scripts/benchmark_search.py --show                  # print the top 3 per query
+"""
+
+import os
 import json
+import time
+import argparse
+import contextlib
 import numpy as np
 import sys
-from sentence_transformers import SentenceTransformer
-import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_pipeline', 'scripts'))
+from snapshot import load_csv, load_reviews, REVIEWS_DIR
+from ann_index import IVFIndex, NPROBE
+from embedding_artifact import ARTIFACT_DIR, load_artifact, quantize_int8, dequantize
+from generate_embeddings import ID_COLUMNS, review_ids
+from embedding_cache import EmbeddingCache
+from embed_service import service_encoder
+from encoders import load_encoder, model_id
 
 # Load the embeddings (Simulating the API's Knowledge Base)
 EMBEDDINGS_PATH = 'web/src/app/api/search/embeddings.json'
 DATA_PATH = 'web/src/data/coffee_data.csv'
+QUERIES_PATH = 'scripts/search_queries.txt'  # Larger query set for the timing runs
+BATCH_SIZES = (1, 8, 32, 128)
 
 # Test Queries to evaluate
 QUERIES = [
@@ -19,54 +50,254 @@ QUERIES = [
     "floral tea like"
 ]
 
-def cosine_similarity(a, b):
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
 
-def run_benchmark():
-    print(f"--- Loading embeddings from {EMBEDDINGS_PATH} ---")
-    with open(EMBEDDINGS_PATH, 'r') as f:
+# ─── Corpus & Queries ────────────────────────────────────────────────────────
+
+def normalize(matrix):
+    """Rows scaled to unit length (all-zero rows stay zero), as float32."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def load_embeddings(path=EMBEDDINGS_PATH):
+    """(ids, names, normalized matrix): the binary artifact if there is one, else the JSON."""
+    if os.path.exists(os.path.join(ARTIFACT_DIR, 'meta.json')):
+        print(f"--- Loading embeddings from {ARTIFACT_DIR} ---")
+        art = load_artifact(ARTIFACT_DIR)
+        return np.asarray(art.ids), art.names, art.matrix()
+    print(f"--- Loading embeddings from {path} ---")
+    with open(path, 'r') as f:
         embedding_map = json.load(f)
-    
+    ids = np.array([item['id'] for item in embedding_map])
+    names = [item['name'] for item in embedding_map]
+    return ids, names, normalize([item['vector'] for item in embedding_map])
+
+
+def load_snapshot_embeddings(root=REVIEWS_DIR):
+    """(ids, titles, normalized matrix) of the reviews snapshot rows with an embedding.
+
+    The reviews table's own vectors, i.e. the corpus ann_index.py indexes.
+    """
+    print(f"--- Loading embeddings from the reviews snapshot ({root}) ---")
+    snap = load_reviews(['id', 'title', 'embedding'], root=root)
+    keep = np.flatnonzero(snap.valid('embedding'))
+    titles = snap['title'].tolist()
+    return np.asarray(snap['id'])[keep], [titles[i] for i in keep], normalize(snap['embedding'][keep])
+
+
+def load_queries(path):
+    """Queries from a .json list or a text file with one query per line."""
+    with open(path) as f:
+        if path.endswith('.json'):
+            return list(json.load(f))
+        return [line.strip() for line in f if line.strip()]
+
+
+def encode_queries(queries):
+    # Same model the API runs through transformers.js; mean pooling + normalize.
+    # Queries seen in earlier runs come from the embedding cache without loading it.
+    def encode(texts):
+        return load_encoder().encode(texts, batch_size=64)
+
+    cache = EmbeddingCache()
+    vectors = cache.encode(queries, service_encoder() or encode)
+    cache.report()
+    return normalize(vectors)
+
+
+def synthetic_corpus(n, n_queries, dim=384, seed=0):
+    """Clustered unit vectors and queries near corpus points, for scaling runs."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 500), dim), dtype=np.float32)
+    matrix = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100_000):  # Chunked to keep the float64 temporaries small
+        stop = min(start + 100_000, n)
+        assign = rng.integers(0, len(centers), stop - start)
+        matrix[start:stop] = centers[assign] + rng.standard_normal((stop - start, dim), dtype=np.float32)
+    queries = matrix[rng.integers(0, n, n_queries)] + 0.5 * rng.standard_normal((n_queries, dim), dtype=np.float32)
+    return normalize(matrix), normalize(queries)
+
+
+# ─── Backends ────────────────────────────────────────────────────────────────
+
+class ExactSearch:
+    """Brute force over every vector; the ground truth for recall."""
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+
+    def search(self, queries, k):
+        """(scores, row indices), each (len(queries), k), best first."""
+        scores = queries @ self.matrix.T
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        return np.take_along_axis(top_scores, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+
+def int8_round_trip(matrix):
+    """The matrix as the int8 artifact stores it, to see what quantization costs in recall."""
+    return dequantize(*quantize_int8(matrix))
+
+
+# name -> factory(matrix, args) returning an object with search(queries, k)
+BACKENDS = {
+    'exact': lambda matrix, args: ExactSearch(matrix),
+    'exact-int8': lambda matrix, args: ExactSearch(int8_round_trip(matrix)),
+    'ivf': lambda matrix, args: IVFIndex.build(matrix, nlist=args.nlist, nprobe=args.nprobe),
+}
+
+
+def register_backend(name, factory):
+    BACKENDS[name] = factory
+
+
+# ─── Measurements ────────────────────────────────────────────────────────────
+
+def latency_ms(index, queries, k, samples):
+    """Single-query latencies over `samples` calls, cycling through the queries."""
+    times = np.empty(samples)
+    for i in range(samples):
+        q = queries[i % len(queries)][None, :]
+        t0 = time.perf_counter()
+        index.search(q, k)
+        times[i] = time.perf_counter() - t0
+    times *= 1000
+    return {'p50': float(np.percentile(times, 50)), 'p95': float(np.percentile(times, 95)),
+            'p99': float(np.percentile(times, 99)), 'mean': float(times.mean())}
+
+
+def throughput_qps(index, queries, k, batch, min_seconds):
+    """Queries/sec answering `batch` queries per call, for at least min_seconds."""
+    pool = np.resize(queries, (max(len(queries), batch), queries.shape[1]))
+    done = 0
+    t0 = time.perf_counter()
+    while True:
+        for start in range(0, len(pool) - batch + 1, batch):
+            index.search(pool[start:start + batch], k)
+            done += batch
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_seconds:
+            return done / elapsed
+
+
+def recall_at_k(found, truth):
+    """Mean fraction of each query's exact top k that the backend also returned."""
+    k = truth.shape[1]
+    return float(np.mean([len(np.intersect1d(f, t)) / k for f, t in zip(found, truth)]))
+
+
+def benchmark(name, matrix, queries, truth, args):
+    t0 = time.perf_counter()
+    index = BACKENDS[name](matrix, args)
+    build_s = time.perf_counter() - t0
+    _, found = index.search(queries, args.k)
+    result = {
+        'build_s': build_s,
+        'latency_ms': latency_ms(index, queries, args.k, args.samples),
+        'qps': {str(b): throughput_qps(index, queries, args.k, b, args.min_seconds) for b in args.batch_sizes},
+        f'recall_at_{args.k}': recall_at_k(found, truth),
+    }
+    lat = result['latency_ms']
+    print(f"  {name:<10} p50 {lat['p50']:.2f}ms  p95 {lat['p95']:.2f}ms  p99 {lat['p99']:.2f}ms  "
+          f"recall@{args.k} {result[f'recall_at_{args.k}']:.3f}  "
+          + '  '.join(f"qps@{b} {q:.0f}" for b, q in result['qps'].items()))
+    return result
+
+
+# ─── Qualitative Check ───────────────────────────────────────────────────────
+
+def show_results(ids, names, matrix, queries, query_vecs):
     # We need the original text to see WHY it matched
-    # We can rely on the 'name' in embedding_map, but let's load CSV for full review text if needed
-    # actually embedding_map has 'id', we can create a lookup
-    df = pd.read_csv(DATA_PATH)
-    
-    print("--- Loading Model for Query Encoding ---")
-    # Note: We use the Python version here, API uses JS version. 
-    # They are mathematically identical for the same model weights.
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    
-    print("\n--- STARTING BENCHMARK ---\n")
-    
-    for query in QUERIES:
+    df = load_csv(DATA_PATH, columns=ID_COLUMNS + ['roast', 'review'])
+    # Embedding ids are derived from roaster/name/date; artifacts from before
+    # that used the CSV row number, which the fallback still resolves
+    row_of = {rid: i for i, rid in enumerate(review_ids(df))}
+    scores, top = ExactSearch(matrix).search(query_vecs, 3)
+    for query, row_scores, rows in zip(queries, scores, top):
         print(f"🔎 QUERY: '{query}'")
-        query_vec = model.encode(query)
-        
-        # Calculate scores
-        results = []
-        for item in embedding_map:
-            score = cosine_similarity(query_vec, item['vector'])
-            results.append({
-                'score': score,
-                'name': item['name'],
-                'id': item['id']
-            })
-            
-        # Sort and Top 3
-        results.sort(key=lambda x: x['score'], reverse=True)
-        top_3 = results[:3]
-        
-        for i, res in enumerate(top_3):
-            # Get full details from DF
-            bean = df.iloc[res['id']]
+        for i, (score, row) in enumerate(zip(row_scores, rows)):
+            bean = df.iloc[row_of.get(int(ids[row]), int(ids[row]))]
             # snippets of review
             review = str(bean['review'])
             snippet = review[:100] + "..." if len(review) > 100 else review
-            
-            print(f"   {i+1}. [{res['score']:.4f}] {res['name']}")
+            print(f"   {i+1}. [{score:.4f}] {names[row]}")
             print(f"      Context: {bean['roast']} | {snippet}")
         print("-" * 60)
 
+
+# ─── Main ────────────────────────────────────────────────────────────────────
+
+def measure(args):
+    """Run the benchmark described by args; the report dict, or None after --show."""
+    if args.synthetic:
+        print(f"--- Generating {args.synthetic} synthetic vectors ---")
+        matrix, query_vecs = synthetic_corpus(args.synthetic, args.synthetic_queries)
+        source = 'synthetic'
+    else:
+        ids, names, matrix = load_snapshot_embeddings() if args.snapshot else load_embeddings()
+        queries = load_queries(args.queries) if args.queries else QUERIES
+        print(f"--- Encoding {len(queries)} queries ({model_id()}) ---")
+        query_vecs = encode_queries(queries)
+        if args.snapshot:
+            source = REVIEWS_DIR
+        else:
+            source = ARTIFACT_DIR if os.path.exists(os.path.join(ARTIFACT_DIR, 'meta.json')) else EMBEDDINGS_PATH
+        if args.show:
+            print("\n--- TOP MATCHES ---\n")
+            show_results(ids, names, matrix, queries, query_vecs)
+            return None
+
+    print(f"\n--- STARTING BENCHMARK ({len(matrix)} vectors, {len(query_vecs)} queries, k={args.k}) ---\n")
+    _, truth = ExactSearch(matrix).search(query_vecs, args.k)
+    return {
+        'corpus': {'source': source, 'vectors': int(matrix.shape[0]), 'dim': int(matrix.shape[1])},
+        'queries': int(len(query_vecs)),
+        'k': args.k,
+        'backends': {name: benchmark(name, matrix, query_vecs, truth, args)
+                     for name in args.backends.split(',')},
+    }
+
+
+
+def run_benchmark():
+    parser = argparse.ArgumentParser(description='Latency, throughput and recall of semantic search backends')
+    parser.add_argument('--queries', default=QUERIES_PATH,
+                        help='Query file (.txt one per line, or .json list); "" for the built-in set')
+    parser.add_argument('--synthetic', type=int, metavar='N',
+                        help='Use N synthetic clustered vectors (and queries) instead of the embeddings + model')
+    parser.add_argument('--snapshot', action='store_true',
+                        help='Search the review embeddings in the local reviews snapshot (snapshot.py)')
+    parser.add_argument('--synthetic-queries', type=int, default=200, help='Queries generated with --synthetic')
+    parser.add_argument('--backends', default=','.join(BACKENDS), help='Comma-separated backends to time')
+    parser.add_argument('-k', type=int, default=10, help='Results per query')
+    parser.add_argument('--batch-sizes', type=lambda s: [int(x) for x in s.split(',')],
+                        default=list(BATCH_SIZES), help='Batch sizes for the QPS runs')
+    parser.add_argument('--samples', type=int, default=200, help='Single-query calls for the latency percentiles')
+    parser.add_argument('--min-seconds', type=float, default=1.0, help='Minimum duration of each QPS run')
+    parser.add_argument('--nlist', type=int, help='ivf: clusters (default ~4·sqrt(N))')
+    parser.add_argument('--nprobe', type=int, default=NPROBE, help='ivf: clusters scanned per query')
+    parser.add_argument('--json', help='Write the report here ("-" for stdout)')
+    parser.add_argument('--show', action='store_true', help='Print the top 3 per query instead of timing')
+    args = parser.parse_args()
+    if args.snapshot and args.show:
+        parser.error('--show looks results up in the CSV; use it without --snapshot')
+
+    # With --json - stdout carries only the report; progress goes to stderr
+    with contextlib.redirect_stdout(sys.stderr if args.json == '-' else sys.stdout):
+        report = measure(args)
+
+    if report is None:
+        return
+    if args.json == '-':
+        print(json.dumps(report, indent=2))
+    elif args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved report to {args.json}")
+
+
 if __name__ == "__main__":
     run_benchmark()
@@ -3,6 +3,10 @@ import pandas as pd
 import numpy as np
 from sklearn.linear_model import LinearRegression
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_pipeline', 'scripts'))
+from snapshot import load_csv
 
 def calculate_value_score():
     # Define paths
@@ -12,7 +16,7 @@ def calculate_value_score():
     print(f"Reading data from: {input_path}")
     
     try:
-        df = pd.read_csv(input_path)
+        df = load_csv(input_path)
     except FileNotFoundError:
         print(f"Error: Could not find input file at {input_path}")
         return
@@ -0,0 +1,201 @@
+"""
+Binary Embedding Artifact
+A memory-mappable alternative to embeddings.json (a JSON list of
+{id, name, vector} with 384 decimal floats per row). The artifact is a
+directory holding:
+
+  vectors.npy        float32 or float16 (n, dim) matrix, rows unit length
+  vectors.int8.npy   optional int8 codes, symmetric per-vector quantization
+  scales.npy         float32 per-vector scale of the int8 codes (v ≈ code * scale)
+  ids.npy            int64 ids, row-aligned with the matrix
+  hashes.npy         optional row-aligned hashes of the embedded text (reuse on re-runs)
+  names.json         row-aligned names (the only JSON, small)
+  meta.json          format version, model, dtype, dim, count
+
+load_artifact() memory-maps the matrices, so opening costs the same at 9k or
+1M rows and pages are read only when scored.
+
+Usage:
+    python scripts/embedding_artifact.py                  # convert embeddings.json (+ int8) and report
+    python scripts/embedding_artifact.py --dtype float16  # half-size float matrix
+
+    from embedding_artifact import load_artifact
+    art = load_artifact()
+    scores = art.vectors @ query                          # no copy for float32
+"""
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+JSON_PATH = 'web/src/app/api/search/embeddings.json'
+ARTIFACT_DIR = 'web/src/app/api/search/embeddings'
+MODEL_NAME = 'all-MiniLM-L6-v2'
+FORMAT_VERSION = 1
+
+
+def unit_rows(vectors):
+    """Rows scaled to unit length, as float32. Zero rows and rows already unit
+    length are left as they are, so re-writing carried-over vectors is lossless."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where((norms == 0) | (np.abs(norms - 1) < 1e-6), 1, norms)
+
+
+def quantize_int8(vectors):
+    """(int8 codes, float32 scales) with each row's max |value| mapped to 127."""
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize(codes, scales):
+    return codes.astype(np.float32) * scales[:, None]
+
+
+def read_json(path=JSON_PATH):
+    """(ids, names, float32 vectors) from the legacy JSON artifact."""
+    with open(path) as f:
+        embedding_map = json.load(f)
+    ids = np.array([item['id'] for item in embedding_map], dtype=np.int64)
+    names = [item['name'] for item in embedding_map]
+    return ids, names, np.array([item['vector'] for item in embedding_map], dtype=np.float32)
+
+
+def write_artifact(ids, names, vectors, path=ARTIFACT_DIR, dtype='float32', int8=True, model=MODEL_NAME,
+                   hashes=None):
+    """Write the artifact; meta.json goes last, so readers never see a half-written one."""
+    vectors = unit_rows(vectors)
+    os.makedirs(path, exist_ok=True)
+    files = {'vectors': vectors.astype(dtype), 'ids': np.asarray(ids, dtype=np.int64)}
+    if int8:
+        files['vectors.int8'], files['scales'] = quantize_int8(vectors)
+    if hashes is not None:
+        files['hashes'] = np.array(hashes, dtype='S')
+    for name, array in files.items():
+        np.save(os.path.join(path, name + '.tmp.npy'), array)
+        os.replace(os.path.join(path, name + '.tmp.npy'), os.path.join(path, name + '.npy'))
+    stale = ([] if int8 else ['vectors.int8.npy', 'scales.npy']) + ([] if hashes is not None else ['hashes.npy'])
+    for name in stale:
+        if os.path.exists(os.path.join(path, name)):
+            os.remove(os.path.join(path, name))
+    with open(os.path.join(path, 'names.json'), 'w') as f:
+        json.dump(list(names), f, ensure_ascii=False)
+    meta = {'version': FORMAT_VERSION, 'model': model, 'dtype': dtype, 'int8': bool(int8),
+            'hashes': hashes is not None,
+            'dim': int(vectors.shape[1]) if vectors.ndim == 2 else 0, 'count': len(vectors)}
+    with open(os.path.join(path, 'meta.json.tmp'), 'w') as f:
+        json.dump(meta, f, indent=1)
+    os.replace(os.path.join(path, 'meta.json.tmp'), os.path.join(path, 'meta.json'))
+
+
+class Artifact:
+    """An opened artifact; matrices are memory-mapped, names load on first use."""
+
+    def __init__(self, path, mmap=True):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Artifact at {path} is version {self.meta.get('version')}, expected {FORMAT_VERSION}")
+        mode = 'r' if mmap else None
+        self.vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode=mode)
+        self.ids = np.load(os.path.join(path, 'ids.npy'), mmap_mode=mode)
+        self.codes = self.scales = None
+        if self.meta.get('int8'):
+            self.codes = np.load(os.path.join(path, 'vectors.int8.npy'), mmap_mode=mode)
+            self.scales = np.load(os.path.join(path, 'scales.npy'))
+        self.hashes = np.load(os.path.join(path, 'hashes.npy')) if self.meta.get('hashes') else None
+        self._names = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def names(self):
+        if self._names is None:
+            with open(os.path.join(self.path, 'names.json')) as f:
+                self._names = json.load(f)
+        return self._names
+
+    def matrix(self, int8=False):
+        """float32 (n, dim) matrix: the mapped file itself for float32, else decoded."""
+        if int8:
+            return dequantize(self.codes, self.scales)
+        return np.asarray(self.vectors, dtype=np.float32)
+
+
+def load_artifact(path=ARTIFACT_DIR, mmap=True):
+    return Artifact(path, mmap=mmap)
+
+
+# ─── Report ──────────────────────────────────────────────────────────────────
+
+def _top_k(matrix, queries, k):
+    scores = queries @ matrix.T
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+
+def recall(found, truth):
+    return float(np.mean([len(np.intersect1d(f, t)) / truth.shape[1] for f, t in zip(found, truth)]))
+
+
+def report(json_path, path, k=10, n_queries=200, seed=0):
+    """Size, load time and recall@k of each stored form, against the JSON."""
+    def timed(fn):
+        t0 = time.perf_counter()
+        out = fn()
+        return out, time.perf_counter() - t0
+
+    (_, _, json_vectors), json_load = timed(lambda: read_json(json_path))
+    art, open_s = timed(lambda: load_artifact(path))
+    exact = unit_rows(json_vectors)
+    rng = np.random.default_rng(seed)
+    queries = exact[rng.choice(len(exact), min(n_queries, len(exact)), replace=False)]
+    k = min(k, len(exact))
+    truth = _top_k(exact, queries, k)
+
+    size = lambda *files: sum(os.path.getsize(os.path.join(path, f)) for f in files)
+    sidecar = size('ids.npy', 'names.json', 'meta.json')
+    rows = [('json', os.path.getsize(json_path), json_load, 1.0)]
+
+    def read(int8=False):
+        matrix = art.matrix(int8)
+        matrix.sum()  # Fault in every page of the mapping
+        return matrix
+
+    matrix, scan = timed(read)
+    rows.append((art.meta['dtype'], size('vectors.npy') + sidecar, open_s + scan,
+                 recall(_top_k(matrix, queries, k), truth)))
+    if art.codes is not None:
+        matrix, scan = timed(lambda: read(int8=True))
+        rows.append(('int8', size('vectors.int8.npy', 'scales.npy') + sidecar, open_s + scan,
+                     recall(_top_k(matrix, queries, k), truth)))
+
+    print(f"\n{'format':<10} {'size':>10} {'load':>10} {f'recall@{k}':>10}")
+    for name, nbytes, seconds, r in rows:
+        print(f"{name:<10} {nbytes / 1e6:>8.2f}MB {seconds * 1000:>8.1f}ms {r:>10.4f}")
+    print(f"(artifact open alone: {open_s * 1000:.2f}ms; load = open + first full read)")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert embeddings.json to the binary artifact and compare them')
+    parser.add_argument('--from', dest='source', default=JSON_PATH, help='JSON artifact to convert')
+    parser.add_argument('--path', default=ARTIFACT_DIR, help='Artifact directory')
+    parser.add_argument('--dtype', choices=['float32', 'float16'], default='float32')
+    parser.add_argument('--no-int8', action='store_true', help='Skip the int8-quantized variant')
+    parser.add_argument('-k', type=int, default=10, help='k for the recall check')
+    args = parser.parse_args()
+
+    ids, names, vectors = read_json(args.source)
+    write_artifact(ids, names, vectors, args.path, dtype=args.dtype, int8=not args.no_int8)
+    print(f"✅ Wrote {len(ids)} vectors to {args.path}")
+    report(args.source, args.path, k=args.k)
+
+
+if __name__ == "__main__":
+    main()
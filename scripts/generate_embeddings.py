@@ -1,74 +1,140 @@
-import pandas as pd
 import json
 import os
-from sentence_transformers import SentenceTransformer
+import sys
+import hashlib
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_pipeline', 'scripts'))
+from snapshot import load_csv
+from embedding_artifact import ARTIFACT_DIR, load_artifact, write_artifact
+from embedding_cache import EmbeddingCache
+from embed_service import service_encoder
+from encoders import load_encoder, model_id
 
 # Paths
-INPUT_CSV = 'web/src/app/coffee_data_scored.csv' # Using the scored data if available, or fallback
-# Note: In previous steps we might have saved it to src/data or src/app. checking...
-# Let's check where the data actually resides.
-# Based on previous context, user moved data to app directory.
-# Let me double check file existence in valid paths first, or I will use a safe relative path logic.
+OUTPUT_JSON = 'web/src/app/api/search/embeddings.json'  # Save directly next to the API route
+# Try different potential locations for the CSV
+POSSIBLE_PATHS = [
+    'web/src/app/coffee_data.csv',
+    'web/src/data/coffee_data.csv',
+    'web/src/utils/coffee_data.csv'
+]
+ID_COLUMNS = ['roaster', 'name', 'review_date']  # What identifies a review in the CSV
+
+
+def embed_text(row):
+    # We want to embed the most descriptive parts.
+    # Format: "Coffee: [Name]. Flavor Notes: [Desc]. Roast: [Roast]"
+    return f"Coffee: {row['name']}. Flavor Notes: {row['review']}. Roast: {row['roast']}"
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def review_ids(df):
+    """Stable ids derived from each row's roaster, name and review date.
+
+    Repeats of the same key (a handful of re-listed coffees) get an occurrence
+    suffix. Ids are 52-bit so they survive JSON / JavaScript numbers, and they
+    do not change when rows are reordered.
+    """
+    seen = {}
+    ids = []
+    for values in zip(*(df[c].astype(str) for c in ID_COLUMNS)):
+        key = '|'.join(values)
+        seen[key] = seen.get(key, 0) + 1
+        if seen[key] > 1:
+            key += f'#{seen[key]}'
+        ids.append(int(hashlib.sha1(key.encode('utf-8')).hexdigest()[:13], 16))
+    return ids
+
+
+_model = None
+
+def encode_with_model(texts):
+    global _model
+    remote = service_encoder()  # EMBED_SERVICE_URL: a warm shared model, nothing to load here
+    if remote is not None:
+        print(f"Encoding {len(texts)} texts via the embedding service...")
+        return remote(texts)
+    if _model is None:
+        # We use all-MiniLM-L6-v2 because it's small and compatible with transformers.js
+        print(f"Loading Model ({model_id()})...")
+        _model = load_encoder()
+    print(f"Generating {len(texts)} Embeddings (this may take a minute)...")
+    return _model.encode(texts, show_progress_bar=True)
+
+
+def previous_vectors():
+    """(text hash -> vector, artifact) from the last run, if it stored hashes for this model
+    (and encoder backend)."""
+    try:
+        art = load_artifact(ARTIFACT_DIR)
+    except (OSError, ValueError):
+        return {}, None
+    if art.hashes is None or art.meta.get('model') != model_id():
+        return {}, None
+    vectors = art.matrix()
+    return {h.decode(): vectors[i] for i, h in enumerate(art.hashes)}, art
+
 
 def generate_embeddings():
     # 1. Load Data
-    # Try different potential locations for the CSV
-    possible_paths = [
-        'web/src/app/coffee_data.csv',
-        'web/src/data/coffee_data.csv',
-        'web/src/utils/coffee_data.csv'
-    ]
-    
     df = None
-    for path in possible_paths:
+    for path in POSSIBLE_PATHS:
         if os.path.exists(path):
             print(f"Found data at: {path}")
-            df = pd.read_csv(path)
+            df = load_csv(path, columns=ID_COLUMNS + ['review', 'roast'])
             break
-            
+
     if df is None:
         print("Error: Could not find coffee_data.csv")
         return
 
-    # 2. Load Model
-    # We use all-MiniLM-L6-v2 because it's small and compatible with transformers.js
-    print("Loading Model (all-MiniLM-L6-v2)...")
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-
-    # 3. Prepare Text
-    # We want to embed the most descriptive parts.
-    # Format: "Name: [Name]. Description: [Desc]. Roast: [Roast]"
+    # 2. Prepare Text, content hashes and stable ids
     print("Preparing text...")
-    df['embed_text'] = df.apply(lambda x: f"Coffee: {x['name']}. Flavor Notes: {x['review']}. Roast: {x['roast']}", axis=1)
-    
-    # 4. Generate Embeddings
-    print("Generating Embeddings (this may take a minute)...")
-    embeddings = model.encode(df['embed_text'].tolist(), show_progress_bar=True)
-
-    # 5. Create Output Dictionary
-    # Map: { "Bean_Name_Slug": [0.1, 0.2, ...], ... }
-    # Using row index or slug as key. Let's use name for now or index if names aren't unique.
-    # Ideally we'd have a stable ID. Let's use the unique index.
-    
-    embedding_map = []
-    
-    for idx, row in df.iterrows():
-        embedding_map.append({
-            "id": idx, # Simple numeric ID matching the CSV row order
-            "name": row['name'],
-            "vector": embeddings[idx].tolist()
-        })
+    texts = [embed_text(row) for row in df.to_dict('records')]
+    hashes = [text_hash(t) for t in texts]
+    ids = review_ids(df)
+
+    # 3. Reuse vectors whose text is unchanged since the last run
+    reuse, art = previous_vectors()
+    if art is not None and list(art.ids) == ids and [h.decode() for h in art.hashes] == hashes:
+        print(f"Unchanged: all {len(ids)} embeddings in {ARTIFACT_DIR} are current")
+        return
+    missing = [i for i, h in enumerate(hashes) if h not in reuse]
+    print(f"{len(texts) - len(missing)} embeddings carried over, {len(missing)} new or changed")
+
+    # 4. Generate Embeddings (only for new / changed text; text any earlier run
+    # encoded comes from the embedding cache, so the model only loads for truly new text)
+    dim = next(iter(reuse.values())).shape[0] if reuse else None
+    encoded = {}
+    if missing:
+        cache = EmbeddingCache()
+        vectors = cache.encode([texts[i] for i in missing], encode_with_model)
+        cache.report()
+        encoded = dict(zip(missing, vectors))
+        dim = vectors.shape[1]
+
+    embeddings = np.empty((len(texts), dim), dtype=np.float32)
+    for i, h in enumerate(hashes):
+        embeddings[i] = encoded[i] if i in encoded else reuse[h]
+
+    # 5. Create Output: [{id, name, vector}, ...] keyed by the stable ids
+    embedding_map = [{"id": ids[i], "name": name, "vector": embeddings[i].tolist()}
+                     for i, name in enumerate(df['name'])]
 
     # 6. Save to JSON
-    output_path = 'web/src/app/api/search/embeddings.json' # Save directly next to the API route
-    
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    
-    with open(output_path, 'w') as f:
+    os.makedirs(os.path.dirname(OUTPUT_JSON), exist_ok=True)
+    with open(OUTPUT_JSON, 'w') as f:
         json.dump(embedding_map, f)
-        
-    print(f"Success! Saved {len(embedding_map)} embeddings to {output_path}")
+    print(f"Success! Saved {len(embedding_map)} embeddings to {OUTPUT_JSON}")
+
+    # 7. Binary artifact (memory-mapped by benchmark_search; float32 + int8), with the
+    # text hashes the next run compares against
+    write_artifact(ids, list(df['name']), embeddings, ARTIFACT_DIR, model=model_id(), hashes=hashes)
+    print(f"Saved binary artifact to {ARTIFACT_DIR}")
 
 if __name__ == "__main__":
     generate_embeddings()